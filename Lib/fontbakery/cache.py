@@ -0,0 +1,380 @@
+"""
+Font Bakery cache persists the values of conditions and the results of
+checks across runs of the CheckRunner. Entries are content-addressed,
+changed inputs produce a different key, and the least recently used
+entries are evicted when the cache exceeds its size limit.
+"""
+import fnmatch
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+from fontbakery import __version__ as fontbakery_version
+
+class DiskCache:
+  """ A directory of files named by key with a size limit.
+
+  The modification time of an entry is its last use, entries are
+  evicted by that, least recently used first.
+  """
+  def __init__(self, directory, max_size=None):
+    """
+      directory: is created if it doesn't exist.
+      max_size: in bytes, None for no limit.
+    """
+    self.directory = directory
+    self.max_size = max_size
+    os.makedirs(directory, exist_ok=True)
+    self._lock = threading.Lock()
+    self._size = None
+
+  def _path(self, key):
+    # two levels, so directories don't get too big
+    return os.path.join(self.directory, key[:2], key)
+
+  def _entries(self):
+    for sub_dir in os.scandir(self.directory):
+      if not sub_dir.is_dir():
+        continue
+      for entry in os.scandir(sub_dir.path):
+        if entry.is_file() and not entry.name.startswith('.'):
+          yield entry
+
+  def get(self, key):
+    """ Returns the bytes stored at key or None. """
+    path = self._path(key)
+    try:
+      with open(path, 'rb') as f:
+        data = f.read()
+      # mark as recently used
+      os.utime(path)
+    except OSError:
+      return None
+    return data
+
+  def set(self, key, data):
+    path = self._path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write atomically, other processes may use the same cache.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.')
+    with os.fdopen(fd, 'wb') as f:
+      f.write(data)
+    os.replace(tmp_path, path)
+    with self._lock:
+      if self._size is not None:
+        self._size += len(data)
+      self._evict()
+
+  def _evict(self):
+    if self.max_size is None:
+      return
+    if self._size is not None and self._size <= self.max_size:
+      return
+    entries = []
+    for entry in self._entries():
+      stat = entry.stat()
+      entries.append((stat.st_mtime, stat.st_size, entry.path))
+    self._size = sum(size for _, size, _ in entries)
+    # least recently used first
+    entries.sort()
+    for _, size, path in entries:
+      if self._size <= self.max_size:
+        break
+      try:
+        os.remove(path)
+      except OSError:
+        continue
+      self._size -= size
+
+class _ContentKeys:
+  """ Describes callables and the values they depend on, in order to
+  compute the keys of the content-addressed caches below.
+  """
+  def __init__(self, disk_cache):
+    self._disk_cache = disk_cache
+    self._source_hashes = {}
+    self._tool_versions = {}
+    self._file_hashes = {}
+    self.hits = 0
+    self.misses = 0
+
+  def _get_source_hash(self, item):
+    name = getattr(item, 'id', None) or item.name
+    if name not in self._source_hashes:
+      func = item._func
+      try:
+        source = inspect.getsource(func).encode('utf-8')
+      except (OSError, TypeError):
+        source = func.__code__.co_code
+      self._source_hashes[name] = hashlib.sha256(source).hexdigest()
+    return self._source_hashes[name]
+
+  def _get_tool_versions(self, item):
+    if item.tool_versions is None:
+      return None
+    name = getattr(item, 'id', None) or item.name
+    if name not in self._tool_versions:
+      self._tool_versions[name] = item.tool_versions()
+    return self._tool_versions[name]
+
+  def _get_file_hash(self, path):
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = self._file_hashes.get(path, None)
+    if cached is None or cached[0] != signature:
+      sha = hashlib.sha256()
+      with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+          sha.update(chunk)
+      cached = self._file_hashes[path] = (signature, sha.hexdigest())
+    return cached[1]
+
+  def _describe_value(self, value):
+    """ A JSON serializable description of value. Raises TypeError
+    if value can't be described.
+    """
+    if isinstance(value, str):
+      if os.path.isfile(value):
+        return {'file': value, 'sha256': self._get_file_hash(value)}
+      return value
+    if value is None or isinstance(value, (bool, int, float)):
+      return value
+    if isinstance(value, (list, tuple)):
+      return [self._describe_value(item) for item in value]
+    if isinstance(value, dict):
+      return [[self._describe_value(k), self._describe_value(v)]
+                                    for k, v in sorted(value.items())]
+    raise TypeError(f'Can\'t describe value of {type(value)}.')
+
+  def _describe_conditions(self, conditions):
+    return [[c.name, self._get_source_hash(c), self._get_tool_versions(c)]
+                                                        for c in conditions]
+
+  def _describe_values(self, values):
+    return [[name, self._describe_value(value)] for name, value in values]
+
+  @staticmethod
+  def _hash(description):
+    description = json.dumps(description, sort_keys=True)
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+  @staticmethod
+  def get_max_age(inputs):
+    """ Returns the smallest `max_age` of the conditions in inputs, in
+    seconds, or None if none of them has a `max_age`.
+
+    inputs: tuple (conditions, values) as returned by
+        `CheckRunner._get_inputs`.
+    """
+    conditions, _ = inputs
+    ages = [c.max_age for c in conditions if c.max_age is not None]
+    return min(ages) if ages else None
+
+  def _get_entry(self, key, max_age):
+    # Entries are stored with the time they were written, the DiskCache
+    # modification time is the last use.
+    data = self._disk_cache.get(key)
+    if data is None:
+      return None
+    try:
+      written, data = pickle.loads(data)
+    except Exception as e:
+      logging.debug(f'Can\'t load cache entry {key}: {e}')
+      return None
+    if max_age is not None and time.time() - written > max_age:
+      return None
+    return data
+
+  def _set_entry(self, key, data):
+    self._disk_cache.set(key, pickle.dumps((time.time(), data)))
+
+class ConditionCache(_ContentKeys):
+  """ Persists the values of conditions that opt in with
+  `@condition(persist=...)` in a DiskCache.
+
+  The key of a value is a hash of:
+    * the fontbakery version
+    * the source code of the condition and of all conditions it depends on
+    * the `tool_versions` of these conditions
+    * all values the condition depends on, for files (e.g. font files)
+      these are the path and a hash of the file contents.
+
+  The CheckRunner describes these inputs, see `CheckRunner._get_inputs`.
+
+  A value is not reused when it was written longer ago than the
+  smallest `max_age` of these conditions.
+  """
+  def get_key(self, condition, inputs):
+    """ Returns the key for the value of condition or None if it
+    can't be cached.
+
+    inputs: tuple (conditions, values) as returned by
+        `CheckRunner._get_inputs`.
+    """
+    conditions, values = inputs
+    try:
+      return self._hash({
+        'fontbakery': fontbakery_version
+      , 'condition': condition.name
+      , 'conditions': self._describe_conditions(conditions)
+      , 'values': self._describe_values(values)
+      })
+    except Exception as e:
+      # e.g. a tool used by `tool_versions` is not installed
+      logging.debug(f'Not caching condition {condition}: {e}')
+      return None
+
+  def get(self, condition, key, max_age=None):
+    """ Returns a tuple (found, value)
+
+    max_age: in seconds, older values are not found, see `get_max_age`.
+    """
+    data = self._get_entry(key, max_age)
+    if data is not None:
+      try:
+        value = condition.persist_protocol.loads(data)
+      except Exception as e:
+        logging.debug(f'Can\'t load cached value for {condition}: {e}')
+      else:
+        self.hits += 1
+        return True, value
+    self.misses += 1
+    return False, None
+
+  def set(self, condition, key, value):
+    try:
+      data = condition.persist_protocol.dumps(value)
+    except Exception as e:
+      logging.debug(f'Can\'t persist value of {condition}: {e}')
+      return
+    self._set_entry(key, data)
+
+class ResultCache(_ContentKeys):
+  """ Persists the events of check executions in a DiskCache. The
+  CheckRunner replays them instead of executing a check again, when
+  none of its inputs changed.
+
+  The key of a result is a hash of:
+    * the fontbakery version
+    * the identity of the check execution, see `Spec.serialize_identity`
+    * the source code and `tool_versions` of the check and of all
+      conditions it depends on
+    * all values the check depends on, like for `ConditionCache`
+    * the files in the directories of the files among these values
+      that match the `sibling_files` of the specification, e.g. a
+      description file next to the checked files. The checked files
+      themselves are only included where they are used.
+
+  Results of checks that depend on `volatile` checks or conditions
+  are not cached, results of checks that depend on conditions with a
+  `max_age` are replayed for at most that long.
+  """
+  def __init__(self, disk_cache, ignored=()):
+    """
+      ignored: paths of files that are never described as siblings,
+          e.g. the reports written by the run.
+    """
+    super(ResultCache, self).__init__(disk_cache)
+    self._ignored = frozenset(map(os.path.abspath, ignored))
+    self._siblings = {}
+
+  def _get_files(self, value):
+    if isinstance(value, str):
+      if os.path.isfile(value):
+        yield os.path.abspath(value)
+    elif isinstance(value, (list, tuple)):
+      for item in value:
+        yield from self._get_files(item)
+
+  def get_files(self, value):
+    """ Returns a frozenset of the absolute paths of the files in value,
+    which may also be a (nested) list or tuple. """
+    return frozenset(self._get_files(value))
+
+  def _describe_siblings(self, directory, ignored, patterns):
+    # The names of the siblings are kept while the directory doesn't
+    # change, their hashes are revalidated by _get_file_hash.
+    key = (directory, ignored, patterns)
+    mtime = os.stat(directory).st_mtime_ns
+    cached = self._siblings.get(key, None)
+    if cached is None or cached[0] != mtime:
+      paths = []
+      for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        if not entry.is_file() or entry.path in ignored \
+                               or entry.path in self._ignored \
+                               or not any(fnmatch.fnmatchcase(entry.name, p)
+                                                        for p in patterns):
+          continue
+        paths.append(entry.path)
+      cached = self._siblings[key] = (mtime, paths)
+    return [[os.path.basename(path), self._get_file_hash(path)]
+                                                    for path in cached[1]]
+
+  def get_key(self, identity, check, inputs, ignored=frozenset()
+                                                    , sibling_files=()):
+    """ Returns the key for the result of check or None if it
+    can't be cached.
+
+    identity: the serialized identity of the check execution.
+    inputs: tuple (conditions, values) as returned by
+        `CheckRunner._get_inputs`.
+    ignored: a frozenset of absolute paths of files that are not
+        described as siblings of the used files.
+    sibling_files: a tuple of `fnmatch` patterns, the names of the
+        files next to the used files that are described as siblings.
+    """
+    conditions, values = inputs
+    if check.volatile or any(c.volatile for c in conditions):
+      return None
+    try:
+      directories = set()
+      for _, value in values:
+        directories.update(map(os.path.dirname, self._get_files(value)))
+      return self._hash({
+        'fontbakery': fontbakery_version
+      , 'identity': identity
+      , 'check': [self._get_source_hash(check)
+                                        , self._get_tool_versions(check)]
+      , 'conditions': self._describe_conditions(conditions)
+      , 'values': self._describe_values(values)
+      , 'siblings': [[directory, self._describe_siblings(directory, ignored
+                                                        , sibling_files)]
+                                        for directory in sorted(directories)]
+      })
+    except Exception as e:
+      logging.debug(f'Not caching result of {check}: {e}')
+      return None
+
+  def get(self, key, max_age=None):
+    """ Returns the tuple of events (status, message) stored at key,
+    or None.
+
+    max_age: in seconds, older results are not found, see `get_max_age`.
+    """
+    data = self._get_entry(key, max_age)
+    if data is not None:
+      try:
+        events = pickle.loads(data)
+      except Exception as e:
+        logging.debug(f'Can\'t load cached result: {e}')
+      else:
+        self.hits += 1
+        return events
+    self.misses += 1
+    return None
+
+  def set(self, key, events):
+    events = tuple(events)
+    try:
+      data = pickle.dumps(events)
+    except Exception:
+      # reporters use the string representation of messages anyways
+      data = pickle.dumps(tuple((status, str(message))
+                                        for status, message in events))
+    self._set_entry(key, data)
@@ -12,6 +12,7 @@ Conditions) and MAYBE in *customized* reporters e.g. subclasses.
 
 """
 import inspect
+import pickle
 
 from functools import wraps
 
@@ -64,6 +65,14 @@ class FontbakeryCallable:
     return tuple(argspec.args[-len(argspec.defaults):] \
              if argspec.defaults is not None else [])
 
+  @property
+  def is_async(self):
+    """ True if the function is defined with `async def`, i.e. it
+    returns a coroutine or an asynchronous generator.
+    """
+    return inspect.iscoroutinefunction(self._func) \
+                                  or inspect.isasyncgenfunction(self._func)
+
   def __call__(self, *args, **kwds):
     """ Each call to __call__ with the same arguments must return
     the same result.
@@ -101,14 +110,65 @@ class FontBakeryCondition(FontbakeryCallable):
        name = None, # very short text
        description = None, # short text
        documentation=None, # long text, markdown?
-       force=False
+       force=False,
+       io_bound=False, # see FontBakeryCheck
+       max_age=None,
+       memory=None,
+       persist=False,
+       prefetch=False,
+       tool_versions=None,
+       volatile=False # see FontBakeryCheck
       ):
+    """
+    max_age: in seconds, for conditions that depend on something that
+    changes over time, e.g. data downloaded from a website. Persisted
+    values of the condition, and replayed results of the checks using it,
+    are reused for at most this long. None for no limit.
+
+    memory: a function returning the estimated bytes of memory used by a
+    value of the condition, e.g. a parsed font. The values of conditions
+    with `memory` are kept within the `memory_budget` of the
+    `ExecutionOptions`, the least recently used are dropped first and
+    evaluated again when a check needs them. Only use this for large
+    values that can be created again from scratch.
+
+    persist: if truthy, the value of the condition can be stored in a
+    persistent cache (see `fontbakery.cache`) and reused in later runs
+    when none of its inputs changed. If True, the value is stored using
+    `pickle`, otherwise `persist` is an object with the methods
+    `dumps(value) -> bytes` and `loads(bytes) -> value`. Only use this
+    for conditions that are expensive to compute.
+
+    prefetch: if True, the condition may be evaluated in a background
+    thread before the check that uses it starts, see the `prefetch` of
+    the `ExecutionOptions`. Only use this for conditions that are expensive and
+    create their value from scratch, e.g. by parsing a file, without
+    using objects that checks may use at the same time.
+
+    tool_versions: a function without arguments, returning a JSON
+    serializable description of the versions of the tools that are used
+    to compute the condition, e.g. `{"ttfautohint": "1.8.2"}`. When the
+    description changes, persisted values are not reused anymore.
+    """
     super(FontBakeryCondition, self).__init__(func)
     # self.id = id
     self.name = func.__name__ if name is None else name
     self.description, self.documentation = get_doc_desc(
                                         func, description, documentation)
     self.force = force
+    self.io_bound = io_bound
+    self.max_age = max_age
+    self.memory = memory
+    self.persist = persist
+    self.prefetch = prefetch
+    self.tool_versions = tool_versions
+    self.volatile = volatile
+
+  @property
+  def persist_protocol(self):
+    if not self.persist:
+      return None
+    return pickle if self.persist is True else self.persist
 
 class FontBakeryCheck(FontbakeryCallable):
   def __init__(
@@ -133,6 +193,9 @@ class FontBakeryCheck(FontbakeryCallable):
        #example_failures=None, # A reference to some font or family that originally failed due to
        #                       # the problems that this check tries to detect and report.
        #priority=None
+       io_bound=False, # mostly waiting for network or subprocesses
+       tool_versions=None, # see FontBakeryCondition
+       volatile=False
        ):
     """This is the base class for all checks. It will usually
     not be used directly to create check instances, rather
@@ -191,6 +254,31 @@ class FontBakeryCheck(FontbakeryCallable):
 
     priority: inherited from our legacy checks. Need to see if we
     use this at all now.
+
+    rationale: text, explains why the check is needed.
+
+    misc_metadata: a dict of free-form metadata. Keys used by the
+    CheckRunner:
+      * 'timeout': seconds after which the check is stopped and
+        reported as an ERROR, overrides the timeout of the runner.
+        None to never stop the check.
+
+    io_bound: if True, the check spends most of its time waiting
+    for the network or for a subprocess. The CheckRunner may then
+    execute it in a thread pool, concurrently with other checks.
+    Hence, it should not modify its arguments. This flag is also
+    accepted by conditions, an io_bound condition may be evaluated
+    ahead of time, before any check asks for its value.
+
+    tool_versions: like for conditions, a function returning a JSON
+    serializable description of the versions of the tools the check
+    uses. Stored results of the check are not replayed when it changes.
+
+    volatile: if True, the result depends on something that can change
+    without any change of the checked files, e.g. a web service. Results
+    of volatile checks are never replayed from a `fontbakery.cache.ResultCache`.
+    This flag is also accepted by conditions, results of checks using a
+    volatile condition are not replayed either.
     """
     super(FontBakeryCheck, self).__init__(checkfunc)
     self.id = id
@@ -203,6 +291,11 @@ class FontBakeryCheck(FontbakeryCallable):
     # self._arguments_setup = arguments_setup
     # self._conditions_setup = conditions_setup
     self._advancedMessageSetup = advancedMessageSetup
+    self.rationale = rationale
+    self.misc_metadata = misc_metadata or {}
+    self.io_bound = io_bound
+    self.tool_versions = tool_versions
+    self.volatile = volatile
 
   # This was problematic. See: https://github.com/googlefonts/fontbakery/issues/2194
   # def __str__(self):
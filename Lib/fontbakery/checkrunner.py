@@ -11,14 +11,23 @@ Domain specific knowledge should be encoded only in the Spec (Checks,
 Conditions) and MAYBE in *customized* reporters e.g. subclasses.
 
 """
+import asyncio
+import fnmatch
 import types
 from collections import OrderedDict, Counter
 from functools import partial
 from itertools import chain
 import importlib
+import importlib.util
+import inspect
 import traceback
 import json
 import logging
+import os
+from stat import S_ISREG
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Iterable
 
 from fontbakery.callable import ( FontbakeryCallable
@@ -26,6 +35,8 @@ from fontbakery.callable import ( FontbakeryCallable
                                 , FontBakeryCondition
                                 , FontBakeryExpectedValue
                                 )
+from fontbakery.constants import PriorityLevel
+from fontbakery.schedule import cheapest_first, select_within_budget
 
 class Status:
   """ If you create a custom Status symbol, please keep in mind that
@@ -83,6 +94,10 @@ class Status:
 
   __repr__ = __str__
 
+  def __reduce__(self):
+    # unpickling must return the registered instance, not a new one.
+    return (Status, (self.__name, self.__weight))
+
 # Status messages of the check runner protocol
 
 # Structuring statuses
@@ -146,8 +161,27 @@ ENDSECTION = Status('ENDSECTION', -3)
 # results of all checks in all sections.
 END = Status('END', -5)
 
+# Timing of a check execution, only with `ExecutionOptions(timing=True)`.
+# Directly before ENDCHECK. Message is a dict, see `CheckRunner._collect_timed`.
+# The weight is below START, so that reporters showing structuring
+# statuses down to a threshold don't render it.
+TIMING = Status('TIMING', -7)
+
+def _rebuild_runner_error(cls, message, traceback):
+  error = cls.__new__(cls)
+  Exception.__init__(error, message)
+  error.message = message
+  if traceback is not None:
+    error.traceback = traceback
+  return error
+
 class FontBakeryRunnerError(Exception):
-  pass
+  def __reduce__(self):
+    # The constructors of the subclasses take checks, conditions and the
+    # original exception, these can't be sent to another process.
+    # Reporters only need the message and the traceback.
+    return (_rebuild_runner_error, (type(self), str(self)
+                                  , getattr(self, 'traceback', None)))
 
 class CircularDependencyError(FontBakeryRunnerError):
   pass
@@ -216,6 +250,10 @@ class NamespaceError(FontBakeryRunnerError):
 class ValueValidationError(FontBakeryRunnerError):
   pass
 
+# time.thread_time is new in Python 3.7, before that the CPU time of
+# the process is used, which includes the time of other threads.
+_cpu_clock = getattr(time, 'thread_time', time.process_time)
+
 # TODO: this should be part of FontBakeryCheck and check.conditions
 # should be a tuple (negated, name)
 def is_negated(name):
@@ -226,13 +264,298 @@ def is_negated(name):
     return True, stripped[1:].strip()
   return False, stripped
 
+class ExecutionPlan:
+  """ The order of check executions: a sequence of identities
+  (section, check, iterargs).
+
+  Can be used like a tuple, but the index of an identity is looked up
+  in constant time. Plans are built by `Spec.get_execution_plan` once
+  per specification, iterarg sizes and check filters.
+
+  A pickled plan contains only the keys of its identities, see `get_key`,
+  so it doesn't depend on pickling checks. After unpickling, `bind` it
+  to the specification to get the identities back.
+  """
+  def __init__(self, identities=(), keys=None):
+    self._identities = tuple(identities)
+    if keys is None:
+      keys = tuple(map(self.get_key, self._identities))
+    self._set_keys(keys)
+
+  def _set_keys(self, keys):
+    self._keys = keys
+    self._indexes = {key: index for index, key in enumerate(keys)}
+
+  @staticmethod
+  def get_key(identity):
+    """ A hashable, picklable key for identity. """
+    section, check, iterargs = identity
+    return (str(section), check.id, tuple(iterargs))
+
+  @property
+  def keys(self):
+    return self._keys
+
+  @property
+  def identities(self):
+    if self._identities is None:
+      raise TypeError('ExecutionPlan was unpickled and is not bound'
+                      ' to a specification yet.')
+    return self._identities
+
+  def bind(self, spec):
+    """ Returns a plan with the identities of spec for the keys
+    of this plan. """
+    identities = []
+    for section_key, check_id, iterargs in self._keys:
+      check, section = spec.get_check(check_id)
+      if str(section) != section_key:
+        raise ValueError(f'Check {check_id} is not in section {section_key}.')
+      identities.append((section, check, iterargs))
+    return ExecutionPlan(identities, self._keys)
+
+  def __getstate__(self):
+    return {'keys': self._keys}
+
+  def __setstate__(self, state):
+    self._identities = None
+    self._set_keys(state['keys'])
+
+  def __len__(self):
+    return len(self._keys)
+
+  def __iter__(self):
+    return iter(self.identities)
+
+  def __getitem__(self, index):
+    return self.identities[index]
+
+  def __contains__(self, identity):
+    try:
+      return self.get_key(identity) in self._indexes
+    except (AttributeError, TypeError, ValueError):
+      return False
+
+  def index(self, identity):
+    try:
+      return self._indexes[self.get_key(identity)]
+    except KeyError:
+      raise ValueError(f'{identity} is not in the execution plan.')
+
+  def __repr__(self):
+    return f'<ExecutionPlan: {len(self)} identities>'
+
+class DerivedIterable:
+  """ The values of a condition for all values of the iterargs it uses,
+  e.g. "ttFonts" of the condition "ttFont", see `Spec.derived_iterables`.
+
+  Can be used like a tuple. The values are evaluated when it is used
+  first, then they are shared by all checks and conditions using it.
+  Pickles as a tuple.
+  """
+  def __init__(self, derive):
+    """ derive: a function returning an iterable of the values. """
+    self._derive = derive
+    self._items = None
+    self._lock = threading.Lock()
+
+  @property
+  def items(self):
+    items = self._items
+    if items is None:
+      with self._lock:
+        if self._items is None:
+          # on error, the next use tries again
+          self._items = tuple(self._derive())
+          self._derive = None
+        items = self._items
+    return items
+
+  def __len__(self):
+    return len(self.items)
+
+  def __iter__(self):
+    return iter(self.items)
+
+  def __getitem__(self, index):
+    return self.items[index]
+
+  def __eq__(self, other):
+    if isinstance(other, DerivedIterable):
+      other = other.items
+    return self.items == other
+
+  def __hash__(self):
+    return hash(self.items)
+
+  def __reduce__(self):
+    return tuple, (self.items, )
+
+  def __repr__(self):
+    if self._items is None:
+      return '<DerivedIterable: not evaluated>'
+    return f'<DerivedIterable: {len(self._items)} items>'
+
+class ExecutionOptions:
+  """ How a CheckRunner executes the checks, see `CheckRunner(options=...)`.
+  """
+  _names = ('jobs', 'shard_by', 'threads', 'prefetch', 'timeout'
+          , 'release_conditions', 'max_resident', 'memory_budget', 'timing'
+          , 'fail_fast', 'cheapest_first', 'time_budget', 'stop_at_budget')
+
+  def __init__(self
+             , jobs=1
+             , shard_by=None
+             , threads=0
+             , prefetch=0
+             , timeout=None
+             , release_conditions=False
+             , max_resident=None
+             , memory_budget=None
+             , timing=False
+             , fail_fast=None
+             , cheapest_first=False
+             , time_budget=None
+             , stop_at_budget=False
+             ):
+    """
+      jobs: number of worker processes. If bigger than 1, the order is
+          partitioned by the `shard_by` iterarg and each shard runs in
+          a worker process. Checks that don't use `shard_by` run in this
+          process. See `fontbakery.multiproc`.
+      shard_by: name of the iterarg used to partition the order when
+          `jobs` is bigger than 1, defaults to the first iterarg of spec.
+      threads: size of the thread pool for `io_bound` checks and conditions.
+          If 0, these run in line with all other checks.
+      prefetch: number of upcoming identities of the order whose `prefetch`
+          and `io_bound` conditions are evaluated in background threads,
+          while the current check runs in this process. The values end up
+          in the same condition cache, a check that needs one before it is
+          ready waits for it. With `max_resident`, keep the lookahead
+          smaller than the identities of that many `shard_by` values.
+          Not used when the checks run in worker processes.
+      timeout: seconds after which a check is stopped and reported as
+          an ERROR, None for no limit. A check can override it with a
+          'timeout' in its `misc_metadata`. Checks with a timeout are
+          executed in a child process, see `fontbakery.multiproc.call_isolated`.
+          Their conditions are evaluated in this process, except for
+          persisted conditions, which are isolated with this timeout too.
+          That is a fork for each of these, set a timeout only for the
+          checks that need one if that is too slow. Forking while
+          `threads` or `prefetch` are running may block the child until
+          the timeout, see `call_isolated`.
+      release_conditions: if True, the value of a condition is dropped as
+          soon as the last check of the order that can use it finished.
+      max_resident: keep the conditions of at most this many values of the
+          `shard_by` iterarg in memory, least recently used are dropped
+          first and evaluated again if needed. None for no limit.
+      memory_budget: bytes of memory for the values of the conditions that
+          estimate their `memory`, e.g. the parsed fonts of "ttFont". The
+          least recently used values are dropped first when the budget is
+          exceeded and evaluated again if a check needs them. Derived
+          iterables of these conditions are generators then, as with
+          `max_resident`. See `CheckRunner.memory_pool_stats`. None for
+          no limit.
+      timing: if True, a TIMING event with the wall and CPU time of the
+          check and of the conditions it evaluated is emitted before each
+          ENDCHECK. Its 'replayed' is True if the result was not executed
+          but replayed, e.g. from the `result_cache` of the CheckRunner.
+      fail_fast: a `PriorityLevel` or None. If set, the checks are ordered
+          by their 'priority' in `misc_metadata`, most important first,
+          and the run ends after the first check of at least this priority
+          that results in FAIL or ERROR. Checks without a priority are
+          NORMAL.
+      cheapest_first: if True, checks with the same section and iterargs
+          are ordered by their estimated duration, cheapest first.
+          Requires the `duration_profile` of the CheckRunner.
+      time_budget: seconds. The order is reduced to the identities that
+          are estimated to fit in time_budget, see
+          `fontbakery.schedule.select_within_budget`, chosen by the
+          'priority' in `misc_metadata`, like fail_fast, and by the
+          estimates of the `duration_profile` of the CheckRunner, which
+          it requires. Checks
+          without an estimate take the mean of all estimates, with an
+          empty profile all identities are selected.
+      stop_at_budget: if True, the checks are ordered by their priority,
+          like with fail_fast, and when time_budget seconds passed since
+          the run started no more checks are executed. The remaining
+          identities are reported as SKIP. Requires time_budget.
+    """
+    if stop_at_budget and time_budget is None:
+      raise SetupError('stop_at_budget requires time_budget.')
+    self.jobs = max(1, jobs or 1)
+    self.shard_by = shard_by
+    self.threads = max(0, threads or 0)
+    self.prefetch = max(0, prefetch or 0)
+    self.timeout = timeout
+    self.release_conditions = release_conditions
+    self.max_resident = max_resident
+    self.memory_budget = memory_budget
+    self.timing = timing
+    self.fail_fast = fail_fast
+    self.cheapest_first = cheapest_first
+    self.time_budget = time_budget
+    self.stop_at_budget = stop_at_budget
+
+  def replace(self, **changes):
+    """ Returns a copy with changes, arguments like those of the
+    constructor. """
+    kwds = {name: getattr(self, name) for name in self._names}
+    kwds.update(changes)
+    return ExecutionOptions(**kwds)
+
 class CheckRunner:
   def __init__(self, spec, values
              , values_can_override_spec_names=True
              , custom_order=None
              , explicit_checks=None
              , exclude_checks=None
+             , options=None
+             , condition_cache=None
+             , result_cache=None
+             , duration_profile=None
+             , coordinator=None
+             , stream=None
+             , journal=None
+             , shared_cache=None
              ):
+    """
+      options: `ExecutionOptions`, how the checks are executed. By
+          default they run one after the other in this process.
+      condition_cache: a `fontbakery.cache.ConditionCache` to persist
+          the values of conditions that opt in via `persist` across runs.
+      result_cache: a `fontbakery.cache.ResultCache` to replay the events
+          of checks whose inputs did not change since an earlier run.
+      duration_profile: a `fontbakery.schedule.DurationProfile`, updated
+          with the TIMING of the executed (not replayed) checks at the end
+          of each run and used to start the longest shards first when the
+          `jobs` of options is bigger than 1. Requires the `timing` of
+          options.
+      coordinator: a `fontbakery.distribute.Coordinator`, if set the
+          checks are executed by the workers connected to it instead
+          of this process.
+      stream: name of an iterarg whose values, e.g. `values['fonts']`
+          for "font", arrive while the run is going on: any iterable, e.g.
+          a generator. `run` consumes it and executes the checks of each
+          value as soon as it arrives. Checks that use all values, e.g.
+          via "fonts" or "ttFonts", are executed after the iterable is
+          exhausted. The START event has an empty order, reporters learn
+          the identities from their STARTCHECK events. The streamed values
+          are validated at the end, see `_run_streamed`. Can't be used
+          with jobs, coordinator, release_conditions or result_cache.
+      journal: a `fontbakery.journal.Journal`. The events of each check
+          execution are appended to it when the check ended. Identities
+          that it already has a record for, e.g. when it was resumed after
+          a crash, are not executed again, their events are replayed from
+          the journal. Its records must be identities of this run's order,
+          otherwise a SetupError is raised. Can't be used with stream.
+      shared_cache: a dict shared by runners of the same spec, each with
+          its own values, e.g. the fonts of different families, but with
+          the same names in values. It keeps the results of the conditions
+          and the events of the checks that depend on no iterarg and on
+          none of the values, so that these are evaluated only once for
+          all runners. See `_is_shared`.
+    """
     # TODO: transform all iterables that are list like to tuples
     # to make sure that they won't change anymore.
     # Also remove duplicates from list like iterables
@@ -241,10 +564,47 @@ class CheckRunner:
     self._explicit_checks = explicit_checks
     self._exclude_checks = exclude_checks
     self._iterargs = OrderedDict()
+    if stream is not None and stream not in spec.iterargs:
+      raise SetupError(f'Can\'t stream "{stream}", it is not an iterarg.')
+    self._stream = stream
     for singular, plural in spec.iterargs.items():
-      values[plural] = tuple(values[plural])
+      if singular == stream:
+        # grows while the run consumes the iterable
+        self._stream_source = values[plural]
+        values[plural] = []
+      else:
+        values[plural] = tuple(values[plural])
       self._iterargs[singular] = len(values[plural])
 
+    if options is None:
+      options = ExecutionOptions()
+    self._options = options
+    shard_by = options.shard_by
+    if shard_by is None and self._iterargs:
+      shard_by = next(iter(self._iterargs))
+    elif shard_by is not None and shard_by not in self._iterargs:
+      raise SetupError(f'Can\'t shard by "{shard_by}", it is not an iterarg.')
+    self._shard_by = shard_by
+    self._condition_cache = condition_cache
+    self._result_cache = result_cache
+    if duration_profile is not None and not options.timing:
+      raise SetupError('duration_profile requires timing.')
+    if options.cheapest_first and duration_profile is None:
+      raise SetupError('cheapest_first requires duration_profile.')
+    if options.time_budget is not None and duration_profile is None:
+      raise SetupError('time_budget requires duration_profile.')
+    self._duration_profile = duration_profile
+    self._coordinator = coordinator
+    if stream is not None:
+      for name, value in (('jobs', options.jobs > 1)
+                        , ('coordinator', coordinator is not None)
+                        , ('release_conditions', options.release_conditions)
+                        , ('result_cache', result_cache is not None)
+                        , ('journal', journal is not None)
+                        , ('time_budget', options.time_budget is not None)):
+        if value:
+          raise SetupError(f'stream can\'t be used with {name}.')
+
     if not values_can_override_spec_names:
       for name in values:
         if spec.has(name) and spec.get_type(name) != 'expected_values':
@@ -255,16 +615,57 @@ class CheckRunner:
 
     self._spec = spec
     self._spec.test_dependencies()
-    valid, message = self._spec.validate_values(values)
+    valid, message = self._spec.validate_values({name: value
+                  for name, value in values.items() if stream is None
+                                      or name != spec.iterargs[stream]})
     if not valid:
       raise ValueValidationError('Validation of expected values failed:'
                       '\n{}'.format(message))
     self._values = values
+    if result_cache is not None:
+      # The checked files are only part of the keys of the results that
+      # use them, not of all results in their directory.
+      self._checked_files = result_cache.get_files(
+                      [values[plural] for plural in spec.iterargs.values()])
 
     self._cache = {
       'conditions': {}
     , 'order': None
     }
+    # used to evaluate each condition only once, even if it is requested
+    # from multiple threads at the same time.
+    self._condition_locks = {}
+    self._condition_locks_lock = threading.Lock()
+    # condition key => timing of the evaluation, until a check claims it
+    self._condition_timings = {}
+    # the timing record of the check that is executed in a thread
+    self._timing_local = threading.local()
+    # callable => argument binder, see _get_binder
+    self._binders = {}
+    # index of the last identity of the order using a condition =>
+    # condition keys, see _get_release_schedule
+    self._release_schedule = {}
+    # shard_by index => set of condition keys, least recently used first
+    self._resident = OrderedDict()
+    # condition key => estimated bytes, least recently used first
+    self._pool = OrderedDict()
+    self._pool_bytes = 0
+    # keys dropped from the pool, to count the reloads
+    self._pool_evicted = set()
+    self._pool_stats = Counter()
+    self._shared_cache = shared_cache
+    # check or condition => bool, see _is_shared
+    self._shared = {}
+    self._journal = journal
+    # the identities of order that have a record in journal
+    self._journaled = ExecutionPlan()
+    if journal is not None:
+      try:
+        self._journaled = ExecutionPlan(self.check_order(
+                                  spec.deserialize_order(journal.keys())))
+      except (KeyError, ValueError) as error:
+        raise SetupError(f'The journal {journal.path} is not of the checks'
+                         f' of this run: {error}')
 
   @property
   def iterargs(self):
@@ -279,6 +680,18 @@ class CheckRunner:
   def specification(self):
     return self._spec
 
+  @property
+  def options(self):
+    return self._options
+
+  @property
+  def jobs(self):
+    return self._options.jobs
+
+  @property
+  def shard_by(self):
+    return self._shard_by
+
   def _check_result(self, result):
     """ Check that the check returned a well formed result:
           a tuple (<Status>, message)
@@ -337,6 +750,8 @@ class CheckRunner:
       # A check can be either a normal function that returns one Status or a
       # generator that yields one or more. The latter will return a generator
       # object that we can detect with types.GeneratorType.
+      if check.is_async:
+        raise TypeError(f'{check} is asynchronous, use AsyncCheckRunner.')
       result = check(**args)  # Might raise.
 
       if isinstance(result, types.GeneratorType):
@@ -351,6 +766,34 @@ class CheckRunner:
 
     yield self._check_result(result)
 
+  def _get_check_timeout(self, check):
+    return check.misc_metadata.get('timeout', self._options.timeout)
+
+  def _exec_check_isolated(self, check, args, timeout):
+    """ Like `_exec_check` but in a child process, which is stopped
+    after timeout seconds. """
+    from fontbakery.multiproc import call_isolated, portable_message
+    results = call_isolated(lambda: ((status, portable_message(message))
+                  for status, message in self._exec_check(check, args))
+                , timeout)
+    try:
+      for sub_result in results:
+        yield sub_result
+    except TimeoutError:
+      yield ERROR, (f'The check did not finish within {timeout} seconds'
+                    ' and was stopped.')
+    except Exception as e:
+      yield ERROR, FailedCheckError(e)
+
+  def _call_condition_isolated(self, condition, args):
+    """ Persisted conditions can be pickled, hence they can be
+    evaluated in a child process, which is stopped after the timeout. """
+    from fontbakery.multiproc import call_isolated
+    protocol = condition.persist_protocol
+    data, = call_isolated(lambda: (protocol.dumps(condition(**args)), )
+                        , self._options.timeout)
+    return protocol.loads(data)
+
   def _evaluate_condition(self, name, iterargs, path=None):
     if path is None:
       # top level call
@@ -366,6 +809,12 @@ class CheckRunner:
       error = MissingConditionError(name, err)
       return error, None
 
+    cache_key, found, value = self._load_persisted_condition(condition
+                                                              , iterargs)
+    if found:
+      path.pop()
+      return None, value
+
     try:
       args = self._get_args(condition, iterargs, path)
     except Exception as err:
@@ -373,37 +822,366 @@ class CheckRunner:
       return error, None
 
     path.pop()
+    started = self._get_clock() if self._options.timing else None
     try:
-      return None, condition(**args)
+      if condition.is_async:
+        raise TypeError(f'{condition} is asynchronous, use AsyncCheckRunner.')
+      if self._options.timeout and condition.persist:
+        value = self._call_condition_isolated(condition, args)
+      else:
+        value = condition(**args)
     except Exception as err:
       error = FailedConditionError(condition, err)
       return error, None
-
-  def _filter_condition_used_iterargs(self, name, iterargs):
-    allArgs = set()
-    names = list(self._spec.conditions[name].args)
-    while(names):
+    finally:
+      if started is not None:
+        wall, cpu = self._get_elapsed(started)
+        self._condition_timings[(name, iterargs)] = {
+            'name': name, 'iterargs': iterargs, 'wall': wall, 'cpu': cpu}
+    if cache_key is not None:
+      self._condition_cache.set(condition, cache_key, value)
+    return None, value
+
+  def _get_inputs(self, item, iterargs):
+    """ Returns a tuple (conditions, values) describing everything the
+    result of item, a condition or a check, depends on: all conditions
+    of its dependency graph and the (name, value) pairs of the values
+    and iterargs that are used by these. Both are sorted by name.
+    """
+    iterargsDict = dict(iterargs)
+    conditions = {}
+    names = list(item.args)
+    if isinstance(item, FontBakeryCondition):
+      conditions[item.name] = item
+    else:
+      names += [name for _, name in map(is_negated, item.conditions)]
+    values = {}
+    seen = set()
+    while names:
       name = names.pop()
-      if name in allArgs:
+      if name in seen:
+        continue
+      seen.add(name)
+      if name in self._values:
+        values[name] = self._values[name]
         continue
-      allArgs.add(name)
-      if name in self._spec.conditions:
-        names += self._spec.conditions[name].args
+      resolved_name = self._spec.resolve_alias(name)
+      if resolved_name != name:
+        names.append(resolved_name)
+        continue
+      nametype = self._spec.get_type(name, None)
+      if nametype == 'iterargs' and name in iterargsDict:
+        values[name] = self.get_iterarg(name, iterargsDict[name])
+      elif nametype == 'conditions':
+        conditions[name] = self._spec.conditions[name]
+        names += conditions[name].args
+      elif nametype == 'derived_iterables':
+        condition_name, _ = self._spec.get(name)
+        names.append(condition_name)
+        derived_condition = self._spec.conditions.get(condition_name, None)
+        if derived_condition is not None:
+          for singular in self._spec.get_iterargs(derived_condition):
+            plural = self._spec.iterargs[singular]
+            values[plural] = self._values[plural]
+      elif nametype == 'expected_values':
+        expected_value = self._spec.get(name)
+        if expected_value.has_default:
+          values[name] = expected_value.default
+    return (tuple(condition for _, condition in sorted(conditions.items()))
+          , tuple(sorted(values.items())))
+
+  def _load_persisted_condition(self, condition, iterargs):
+    """ Returns a tuple (cache_key, found, value).
+
+    cache_key is None if the value of condition is not persisted.
+    """
+    if self._condition_cache is None or not condition.persist:
+      return None, False, None
+    inputs = self._get_inputs(condition, iterargs)
+    cache_key = self._condition_cache.get_key(condition, inputs)
+    if cache_key is None:
+      return None, False, None
+    found, value = self._condition_cache.get(condition, cache_key
+                                , self._condition_cache.get_max_age(inputs))
+    return cache_key, found, value
+
+  def _filter_condition_used_iterargs(self, name, iterargs):
+    allArgs = self._spec.get_dependencies(self._spec.conditions[name])
     return tuple( (name, value) for name, value in iterargs
                                                   if name in allArgs)
 
+  def _get_condition_lock(self, key):
+    with self._condition_locks_lock:
+      lock = self._condition_locks.get(key, None)
+      if lock is None:
+        # reentrant, so that circular dependencies are detected
+        # by _evaluate_condition instead of dead locking.
+        lock = self._condition_locks[key] = threading.RLock()
+      return lock
+
   def _get_condition(self, name, iterargs, path=None):
     # conditions are evaluated lazily
-    usecache = True #False
     used_iterargs = self._filter_condition_used_iterargs(name, iterargs)
     key = (name, used_iterargs)
-    if not usecache or key not in self._cache['conditions']:
-      err, val = self._evaluate_condition(name, used_iterargs, path)
-      if usecache:
-        self._cache['conditions'][key] = err, val
+    conditions = self._cache['conditions']
+    # can be dropped by another thread at any time, see _cache_condition
+    result = conditions.get(key, None)
+    if result is None:
+      with self._get_condition_lock(key):
+        # another thread may have evaluated it in the meantime
+        result = conditions.get(key, None)
+        if result is None:
+          result = self._get_shared_condition(key)
+          if result is None:
+            result = self._evaluate_condition(name, used_iterargs, path)
+            self._share_condition(key, result)
+          self._cache_condition(key, result)
     else:
-      err, val = self._cache['conditions'][key]
-    return err, val
+      if self._options.max_resident is not None:
+        self._touch_resident(key)
+      if self._options.memory_budget is not None:
+        self._touch_pooled(key)
+    if self._options.timing:
+      self._claim_condition_timing(key)
+    return result
+
+  @staticmethod
+  def _get_clock():
+    return time.perf_counter(), _cpu_clock()
+
+  def _get_elapsed(self, started):
+    """ Returns a tuple (wall, cpu) of seconds since started. """
+    wall, cpu = self._get_clock()
+    return wall - started[0], cpu - started[1]
+
+  def _claim_condition_timing(self, key):
+    """ The check that uses a condition first gets its timing. """
+    record = getattr(self._timing_local, 'record', None)
+    if record is None:
+      return
+    timing = self._condition_timings.pop(key, None)
+    if timing is not None:
+      record['conditions'].append(timing)
+
+  def _collect_timed(self, events):
+    """ Returns a tuple (events, timing) where events is a tuple and
+    timing a dict:
+      wall, cpu: seconds it took to collect events.
+      conditions: a list of dicts with name, iterargs, wall and cpu for
+          each condition that was used first by these events. The times
+          are without the conditions it depends on.
+      replayed: True if the events were replayed, not executed, see
+          `_set_replayed`.
+    """
+    record = {'conditions': [], 'replayed': False}
+    previous = getattr(self._timing_local, 'record', None)
+    self._timing_local.record = record
+    started = self._get_clock()
+    try:
+      events = tuple(events)
+    finally:
+      self._timing_local.record = previous
+    record['wall'], record['cpu'] = self._get_elapsed(started)
+    return events, record
+
+  def _set_replayed(self):
+    """ Marks the events that are collected by `_collect_timed` in this
+    thread as replayed, their timing is not a duration of the check. """
+    record = getattr(self._timing_local, 'record', None)
+    if record is not None:
+      record['replayed'] = True
+
+  def _is_shared(self, item):
+    """ True if the result of item, a check or a condition, is the same
+    for all runners using `shared_cache`: it depends on no iterarg, no
+    derived iterable and none of the values of the runner.
+    """
+    shared = self._shared.get(item, None)
+    if shared is None:
+      shared = self._shared[item] = True
+      for name in self._spec.get_dependencies(item):
+        resolved_name = self._spec.resolve_alias(name)
+        nametype = self._spec.get_type(resolved_name, None)
+        if name in self._values or resolved_name in self._values \
+                      or nametype in ('iterargs', 'derived_iterables') \
+                      or resolved_name != name and nametype == 'conditions' \
+                      and not self._is_shared(
+                                    self._spec.conditions[resolved_name]):
+          shared = self._shared[item] = False
+          break
+    return shared
+
+  def _get_shared_condition(self, key):
+    """ Returns the result of the condition key from `shared_cache`,
+    None if it is not there. """
+    if self._shared_cache is None or key[1]:
+      return None
+    condition = self._spec.conditions.get(key[0], None)
+    if condition is None or not self._is_shared(condition):
+      return None
+    return self._shared_cache.get(key, None)
+
+  def _share_condition(self, key, result):
+    if self._shared_cache is None or key[1]:
+      return
+    condition = self._spec.conditions.get(key[0], None)
+    if condition is not None and self._is_shared(condition):
+      self._shared_cache[key] = result
+
+  def _touch_resident(self, key):
+    """ Marks the shard_by index of key as most recently used and
+    returns the set of keys resident for that index. """
+    index = dict(key[1]).get(self._shard_by, None)
+    if index is None:
+      return None
+    with self._condition_locks_lock:
+      keys = self._resident.pop(index, None)
+      if keys is None:
+        keys = set()
+      self._resident[index] = keys
+      return keys
+
+  def _is_pooled(self, name):
+    """ True if the values of the condition name are kept within the
+    `memory_budget`. """
+    if self._options.memory_budget is None:
+      return False
+    condition = self._spec.conditions.get(name, None)
+    return getattr(condition, 'memory', None) is not None
+
+  def _touch_pooled(self, key):
+    """ Marks key as most recently used, if it is in the pool. """
+    with self._condition_locks_lock:
+      if key in self._pool:
+        self._pool.move_to_end(key)
+        self._pool_stats['hits'] += 1
+
+  def _pool_condition(self, key, result):
+    """ Adds the evaluated condition key to the pool and drops the least
+    recently used values until the pool is within `memory_budget`. The
+    last added value is always kept. """
+    error, value = result
+    if error or not self._is_pooled(key[0]):
+      return
+    size = self._spec.conditions[key[0]].memory(value)
+    conditions = self._cache['conditions']
+    with self._condition_locks_lock:
+      stats = self._pool_stats
+      stats['misses'] += 1
+      if key in self._pool_evicted:
+        stats['reloads'] += 1
+      self._pool_bytes += size - self._pool.pop(key, 0)
+      self._pool[key] = size
+      while self._pool_bytes > self._options.memory_budget \
+                                                  and len(self._pool) > 1:
+        dropped, dropped_size = self._pool.popitem(last=False)
+        self._pool_bytes -= dropped_size
+        self._pool_evicted.add(dropped)
+        conditions.pop(dropped, None)
+        stats['evictions'] += 1
+      stats['peak_bytes'] = max(stats['peak_bytes'], self._pool_bytes)
+
+  def _unpool(self, key):
+    """ Must be called with `_condition_locks_lock`. """
+    self._pool_bytes -= self._pool.pop(key, 0)
+
+  @property
+  def memory_pool_stats(self):
+    """ A dict describing the use of the `memory_budget` in this
+    process, None without a budget:
+      budget: the `memory_budget`.
+      hits: requests of a condition that found its value in the pool.
+      misses: evaluations of a condition, including reloads.
+      reloads: evaluations of a condition that had been evicted before.
+      evictions: values dropped to stay within the budget.
+      peak_bytes: the most bytes that were kept at once.
+      bytes: the bytes that are kept now.
+    """
+    if self._options.memory_budget is None:
+      return None
+    with self._condition_locks_lock:
+      stats = {name: self._pool_stats[name] for name in
+                  ('hits', 'misses', 'reloads', 'evictions', 'peak_bytes')}
+      stats['budget'] = self._options.memory_budget
+      stats['bytes'] = self._pool_bytes
+    return stats
+
+  def _cache_condition(self, key, result):
+    conditions = self._cache['conditions']
+    conditions[key] = result
+    if self._options.memory_budget is not None:
+      self._pool_condition(key, result)
+    if self._options.max_resident is None:
+      return
+    keys = self._touch_resident(key)
+    if keys is None:
+      return
+    with self._condition_locks_lock:
+      keys.add(key)
+      while len(self._resident) > self._options.max_resident:
+        _, dropped = self._resident.popitem(last=False)
+        for dropped_key in dropped:
+          conditions.pop(dropped_key, None)
+
+  def _get_condition_keys(self, check, iterargs):
+    """ Returns the set of keys of `_cache['conditions']` that can be
+    used when check is executed with iterargs.
+    """
+    keys = set()
+    pending = [(name, iterargs) for name in check.args]
+    pending += [(name, iterargs) for _, name in map(is_negated
+                                                      , check.conditions)]
+    while pending:
+      name, iterargs = pending.pop()
+      if name in self._values:
+        continue
+      name = self._spec.resolve_alias(name)
+      if name in self._values:
+        continue
+      nametype = self._spec.get_type(name, None)
+      if nametype == 'conditions':
+        key = (name, self._filter_condition_used_iterargs(name, iterargs))
+        if key in keys:
+          continue
+        keys.add(key)
+        pending += [(arg, key[1]) for arg in self._spec.conditions[name].args]
+      elif nametype == 'derived_iterables':
+        condition_name, _ = self._spec.get(name)
+        condition = self._spec.conditions.get(condition_name, None)
+        if condition is None:
+          continue
+        keys.add((name, ()))
+        requirements = [(singular, self._iterargs[singular])
+                          for singular in self._spec.get_iterargs(condition)]
+        pending += [(condition_name, derived_iterargs) for derived_iterargs
+                                    in self._generate_iterargs(requirements)]
+    return keys
+
+  def _get_release_schedule(self, order):
+    """ Returns a dict: index into order => list of the condition keys
+    that are not used anymore after the identity at index is done.
+    """
+    last_consumers = {}
+    for index, (_, check, iterargs) in enumerate(order):
+      for key in self._get_condition_keys(check, iterargs):
+        last_consumers[key] = index
+    schedule = {}
+    for key, index in last_consumers.items():
+      schedule.setdefault(index, []).append(key)
+    return schedule
+
+  def _release(self, index):
+    """ Drops the conditions that were last used by the identity at
+    index of the running order. """
+    conditions = self._cache['conditions']
+    for key in self._release_schedule.pop(index, ()):
+      conditions.pop(key, None)
+      with self._condition_locks_lock:
+        self._condition_locks.pop(key, None)
+        self._unpool(key)
+        keys = self._resident.get(dict(key[1]).get(self._shard_by, None))
+        if keys is not None:
+          keys.discard(key)
 
   def get(self, key, iterargs, *args):
     return self._get(key, iterargs, None, *args)
@@ -445,6 +1223,29 @@ class CheckRunner:
       else:
         yield (iterargs, value)
 
+  def _get_derived_iterable(self, name, path=None):
+    """ Returns the value of the derived iterable name, a DerivedIterable
+    that is cached like a condition with the key `(name, ())`.
+
+    With `max_resident` or if the condition is kept within the
+    `memory_budget` it returns a new generator instead, which doesn't
+    keep the values of all iterargs in memory.
+    """
+    condition_name, simple = self._spec.get(name)
+    if self._options.max_resident is not None \
+                                  or self._is_pooled(condition_name):
+      return self._derive_iterable_condition(condition_name, simple, path)
+    key = (name, ())
+    conditions = self._cache['conditions']
+    result = conditions.get(key, None)
+    if result is None:
+      with self._get_condition_lock(key):
+        result = conditions.get(key, None)
+        if result is None:
+          result = conditions[key] = (None, DerivedIterable(partial(
+                      self._derive_iterable_condition, condition_name, simple)))
+    return result[1]
+
   def _get(self, name, iterargs, path, *args):
     iterargsDict = dict(iterargs)
     has_fallback = bool(len(args))
@@ -484,8 +1285,7 @@ class CheckRunner:
       return value
 
     if nametype == 'derived_iterables':
-      condition_name, simple = self._spec.get(name)
-      return self._derive_iterable_condition(condition_name, simple, path)
+      return self._get_derived_iterable(name, path)
 
     if has_fallback:
       return fallback
@@ -496,23 +1296,89 @@ class CheckRunner:
       report_name = f'"{name}"'
     raise MissingValueError(f'Value {report_name} is undefined.')
 
+  def _compile_getter(self, name):
+    """ Returns a function `getter(iterargs, path)` that does what
+    `_get(name, iterargs, path)` does, with all decisions that only
+    depend on the spec and the values already made.
+    """
+    original_name = name
+    if name in self._values:
+      value = self._values[name]
+      return lambda iterargs, path: value
+
+    name = self._spec.resolve_alias(name)
+    if name in self._values:
+      value = self._values[name]
+      return lambda iterargs, path: value
+
+    nametype = self._spec.get_type(name, None)
+    if nametype == 'expected_values':
+      expected_value = self._spec.get(name)
+      if expected_value.has_default:
+        value = expected_value.default
+        return lambda iterargs, path: value
+
+    if original_name != name:
+      report_name = f'"{original_name}" as "{name}"'
+    else:
+      report_name = f'"{name}"'
+    def missing(iterargs, path):
+      raise MissingValueError(f'Value {report_name} is undefined.')
+
+    if nametype == 'iterargs':
+      values = self._values[self._spec.get(name)]
+      def get_iterarg(iterargs, path):
+        for iterarg, index in iterargs:
+          if iterarg == name:
+            return values[index]
+        return missing(iterargs, path)
+      return get_iterarg
+
+    if nametype == 'conditions':
+      def get_condition(iterargs, path):
+        error, value = self._get_condition(name, iterargs, path)
+        if error:
+          raise error
+        return value
+      return get_condition
+
+    if nametype == 'derived_iterables':
+      return lambda iterargs, path: self._get_derived_iterable(name, path)
+    return missing
+
+  def _get_binder(self, item):
+    """ Returns a tuple of (name, getter, optional) for each argument
+    of item, see `_compile_getter`. Compiled once per item.
+    """
+    binder = self._binders.get(item, None)
+    if binder is None:
+      binder = []
+      for name in item.args:
+        if any(name == bound_name for bound_name, _, _ in binder):
+          continue
+        binder.append((name, self._compile_getter(name)
+                           , name in item.optionalArgs))
+      binder = self._binders[item] = tuple(binder)
+    return binder
+
   def _get_args(self, item, iterargs, path=None):
     # iterargs can't be optional arguments yet, we wouldn't generate
     # an execution with an empty list. I don't know if that would be even
     # feasible, so I don't add this complication for the sake of clarity.
     # If this is needed for anything useful, we'll have to figure this out.
     args = {}
-    for name in item.args:
-      if name in args:
-        continue
+    for name, getter, optional in self._get_binder(item):
       try:
-        args[name] = self._get(name, iterargs, path)
+        args[name] = getter(iterargs, path)
       except MissingValueError:
-        if name not in item.optionalArgs:
+        if not optional:
           raise
     return args
 
-  def _get_check_dependencies(self, check, iterargs):
+  def _get_check_conditions_status(self, check, iterargs):
+    """ Returns None if all conditions of check are fulfilled, otherwise
+    a status tuple, SKIP or ERROR if a condition raised an exception.
+    """
     unfulfilled_conditions = []
     for condition in check.conditions:
       negate, name = is_negated(condition)
@@ -524,14 +1390,18 @@ class CheckRunner:
       if negate:
         val = not val
       if err:
-        status = (ERROR, err)
-        return (status, None)
+        return (ERROR, err)
       if not val:
         unfulfilled_conditions.append(condition)
     if unfulfilled_conditions:
       # This will make the check neither pass nor fail
-      status = (SKIP, 'Unfulfilled Conditions: {}'.format(
+      return (SKIP, 'Unfulfilled Conditions: {}'.format(
                                     ', '.join(unfulfilled_conditions)))
+    return None
+
+  def _get_check_dependencies(self, check, iterargs):
+    status = self._get_check_conditions_status(check, iterargs)
+    if status is not None:
       return (status, None)
 
     try:
@@ -540,8 +1410,43 @@ class CheckRunner:
       status = (ERROR, FailedDependenciesError(check, error))
       return (status, None)
 
+  def _get_check_skip_filter_status(self, check, iterargs):
+    if not self._spec.check_skip_filter:
+      return None
+    iterargsDict = {key:self.get_iterarg(key, index) for key, index in iterargs}
+    accepted, message = self._spec.check_skip_filter(check.id, **iterargsDict)
+    if not accepted:
+      return (SKIP, 'Filtered: {}'.format(message or '(no message)'))
+    return None
+
   def _run_check(self, check, iterargs):
-    summary_status = None
+    # FIXME: check is not a message
+    # so, to use it as a message, it should have a "message-interface"
+    # TODO: describe generic "message-interface"
+    events = self._get_check_events(check, iterargs)
+    if self._shared_cache is not None and self._is_shared(check):
+      events = self._get_shared_check_events(check, events)
+    if self._options.timing:
+      events, timing = self._collect_timed(events)
+      # events ends with ENDCHECK
+      events = events[:-1] + ((TIMING, timing), events[-1])
+    yield STARTCHECK, None
+    for event in events:
+      yield event
+
+  def _get_shared_check_events(self, check, events):
+    """ Yields the events of check from `shared_cache`. If they are not
+    there, events are collected and stored. A generator, so that this
+    happens while `_collect_timed` consumes it. """
+    shared = self._shared_cache.get(check, None)
+    if shared is None:
+      shared = self._shared_cache[check] = tuple(events)
+    else:
+      self._set_replayed()
+    yield from shared
+
+  def _get_check_events(self, check, iterargs):
+    """ Yields the events of `_run_check` after STARTCHECK. """
     # A check is more than just a function, it carries
     # a lot of meta-data for us, in this case we can use
     # meta-data to learn how to call the check (via
@@ -549,22 +1454,18 @@ class CheckRunner:
     # the default and configuration could be used to override
     # inspection results).
 
-    skipped = None
-    if self._spec.check_skip_filter:
-      iterargsDict = {key:self.get_iterarg(key, index) for key, index in iterargs}
-      accepted, message = self._spec.check_skip_filter(check.id, **iterargsDict)
-      if not accepted:
-        skipped = (SKIP, 'Filtered: {}'.format(message or '(no message)'))
-
+    skipped = self._get_check_skip_filter_status(check, iterargs)
+    result_key = None
     if not skipped:
+      result_key, replay = self._load_result(check, iterargs)
+      if replay is not None:
+        self._set_replayed()
+        for event in replay:
+          yield event
+        return
       skipped, args = self._get_check_dependencies(check, iterargs)
 
-    # FIXME: check is not a message
-    # so, to use it as a message, it should have a "message-interface"
-    # TODO: describe generic "message-interface"
-    yield STARTCHECK, None
     if skipped is not None:
-      summary_status = skipped[0]
       # `skipped` is a normal result tuple (status, message)
       # where `status` is either FAIL for unmet dependencies
       # or SKIP for unmet conditions or ERROR. A status of SKIP is
@@ -572,18 +1473,64 @@ class CheckRunner:
       # ERROR is either a missing dependency or a condition that raised
       # an exception. This shouldn't happen when everyting is set up
       # correctly.
-      yield skipped
+      results = (skipped, )
     else:
-      for sub_result in self._exec_check(check, args):
-        status, _ = sub_result
-        if summary_status is None or status >= summary_status:
-          summary_status = status
-        yield sub_result
-      # The only reason to yield this is to make it testable
-      # that a check ran to its end, or, if we start to allow
-      # nestable subchecks. Otherwise, a STARTCHECK would end the
-      # previous check implicitly.
-      # We can also use it to display status updates to the user.
+      timeout = self._get_check_timeout(check)
+      if timeout:
+        results = self._exec_check_isolated(check, args, timeout)
+      else:
+        results = self._exec_check(check, args)
+    events = self._summarize_check(check, results)
+    if result_key is not None:
+      events = self._store_result(result_key, events)
+    for event in events:
+      yield event
+
+  def _load_result(self, check, iterargs):
+    """ Returns a tuple (result_key, events).
+
+    result_key is None if the result of check is not cached, events
+    is None unless a result was found.
+    """
+    if self._result_cache is None:
+      return None, None
+    _, section = self._spec.get_check(check.id)
+    identity = self._spec.serialize_identity((section, check, iterargs))
+    inputs = self._get_inputs(check, iterargs)
+    result_key = self._result_cache.get_key(identity, check, inputs
+                          , self._checked_files, self._spec.sibling_files)
+    if result_key is None:
+      return None, None
+    return result_key, self._result_cache.get(result_key
+                                  , self._result_cache.get_max_age(inputs))
+
+  def _store_result(self, result_key, events):
+    """ Yields events and stores them when the check ended without
+    an ERROR, errors are often caused by the environment, not by the
+    checked files.
+    """
+    stored = []
+    for status, message in events:
+      stored.append((status, message))
+      yield status, message
+    if status == ENDCHECK and message != ERROR:
+      self._result_cache.set(result_key, stored)
+
+  def _summarize_check(self, check, results):
+    """ Yields the sub results of check and finally ENDCHECK with the
+    summary status of the check.
+    """
+    summary_status = None
+    for sub_result in results:
+      status, _ = sub_result
+      if summary_status is None or status >= summary_status:
+        summary_status = status
+      yield sub_result
+    # The only reason to yield this is to make it testable
+    # that a check ran to its end, or, if we start to allow
+    # nestable subchecks. Otherwise, a STARTCHECK would end the
+    # previous check implicitly.
+    # We can also use it to display status updates to the user.
     if summary_status is None:
       summary_status = ERROR
       yield ERROR, (f'The check {check} did not yield any status')
@@ -607,38 +1554,181 @@ class CheckRunner:
 
   @property
   def order(self):
+    """ The `ExecutionPlan` of this runner. """
     order = self._cache.get('order', None)
     if order is None:
-      order = []
-      # section, check, iterargs = identity
-      for identity in self._spec.execution_order(self._iterargs,
+      order = self._cache['order'] = self._get_execution_plan()
+    return order
+
+  def _get_execution_plan(self):
+    """ The `ExecutionPlan` for the current sizes of the iterargs. """
+    order = self._spec.get_execution_plan(self._iterargs,
                                     custom_order=self._custom_order,
                                     explicit_checks=self._explicit_checks,
-                                    exclude_checks=self._exclude_checks):
-        order.append(identity)
-      self._cache['order'] = order = tuple(order)
+                                    exclude_checks=self._exclude_checks)
+    if self._options.cheapest_first:
+      order = ExecutionPlan(cheapest_first(order, self._duration_profile))
+    if self._options.time_budget is not None:
+      selected = select_within_budget(order, self._duration_profile
+                                , self._options.time_budget, self._get_priority)
+      if len(selected) < len(order):
+        logging.info(f'{len(order) - len(selected)} of {len(order)} check'
+                      ' executions are estimated not to fit in the time'
+                      f' budget of {self._options.time_budget} seconds.')
+      order = ExecutionPlan(selected)
+    if self._options.fail_fast is not None or self._options.stop_at_budget:
+      order = self._prioritize(order)
     return order
 
+  @staticmethod
+  def _get_priority(check):
+    return check.misc_metadata.get('priority', PriorityLevel.NORMAL)
+
+  def _prioritize(self, order):
+    """ Returns order as an ExecutionPlan, sorted by the priority of
+    the checks. The sort is stable, identities of the same priority keep
+    their order. A section can hence appear more than once.
+    """
+    return ExecutionPlan(sorted(order
+                      , key=lambda identity: self._get_priority(identity[1])))
+
+  def _fails_fast(self, check, summary_status):
+    """ True if the run must end after check resulted in summary_status. """
+    return self._options.fail_fast is not None and summary_status >= FAIL \
+                  and self._get_priority(check) <= self._options.fail_fast
+
   def check_order(self, order):
     """
       order must be a subset of self.order
     """
     own_order = self.order
+    if isinstance(order, ExecutionPlan) and order.keys == own_order.keys:
+      return own_order
     for item in order:
       if item not in own_order:
         raise ValueError(f'Order item {item} not found.')
     return order
 
-  def run(self, order=None):
-    checkrun_summary = Counter()
-
-    if order is not None:
-      order = self.check_order(order)
-    else:
-      order = self.order
-
-    # prepare: we'll have less ENDSECTION code in the actual run
-    # also, we can prepare section_order tuples
+  def _run_order(self, order):
+    """ Yields for each identity in order, in the same order, an iterable
+    of the check events as produced by `_run_check`.
+    """
+    if self._coordinator is not None:
+      return self._coordinator.run(self, order)
+    if self._options.jobs > 1:
+      from fontbakery.multiproc import run_sharded
+      return run_sharded(self, order)
+    if self._options.threads:
+      return self._run_order_threaded(order)
+    if self._options.prefetch:
+      return self._run_order_prefetched(order)
+    return (self._run_check(check, iterargs) for _, check, iterargs in order)
+
+  def _get_io_bound_conditions(self, check):
+    return [name for name in self._spec.get_dependencies(check)
+                  if getattr(self._spec.conditions.get(name, None)
+                                                  , 'io_bound', False)]
+
+  def _get_prefetch_conditions(self, check):
+    return [name for name in self._spec.get_dependencies(check)
+                  if getattr(self._spec.conditions.get(name, None)
+                                                  , 'prefetch', False)]
+
+  def _submit_conditions(self, executor, futures, names, iterargs):
+    """ Submits the evaluation of the conditions names for iterargs to
+    executor, unless they are cached or in futures already. futures is
+    a dict condition key => future.
+    """
+    conditions = self._cache['conditions']
+    for name in names:
+      key = (name, self._filter_condition_used_iterargs(name, iterargs))
+      if key not in futures and key not in conditions:
+        futures[key] = executor.submit(self._get_condition, name, iterargs)
+
+  def _get_prefetcher(self, order, executor, futures):
+    """ Returns a function prefetch(index) that submits the `io_bound` and
+    `prefetch` conditions of the identities of order up to
+    `index + self._options.prefetch`. Call it with the index of each identity
+    before its check runs.
+    """
+    names = {}
+    submitted = 0
+    def prefetch(index):
+      nonlocal submitted
+      if not self._options.prefetch:
+        return
+      end = min(index + self._options.prefetch + 1, len(order))
+      for ahead in range(max(submitted, index), end):
+        _, check, iterargs = order[ahead]
+        if check not in names:
+          names[check] = self._get_io_bound_conditions(check) \
+                                    + self._get_prefetch_conditions(check)
+        self._submit_conditions(executor, futures, names[check], iterargs)
+      submitted = max(submitted, end)
+    return prefetch
+
+  def _run_order_prefetched(self, order):
+    """ Like `_run_order`, while a check runs the conditions of the next
+    `prefetch` identities are evaluated in a thread pool.
+
+    The conditions are evaluated via `_get_condition`, like when a check
+    requests them, hence only once and into the same cache.
+    """
+    executor = ThreadPoolExecutor(min(self._options.prefetch
+                                    , os.cpu_count() or 1))
+    futures = {}
+    prefetch = self._get_prefetcher(order, executor, futures)
+    try:
+      for index, (_, check, iterargs) in enumerate(order):
+        prefetch(index)
+        yield self._run_check(check, iterargs)
+    finally:
+      for future in futures.values():
+        future.cancel()
+      executor.shutdown(wait=False)
+
+  def _run_order_threaded(self, order):
+    """ Like `_run_order` but `io_bound` checks run in a thread pool
+    while the other checks run in this thread.
+
+    `io_bound` conditions are submitted to the pool before the checks
+    that use them, if a check needs one of these conditions before it
+    is ready, it waits for the evaluation that is in flight. With
+    `prefetch`, the `prefetch` conditions of the next identities are
+    submitted to the pool as well.
+    """
+    executor = ThreadPoolExecutor(self._options.threads)
+    futures = {}
+    conditions = {}
+    prefetch = self._get_prefetcher(order, executor, conditions)
+    try:
+      io_bound_conditions = {}
+      for index, (_, check, iterargs) in enumerate(order):
+        if check not in io_bound_conditions:
+          io_bound_conditions[check] = self._get_io_bound_conditions(check)
+        self._submit_conditions(executor, conditions
+                              , io_bound_conditions[check], iterargs)
+        if check.io_bound:
+          futures[index] = executor.submit(
+                          lambda *args: tuple(self._run_check(*args))
+                        , check, iterargs)
+
+      for index, (_, check, iterargs) in enumerate(order):
+        prefetch(index)
+        if index in futures:
+          yield futures.pop(index).result()
+        else:
+          yield self._run_check(check, iterargs)
+    finally:
+      for future in chain(futures.values(), conditions.values()):
+        future.cancel()
+      executor.shutdown(wait=False)
+
+  @staticmethod
+  def _get_section_orders(order):
+    """ Returns a list of tuples (section, ((check, iterargs), ...))
+    grouping consecutive identities of order by section.
+    """
     section = None
     oldsection = None
     section_order = None
@@ -652,24 +1742,551 @@ class CheckRunner:
       section_order.append((check, iterargs))
     if section is not None:
       section_orders.append((section, tuple(section_order)))
+    return section_orders
 
-    # run
-    yield START, order, (None, None, None)
-    section = None
-    for section, section_order in section_orders:
-      section_summary = Counter()
+  def _run_sections(self, order, check_results, checkrun_summary
+                                              , section_summaries, index=0):
+    """ Yields the events of the sections of order, from STARTSECTION
+    to ENDSECTION, and updates the summaries. check_results is the
+    `_run_order` of order and index the index of its first identity in
+    the running order. Identities replayed from the journal are not
+    part of the running order.
+
+    Returns True if the run must end, see `fail_fast`.
+    """
+    aborted = False
+    for section, section_order in self._get_section_orders(order):
+      # a prioritized or streamed order can visit a section more than once
+      section_summary = section_summaries.setdefault(str(section)
+                                                              , Counter())
       yield STARTSECTION, section_order, (section, None, None)
       for check, iterargs in section_order:
-        for status, message in self._run_check(check, iterargs):
+        for status, message in next(check_results):
+          if status is TIMING and self._duration_profile is not None \
+                              and not message.get('replayed', False):
+            self._duration_profile.record(check.id, message['wall'])
           yield status, message, (section, check, iterargs)
         # after _run_check the last status must be ENDCHECK
         assert status == ENDCHECK
+        if (section, check, iterargs) not in self._journaled:
+          self._release(index)
+          index += 1
         # message is the summary_status of the check when status is ENDCHECK
         section_summary[message.name] += 1
-      yield ENDSECTION, section_summary, (section, None, None)
-      checkrun_summary.update(section_summary)
+        checkrun_summary[message.name] += 1
+        aborted = self._fails_fast(check, message)
+        if aborted:
+          break
+      yield ENDSECTION, Counter(section_summary), (section, None, None)
+      if aborted:
+        # stops the workers and threads
+        check_results.close()
+        break
+    return aborted
+
+  def _uses_stream(self, check):
+    """ True if check uses all values of the `stream` iterarg. """
+    plural = self._spec.iterargs[self._stream]
+    for name in self._spec.get_dependencies(check):
+      name = self._spec.resolve_alias(name)
+      if name == plural:
+        return True
+      if self._spec.get_type(name, None) != 'derived_iterables':
+        continue
+      condition_name, _ = self._spec.get(name)
+      condition = self._spec.conditions.get(condition_name, None)
+      if condition is not None \
+                  and self._stream in self._spec.get_iterargs(condition):
+        return True
+    return False
+
+  def _run_streamed(self, checkrun_summary, section_summaries):
+    """ Yields the events of `run` from START, while the values of the
+    `stream` iterarg arrive.
+
+    For each value, the identities of the execution plan that use its
+    index are executed, except for checks that use all values. After the
+    last value, the remaining identities of the complete execution plan
+    are executed. `order` is then the plan of all executed identities.
+    If the streamed values are not valid, this is logged as an error,
+    the run goes on.
+    """
+    stream = self._stream
+    plural = self._spec.iterargs[stream]
+    values = self._values[plural]
+    # the identities of a single value, with index 0
+    self._iterargs[stream] = 1
+    template = [(section, check, iterargs) for section, check, iterargs
+                                          in self._get_execution_plan()
+                if stream in dict(iterargs) and not self._uses_stream(check)]
+    self._iterargs[stream] = 0
+    executed = []
+    yield START, ExecutionPlan(), (None, None, None)
+    aborted = False
+    for value in self._stream_source:
+      index = len(values)
+      values.append(value)
+      self._iterargs[stream] = index + 1
+      order = [(section, check, tuple((name, index if name == stream else i)
+                                                    for name, i in iterargs))
+                                    for section, check, iterargs in template]
+      executed += order
+      aborted = yield from self._run_sections(order, self._run_order(order)
+                                      , checkrun_summary, section_summaries)
+      if aborted:
+        break
+    self._values[plural] = tuple(values)
+    # compiled getters may refer to the list of values
+    self._binders = {}
+    if not aborted:
+      valid, message = self._spec.validate_values({plural: values})
+      if not valid:
+        logging.error(f'Validation of the streamed values failed:\n{message}')
+      executed_plan = ExecutionPlan(executed)
+      order = [identity for identity in self._get_execution_plan()
+                                          if identity not in executed_plan]
+      executed += order
+      yield from self._run_sections(order, self._run_order(order)
+                                      , checkrun_summary, section_summaries)
+    self._cache['order'] = ExecutionPlan(executed)
+
+  def _run_journaled(self, order, check_results):
+    """ Yields for each identity in order the events of `_run_check`,
+    replayed from the journal if it has a record of the identity, else
+    from check_results, the `_run_order` of the other identities. These
+    are appended to the journal.
+    """
+    journal = self._journal
+    try:
+      for identity in order:
+        key = self._spec.serialize_identity(identity)
+        if identity in self._journaled:
+          yield ((STARTCHECK, None), ) + journal.get(key, self._spec)
+          continue
+        events = tuple(next(check_results))
+        # timings of an earlier run would be recorded again
+        journal.append(key, [(status, message) for status, message in events
+                                      if status not in (STARTCHECK, TIMING)])
+        yield events
+    finally:
+      check_results.close()
+
+  def _run_budgeted(self, order, check_results, deadline):
+    """ Yields for each identity in order the events of check_results
+    until the `time.monotonic` deadline passed, then, without executing
+    them, SKIP events for the remaining identities, see `stop_at_budget`.
+    """
+    executed = 0
+    try:
+      for _ in order:
+        if time.monotonic() >= deadline:
+          break
+        yield next(check_results)
+        executed += 1
+    finally:
+      # stops the workers and threads
+      check_results.close()
+    for _ in range(len(order) - executed):
+      yield ((STARTCHECK, None)
+           , (SKIP, 'Time budget exhausted.')
+           , (ENDCHECK, SKIP))
+
+  def run(self, order=None):
+    checkrun_summary = Counter()
+    section_summaries = {}
+
+    if self._stream is not None:
+      if order is not None:
+        raise SetupError('A run with a stream can\'t have an order.')
+      yield from self._run_streamed(checkrun_summary, section_summaries)
+    else:
+      if order is not None:
+        order = self.check_order(order)
+      else:
+        order = self.order
+
+      running_order = order
+      if self._journaled:
+        running_order = ExecutionPlan(identity for identity in order
+                                    if identity not in self._journaled)
+
+      if self._options.release_conditions:
+        self._release_schedule = self._get_release_schedule(running_order)
+
+      # run
+      check_results = self._run_order(running_order)
+      if self._journal is not None:
+        check_results = self._run_journaled(order, check_results)
+      if self._options.stop_at_budget:
+        deadline = time.monotonic() + self._options.time_budget
+        check_results = self._run_budgeted(order, check_results, deadline)
+      yield START, order, (None, None, None)
+      yield from self._run_sections(order, check_results, checkrun_summary
+                                                      , section_summaries)
+    if self._duration_profile is not None:
+      self._duration_profile.update()
+      self._duration_profile.save()
     yield END, checkrun_summary, (None, None, None)
 
+  def _get_watched_files(self, ignored=frozenset()):
+    """ Returns a dict path => (mtime, size) of the files that are values
+    of the iterargs and of the files in their directories that match the
+    `sibling_files` of the spec, except for the absolute paths ignored.
+    """
+    paths = set()
+    directories = set()
+    for plural in self._spec.iterargs.values():
+      for value in self._values[plural]:
+        if isinstance(value, str) and os.path.isfile(value):
+          path = os.path.abspath(value)
+          paths.add(path)
+          directories.add(os.path.dirname(path))
+    for directory in directories:
+      try:
+        entries = list(os.scandir(directory))
+      except OSError:
+        continue
+      paths.update(entry.path for entry in entries
+                      if any(fnmatch.fnmatchcase(entry.name, pattern)
+                                    for pattern in self._spec.sibling_files))
+    files = {}
+    for path in paths - ignored:
+      try:
+        stat = os.stat(path)
+      except OSError:
+        continue
+      if S_ISREG(stat.st_mode):
+        files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+  def _is_invalidated(self, dependencies, iterargs, changed_indexes, others):
+    """ True if the result of something that uses the names dependencies
+    and iterargs can depend on the changed files, see `invalidate`. """
+    for name, index in iterargs:
+      if index in changed_indexes.get(name, ()):
+        return True
+    plurals = {plural: singular for singular, plural
+                                            in self._spec.iterargs.items()}
+    for name in dependencies:
+      name = self._spec.resolve_alias(name)
+      if name in plurals:
+        if others or changed_indexes.get(plurals[name], None):
+          return True
+      elif self._spec.get_type(name, None) == 'derived_iterables':
+        condition_name, _ = self._spec.get(name)
+        condition = self._spec.conditions.get(condition_name, None)
+        if condition is not None and any(changed_indexes.get(singular, None)
+                          for singular in self._spec.get_iterargs(condition)):
+          return True
+    return False
+
+  def invalidate(self, paths):
+    """ Drops the values of conditions that can depend on the files
+    paths and returns the ExecutionPlan of the identities of order whose
+    results can depend on them.
+
+    When a file is the value of an iterarg, this is everything using its
+    index and everything using all values of the iterarg, directly or via
+    a derived iterable. Other files, e.g. next to the checked files, can
+    only be found via all values of the iterarg, e.g. via their common
+    directory, hence changing them invalidates everything using all values.
+    """
+    paths = set(os.path.abspath(path) for path in paths)
+    changed_indexes = {}
+    found = set()
+    for singular, plural in self._spec.iterargs.items():
+      for index, value in enumerate(self._values[plural]):
+        if isinstance(value, str) and os.path.abspath(value) in paths:
+          changed_indexes.setdefault(singular, set()).add(index)
+          found.add(os.path.abspath(value))
+    others = bool(paths - found)
+
+    conditions = self._cache['conditions']
+    for key in list(conditions):
+      name, iterargs = key
+      if self._spec.get_type(name, None) == 'derived_iterables':
+        dependencies = (name, )
+      elif name in self._spec.conditions:
+        dependencies = self._spec.get_dependencies(
+                                                self._spec.conditions[name])
+      else:
+        dependencies = None
+      if dependencies is None or self._is_invalidated(dependencies, iterargs
+                                                , changed_indexes, others):
+        conditions.pop(key, None)
+        with self._condition_locks_lock:
+          self._condition_locks.pop(key, None)
+          self._unpool(key)
+    return ExecutionPlan((section, check, iterargs)
+                        for section, check, iterargs in self.order
+                        if self._is_invalidated(
+                              self._spec.get_dependencies(check), iterargs
+                            , changed_indexes, others))
+
+  def watch(self, interval=1.0, ignored=()):
+    """ Yields tuples (paths, events). First for a `run` with paths
+    empty, then, whenever files of the run changed, the set of changed
+    paths and the events of another run. The watched files are the values
+    of the iterargs and the files next to them that match the
+    `sibling_files` of the spec. ignored: paths of files that are not
+    watched, e.g. the reports written after each run.
+
+    In the later runs only the identities invalidated by the changed files,
+    see `invalidate`, are executed, the events of all other identities
+    are replayed from the run before, so that reporters get the complete
+    results. A change is handled when the files did not change for
+    interval seconds. Stop watching by closing the generator.
+    """
+    from fontbakery.journal import MemoryJournal
+    if self._stream is not None:
+      raise SetupError('stream can\'t be used with watch.')
+    if self._journal is not None:
+      raise SetupError('journal can\'t be used with watch.')
+    self._journal = journal = MemoryJournal()
+    ignored = frozenset(map(os.path.abspath, ignored))
+    files = self._get_watched_files(ignored)
+    yield frozenset(), self.run()
+    while True:
+      changed = set()
+      while True:
+        time.sleep(interval)
+        current = self._get_watched_files(ignored)
+        if current != files:
+          changed.update(path for path in set(current) | set(files)
+                                  if current.get(path) != files.get(path))
+          files = current
+        elif changed:
+          break
+      invalidated = self.invalidate(changed)
+      for identity in invalidated:
+        journal.discard(self._spec.serialize_identity(identity))
+      self._journaled = ExecutionPlan(identity for identity in self.order
+                      if self._spec.serialize_identity(identity) in journal)
+      yield frozenset(changed), self.run()
+
+class AsyncCheckRunner(CheckRunner):
+  """ A CheckRunner for asyncio applications.
+
+  `run` is an asynchronous generator of the same events as
+  `CheckRunner.run`. Checks and conditions can be defined with
+  `async def`, checks can also be asynchronous generators.
+
+  Up to `concurrency` checks are executed concurrently. Synchronous
+  checks and conditions are executed in the default executor of the
+  event loop, so that they don't block it. Each condition is evaluated
+  only once, concurrent requests await the same evaluation.
+  """
+  def __init__(self, spec, values, concurrency=8, **kwds):
+    super(AsyncCheckRunner, self).__init__(spec, values, **kwds)
+    if self._options.max_resident is not None:
+      # dropped conditions would be evaluated again synchronously
+      raise SetupError('AsyncCheckRunner does not support max_resident.')
+    if self._options.memory_budget is not None:
+      raise SetupError('AsyncCheckRunner does not support memory_budget.')
+    if self._options.timing:
+      # concurrent checks share the thread, conditions can't be attributed
+      raise SetupError('AsyncCheckRunner does not support timing.')
+    if self._options.timeout:
+      # a child process can't continue the event loop
+      raise SetupError('AsyncCheckRunner does not support timeout.')
+    if self._coordinator is not None:
+      raise SetupError('AsyncCheckRunner does not support coordinator.')
+    if self._options.prefetch:
+      # conditions already run concurrently on the event loop
+      raise SetupError('AsyncCheckRunner does not support prefetch.')
+    if self._stream is not None:
+      raise SetupError('AsyncCheckRunner does not support stream.')
+    if self._journal is not None:
+      raise SetupError('AsyncCheckRunner does not support journal.')
+    if self._options.stop_at_budget:
+      raise SetupError('AsyncCheckRunner does not support stop_at_budget.')
+    self._concurrency = max(1, concurrency)
+    # condition key => asyncio.Future of (err, val)
+    self._pending_conditions = {}
+
+  async def _evaluate_condition_async(self, name, iterargs, path):
+    if name in path:
+      return CircularDependencyError('Condition "{}" is a circular '
+                'dependency in {}'.format(name, ' -> '.join(path))), None
+    try:
+      condition = self._spec.conditions[name]
+    except KeyError as err:
+      return MissingConditionError(name, err), None
+
+    cache_key, found, value = self._load_persisted_condition(condition
+                                                              , iterargs)
+    if found:
+      return None, value
+
+    try:
+      await self._resolve_dependencies(condition, iterargs, path + (name, ))
+      args = self._get_args(condition, iterargs)
+    except Exception as err:
+      return FailedConditionError(condition, err), None
+
+    try:
+      if condition.is_async:
+        value = await condition(**args)
+      else:
+        loop = asyncio.get_event_loop()
+        value = await loop.run_in_executor(None, partial(condition, **args))
+    except Exception as err:
+      return FailedConditionError(condition, err), None
+    if cache_key is not None:
+      self._condition_cache.set(condition, cache_key, value)
+    return None, value
+
+  async def _get_condition_async(self, name, iterargs, path=()):
+    used_iterargs = self._filter_condition_used_iterargs(name, iterargs)
+    key = (name, used_iterargs)
+    conditions = self._cache['conditions']
+    if key in conditions:
+      return conditions[key]
+    shared = self._get_shared_condition(key)
+    if shared is not None:
+      self._cache_condition(key, shared)
+      return shared
+    pending = self._pending_conditions.get(key, None)
+    if pending is None:
+      pending = asyncio.ensure_future(
+              self._evaluate_condition_async(name, used_iterargs, path))
+      self._pending_conditions[key] = pending
+      def done(future):
+        del self._pending_conditions[key]
+        if not future.cancelled():
+          self._share_condition(key, future.result())
+          self._cache_condition(key, future.result())
+      pending.add_done_callback(done)
+    # the evaluation is shared, one cancelled awaiter must not cancel it
+    return await asyncio.shield(pending)
+
+  async def _resolve_names(self, names, iterargs, path=()):
+    """ Evaluate the conditions behind names, so that the synchronous
+    getters of CheckRunner can find them in `_cache['conditions']`.
+    """
+    awaitables = []
+    for name in names:
+      if name in self._values:
+        continue
+      name = self._spec.resolve_alias(name)
+      if name in self._values:
+        continue
+      nametype = self._spec.get_type(name, None)
+      if nametype == 'conditions':
+        awaitables.append(self._get_condition_async(name, iterargs, path))
+      elif nametype == 'derived_iterables':
+        condition_name, _ = self._spec.get(name)
+        condition = self._spec.conditions.get(condition_name, None)
+        if condition is None:
+          continue
+        requirements = [(singular, self._iterargs[singular])
+                          for singular in self._spec.get_iterargs(condition)]
+        for derived_iterargs in self._generate_iterargs(requirements):
+          awaitables.append(self._get_condition_async(condition_name
+                                                , derived_iterargs, path))
+    await asyncio.gather(*awaitables)
+
+  async def _resolve_dependencies(self, item, iterargs, path=()):
+    await self._resolve_names(item.args, iterargs, path)
+
+  async def _exec_check_async(self, check, args):
+    """ Returns a list of check sub results, see `_exec_check`. """
+    if not check.is_async:
+      loop = asyncio.get_event_loop()
+      return await loop.run_in_executor(None
+                              , lambda: list(self._exec_check(check, args)))
+    results = []
+    try:
+      result = check(**args)  # Might raise.
+      if inspect.isasyncgen(result):
+        async for sub_result in result:  # Might raise.
+          results.append(self._check_result(sub_result))
+        return results
+      result = await result  # Might raise.
+    except Exception as e:
+      result = (ERROR, FailedCheckError(e))
+    results.append(self._check_result(result))
+    return results
+
+  async def _run_check_async(self, check, iterargs):
+    """ Returns a tuple of the events of `_run_check`. """
+    shared = self._shared_cache is not None and self._is_shared(check)
+    if shared and check in self._shared_cache:
+      return ((STARTCHECK, None), ) + self._shared_cache[check]
+    skipped = self._get_check_skip_filter_status(check, iterargs)
+    result_key = None
+    if not skipped:
+      result_key, replay = self._load_result(check, iterargs)
+      if replay is not None:
+        return ((STARTCHECK, None), ) + tuple(replay)
+    if not skipped:
+      # like _get_check_dependencies the arguments are only
+      # needed if all conditions are fulfilled.
+      await self._resolve_names([name for _, name in map(is_negated
+                                          , check.conditions)], iterargs)
+      skipped = self._get_check_conditions_status(check, iterargs)
+    if not skipped:
+      await self._resolve_dependencies(check, iterargs)
+      skipped, args = self._get_check_dependencies(check, iterargs)
+    if skipped is not None:
+      results = (skipped, )
+    else:
+      results = await self._exec_check_async(check, args)
+    events = self._summarize_check(check, results)
+    if result_key is not None:
+      events = self._store_result(result_key, events)
+    events = tuple(events)
+    if shared:
+      self._shared_cache[check] = events
+    return ((STARTCHECK, None), ) + events
+
+  async def run(self, order=None):
+    checkrun_summary = Counter()
+
+    if order is not None:
+      order = self.check_order(order)
+    else:
+      order = self.order
+    section_orders = self._get_section_orders(order)
+
+    if self._options.release_conditions:
+      self._release_schedule = self._get_release_schedule(order)
+
+    semaphore = asyncio.Semaphore(self._concurrency)
+    async def run_check(check, iterargs):
+      async with semaphore:
+        return await self._run_check_async(check, iterargs)
+    tasks = [asyncio.ensure_future(run_check(check, iterargs))
+                                      for _, check, iterargs in order]
+    try:
+      tasks_iter = iter(tasks)
+      yield START, order, (None, None, None)
+      index = 0
+      section_summaries = {}
+      aborted = False
+      for section, section_order in section_orders:
+        section_summary = section_summaries.setdefault(str(section)
+                                                            , Counter())
+        yield STARTSECTION, section_order, (section, None, None)
+        for check, iterargs in section_order:
+          for status, message in await next(tasks_iter):
+            yield status, message, (section, check, iterargs)
+          self._release(index)
+          index += 1
+          # message is the summary_status of the check when status is ENDCHECK
+          section_summary[message.name] += 1
+          checkrun_summary[message.name] += 1
+          aborted = self._fails_fast(check, message)
+          if aborted:
+            break
+        yield ENDSECTION, Counter(section_summary), (section, None, None)
+        if aborted:
+          break
+      yield END, checkrun_summary, (None, None, None)
+    finally:
+      for task in tasks:
+        task.cancel()
+
 def distribute_generator(gen, targets_callbacks):
   for item in gen:
     for target in targets_callbacks:
@@ -775,6 +2392,9 @@ class Section:
     return checks
 
 class Spec:
+  # see get_execution_plan, e.g. a server runs jobs of many sizes
+  max_execution_plans = 8
+
   def __init__(self
              , sections=None
              , iterargs=None
@@ -783,7 +2403,8 @@ class Spec:
              , aliases=None
              , expected_values=None
              , default_section=None
-             , check_skip_filter=None):
+             , check_skip_filter=None
+             , sibling_files=()):
     '''
       sections: a list of sections, which are ideally ordered sets of
           individual checks.
@@ -823,12 +2444,22 @@ class Spec:
           , ((('font', 1), ), <TTFont object from font_1>)
           ]
 
+      sibling_files: `fnmatch` patterns of the names of files that checks
+          may read next to the files they check, e.g. ('METADATA.pb', ).
+          A `fontbakery.cache.ResultCache` replays results only while
+          these files don't change.
+
     We will:
       a) get all needed values/variable names from here
       b) add some validation, so that we know the values match
          our expectations! These values must be treated as user input!
     '''
     self._namespace = {}
+    # caches of get_execution_plan, get_dependencies and dependency_graph,
+    # cleared by _invalidate_caches when the spec changes
+    self._execution_plans = OrderedDict()
+    self._dependencies = {}
+    self._dependency_graph = None
 
     self.iterargs = {}
     if iterargs:
@@ -862,6 +2493,7 @@ class Spec:
     self.add_section(self._default_section)
 
     self._check_skip_filter = check_skip_filter
+    self.sibling_files = tuple(sibling_files)
 
   _valid_namespace_types = { 'iterargs': 'iterarg'
                            , 'derived_iterables': 'derived_iterable'
@@ -905,6 +2537,7 @@ class Spec:
     self._namespace[name] = type
     target = getattr(self, type)
     target[name] = value
+    self._invalidate_caches()
 
   def test_dependencies(self):
     """ Raises SetupError if spec uses any names that are not declared
@@ -946,8 +2579,16 @@ class Spec:
     is looking for a high level of control over the spec contents,
     especially for a warning when the spec contents have changed after an
     update.
+
+    While a `fontbakery.manifest.Selection` is active, only its selected
+    checks are expected.
     """
     expected_check_ids = set(expected_check_ids)
+    from fontbakery.manifest import get_selection
+    selection = get_selection()
+    if selection is not None:
+      # checks that are not selected are not registered, see auto_register
+      expected_check_ids = set(filter(selection.selects, expected_check_ids))
     registered_checks = set(self._check_registry.keys())
     missing_checks = expected_check_ids - registered_checks
     unexpected_checks = None
@@ -1037,12 +2678,54 @@ class Spec:
     val = self.get(name, marker_fallback)
     return val is not marker_fallback
 
+  def _invalidate_caches(self):
+    self._execution_plans.clear()
+    self._dependencies.clear()
+    self._dependency_graph = None
+
+  @property
+  def dependency_graph(self):
+    """ A dict {name: frozenset of names} with the direct dependencies
+    of all conditions, by name, and of all checks, by id: their arguments
+    and the names of their conditions.
+    Use `get_dependencies` for the transitive dependencies.
+    """
+    if self._dependency_graph is None:
+      graph = {}
+      items = list(self.conditions.items())
+      items += [(check.id, check) for section in self._sections.values()
+                                  for check in section.checks]
+      for name, item in items:
+        dependencies = set(item.args)
+        if hasattr(item, 'conditions'):
+          dependencies.update(name for _, name in map(is_negated
+                                                        , item.conditions))
+        graph[name] = frozenset(dependencies)
+      self._dependency_graph = graph
+    return self._dependency_graph
+
+  def get_dependencies(self, item, key='args'):
+    """ Returns a frozenset of all names item, a check or a condition,
+    depends on, directly or via conditions. With key='mandatoryArgs'
+    optional arguments are not followed.
+
+    The result is cached until the spec changes.
+    """
+    cache_key = (item, key)
+    dependencies = self._dependencies.get(cache_key, None)
+    if dependencies is None:
+      dependencies = self._dependencies[cache_key] = frozenset(
+                                    self._get_aggregate_args(item, key))
+    return dependencies
+
   def _get_aggregate_args(self, item, key):
     """
       Get all arguments or mandatory arguments of the item.
 
       Item is a check or a condition, which means it can be dependent on
       more conditions, this climbs down all the way.
+
+      Uncached, use `get_dependencies`.
     """
     if not key in ('args', 'mandatoryArgs'):
       raise TypeError('key must be "args" or "mandatoryArgs", got {}').format(key)
@@ -1068,7 +2751,7 @@ class Spec:
     # iterargs should always be mandatory, unless there's a good reason
     # not to, which I can't think of right now.
 
-    args = self._get_aggregate_args(item, 'mandatoryArgs')
+    args = self.get_dependencies(item, 'mandatoryArgs')
     return tuple(sorted([arg for arg in args if arg in self.iterargs]))
 
   def _analyze_checks(self, all_args, checks):
@@ -1077,9 +2760,9 @@ class Spec:
               #(check, signature, scope)
     scopes = [(check, tuple(), tuple()) for check in checks]
     aggregatedArgs = {
-      'args': {check.name:self._get_aggregate_args(check, 'args')
+      'args': {check.name:self.get_dependencies(check, 'args')
                                           for check in checks }
-    , 'mandatoryArgs': {check.name: self._get_aggregate_args(check, 'mandatoryArgs')
+    , 'mandatoryArgs': {check.name: self.get_dependencies(check, 'mandatoryArgs')
                                           for check in checks }
     }
     saturated = []
@@ -1239,6 +2922,31 @@ class Spec:
                                           , exclude_checks=exclude_checks):
         yield (section, check, section_iterargs)
 
+  def get_execution_plan(self, iterargs
+                         , custom_order=None
+                         , explicit_checks=None
+                         , exclude_checks=None):
+    """ Returns the `ExecutionPlan` of `execution_order`.
+
+    The plans of the last `max_execution_plans` distinct iterarg sizes
+    and check filters are kept, until the specification changes.
+    """
+    key = (tuple(iterargs.items())
+         , tuple(custom_order) if custom_order is not None else None
+         , frozenset(explicit_checks or ())
+         , frozenset(exclude_checks or ()))
+    plan = self._execution_plans.pop(key, None)
+    if plan is None:
+      plan = ExecutionPlan(self.execution_order(iterargs
+                                 , custom_order=custom_order
+                                 , explicit_checks=explicit_checks
+                                 , exclude_checks=exclude_checks))
+    # least recently used first
+    self._execution_plans[key] = plan
+    while len(self._execution_plans) > self.max_execution_plans:
+      self._execution_plans.popitem(last=False)
+    return plan
+
   def _register_check(self, section, func):
     other_section = self._check_registry.get(func.id, None)
     if other_section:
@@ -1254,6 +2962,7 @@ class Spec:
                        'in {}. BUT the current check is a different object '
                        'than the registered check.'.format(func, other_section, section))
     self._check_registry[func.id] = section
+    self._invalidate_caches()
     return True
 
   def get_check(self, check_id):
@@ -1269,6 +2978,7 @@ class Spec:
         raise SetupError(f'A section with key {section} is already registered')
       return
     self._sections[key] = section
+    self._invalidate_caches()
     section.on_add_check(self._register_check)
     for check in section.checks:
       self._register_check(section, check)
@@ -1355,15 +3065,19 @@ class Spec:
     import .name1, .name2, .name3
 
     i.e. "name" in names becomes ".name"
+
+    While a `fontbakery.manifest.Selection` is active, whole modules
+    that are not needed for the selected checks are not imported and
+    the imported ones are recorded in its manifest.
     """
+    from fontbakery.manifest import get_selection
     results = []
     if 'spec_imports' not in symbol_table:
       return results
 
     package = self._get_package(symbol_table)
-    spec_imports = symbol_table['spec_imports']
-
-    for item in spec_imports:
+    spec_imports = []
+    for item in symbol_table['spec_imports']:
       if isinstance(item, str):
         # import the whole module
         module_name, names = (item, None)
@@ -1379,24 +3093,36 @@ class Spec:
         names = None
       else:
         module_names = [module_name]
-
-      for module_name in module_names:
-        module = importlib.import_module(module_name, package=package)
-        if names is None:
-          results.append(module)
-        else:
-          #  1. check if the imported module has an attribute by that name
-          #  2. if not, attempt to import a submodule with that name
-          #  3. if the attribute is not found, ImportError is raised.
-          #  …
-          for name in names:
-            try:
-              results.append(getattr(module, name))
-            except AttributeError:
-              # attempt to import a submodule with that name
-              sub_module_name = '.'.join([module_name, name])
-              sub_module = importlib.import_module(sub_module_name, package=package)
-              results.append(sub_module)
+      spec_imports += [(module_name, names) for module_name in module_names]
+
+    selection = get_selection()
+    skipped = set()
+    if selection is not None:
+      skipped = selection.get_skipped(self, symbol_table
+                  , [importlib.util.resolve_name(module_name, package)
+                      for module_name, names in spec_imports if names is None])
+    for module_name, names in spec_imports:
+      if names is None and importlib.util.resolve_name(module_name
+                                                      , package) in skipped:
+        continue
+      module = importlib.import_module(module_name, package=package)
+      if selection is not None and selection.manifest is not None:
+        selection.manifest.record(module)
+      if names is None:
+        results.append(module)
+      else:
+        #  1. check if the imported module has an attribute by that name
+        #  2. if not, attempt to import a submodule with that name
+        #  3. if the attribute is not found, ImportError is raised.
+        #  …
+        for name in names:
+          try:
+            results.append(getattr(module, name))
+          except AttributeError:
+            # attempt to import a submodule with that name
+            sub_module_name = '.'.join([module_name, name])
+            sub_module = importlib.import_module(sub_module_name, package=package)
+            results.append(sub_module)
     return results
 
   def auto_register(self, symbol_table, filter_func=None, spec_imports=None):
@@ -1429,7 +3155,14 @@ class Spec:
       item: the item to be registered
       if filter_func returns a falsy value for an item, the item will
       not be registered.
+
+      While a `fontbakery.manifest.Selection` is active, only its selected
+      checks are registered.
     """
+    from fontbakery.manifest import get_selection
+    selection = get_selection()
+    if selection is not None:
+      filter_func = selection.filter(filter_func)
     if spec_imports:
       symbol_table = symbol_table.copy()  # Avoid messing with original table
       symbol_table['spec_imports'] = spec_imports
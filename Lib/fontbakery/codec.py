@@ -0,0 +1,385 @@
+"""
+Font Bakery codec is a compact binary format for the events of the
+CheckRunner, i.e. tuples (status, message, (section, check, iterargs)),
+see `Encoder`. As a file, e.g. an event log, the events follow a header
+of the four bytes of `MAGIC` and one byte of `VERSION`, see `EventWriter`.
+"""
+from collections import Counter
+import struct
+
+from fontbakery.callable import FontBakeryCheck
+from fontbakery.checkrunner import (
+              Status
+            , Section
+            , FontBakeryRunnerError
+            , _rebuild_runner_error
+            )
+import fontbakery.checkrunner
+from fontbakery.message import Message
+
+MAGIC = b'FBEV'
+# Increment when the format changes, decoders refuse other versions.
+VERSION = 1
+
+class CodecError(Exception):
+  pass
+
+# message type tags
+_NONE, _TRUE, _FALSE, _INT, _FLOAT, _STR, _MESSAGE, _STATUS, _TUPLE, _LIST \
+  , _DICT, _COUNTER, _ERROR, _CHECK, _SECTION = range(15)
+
+# The statuses of the CheckRunner protocol are encoded by weight, others
+# by name and weight.
+_STATUSES = {value.weight: value for value in vars(fontbakery.checkrunner)
+                                    .values() if isinstance(value, Status)}
+_WEIGHT_OFFSET = 64
+_NAMED_STATUS = 255
+
+_double = struct.Struct('<d')
+
+def _write_uint(buffer, value):
+  while value > 0x7f:
+    buffer.append((value & 0x7f) | 0x80)
+    value >>= 7
+  buffer.append(value)
+
+def _write_int(buffer, value):
+  # zigzag
+  _write_uint(buffer, value << 1 if value >= 0 else (-value << 1) - 1)
+
+def _write_str(buffer, value):
+  data = value.encode('utf-8')
+  _write_uint(buffer, len(data))
+  buffer += data
+
+class _Reader:
+  def __init__(self, data):
+    self.data = data
+    self.position = 0
+
+  def byte(self):
+    value = self.data[self.position]
+    self.position += 1
+    return value
+
+  def uint(self):
+    data = self.data
+    position = self.position
+    result = shift = 0
+    while True:
+      value = data[position]
+      position += 1
+      result |= (value & 0x7f) << shift
+      if value < 0x80:
+        break
+      shift += 7
+    self.position = position
+    return result
+
+  def int(self):
+    value = self.uint()
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+  def str(self):
+    length = self.uint()
+    start = self.position
+    self.position += length
+    return self.data[start:self.position].decode('utf-8')
+
+  def float(self):
+    start = self.position
+    self.position += _double.size
+    return _double.unpack_from(self.data, start)[0]
+
+class Encoder:
+  """ Encodes events. Statuses are encoded by weight, checks by id,
+  sections by name and iterargs as (name, index) pairs. The Encoder keeps
+  tables of the identities and names it has seen, an event of a known
+  identity costs a few bytes plus its message. Hence, the events must be
+  decoded in the same order by one Decoder.
+
+  Messages can be None, bool, int, float, str, `Message` (via `getData`),
+  Status, tuples, lists, dicts, Counters, checks, sections and exceptions,
+  which are decoded as `FontBakeryRunnerError` with the same message and
+  traceback. Other messages are encoded by their string representation,
+  which is what reporters use anyways.
+  """
+  def __init__(self):
+    self._names = {}
+    self._identities = {}
+    self._statuses = {}
+
+  def _write_name(self, buffer, name):
+    """ Interned string or None """
+    if name is None:
+      buffer.append(0)
+      return
+    index = self._names.get(name, None)
+    if index is not None:
+      _write_uint(buffer, index + 2)
+      return
+    self._names[name] = len(self._names)
+    buffer.append(1)
+    _write_str(buffer, name)
+
+  def _write_status(self, buffer, status):
+    known = self._statuses.get(status, None)
+    if known is None:
+      weight = status.weight
+      if _STATUSES.get(weight, None) is status:
+        known = self._statuses[status] = bytes((weight + _WEIGHT_OFFSET, ))
+      else:
+        known = bytearray((_NAMED_STATUS, ))
+        _write_str(known, status.name)
+        _write_int(known, weight)
+        known = self._statuses[status] = bytes(known)
+    buffer += known
+
+  def _write_identity(self, buffer, identity):
+    section, check, iterargs = identity
+    key = (section and section.name, check and check.id, iterargs)
+    index = self._identities.get(key, None)
+    if index is not None:
+      _write_uint(buffer, index + 1)
+      return
+    self._identities[key] = len(self._identities)
+    buffer.append(0)
+    self._write_name(buffer, key[0])
+    self._write_name(buffer, key[1])
+    self._write_iterargs(buffer, iterargs)
+
+  def _write_iterargs(self, buffer, iterargs):
+    if iterargs is None:
+      buffer.append(0)
+      return
+    _write_uint(buffer, len(iterargs) + 1)
+    for name, index in iterargs:
+      self._write_name(buffer, name)
+      _write_uint(buffer, index)
+
+  def _write_value(self, buffer, value):
+    if value is None:
+      buffer.append(_NONE)
+    elif value is True:
+      buffer.append(_TRUE)
+    elif value is False:
+      buffer.append(_FALSE)
+    elif isinstance(value, str):
+      buffer.append(_STR)
+      _write_str(buffer, value)
+    elif isinstance(value, Status):
+      buffer.append(_STATUS)
+      self._write_status(buffer, value)
+    elif isinstance(value, int):
+      buffer.append(_INT)
+      _write_int(buffer, value)
+    elif isinstance(value, float):
+      buffer.append(_FLOAT)
+      buffer += _double.pack(value)
+    elif isinstance(value, Message):
+      data = value.getData()
+      buffer.append(_MESSAGE)
+      self._write_value(buffer, data['code'])
+      self._write_value(buffer, data['message'])
+    elif isinstance(value, FontBakeryCheck):
+      buffer.append(_CHECK)
+      self._write_name(buffer, value.id)
+    elif isinstance(value, Section):
+      buffer.append(_SECTION)
+      self._write_name(buffer, value.name)
+    elif isinstance(value, BaseException):
+      buffer.append(_ERROR)
+      self._write_name(buffer, type(value).__name__)
+      _write_str(buffer, str(value))
+      traceback = getattr(value, 'traceback', None)
+      self._write_value(buffer, traceback if isinstance(traceback, str)
+                                                                else None)
+    elif isinstance(value, dict):
+      buffer.append(_COUNTER if isinstance(value, Counter) else _DICT)
+      _write_uint(buffer, len(value))
+      for key, item in value.items():
+        self._write_value(buffer, key)
+        self._write_value(buffer, item)
+    elif isinstance(value, list):
+      buffer.append(_LIST)
+      _write_uint(buffer, len(value))
+      for item in value:
+        self._write_value(buffer, item)
+    elif isinstance(value, tuple) or hasattr(value, '__len__') \
+                                          and hasattr(value, '__iter__'):
+      # e.g. the ExecutionPlan of START
+      buffer.append(_TUPLE)
+      _write_uint(buffer, len(value))
+      for item in value:
+        self._write_value(buffer, item)
+    else:
+      buffer.append(_STR)
+      _write_str(buffer, str(value))
+
+  def encode(self, event):
+    """ Returns the bytes of event. """
+    status, message, identity = event
+    buffer = bytearray()
+    self._write_status(buffer, status)
+    self._write_identity(buffer, identity)
+    self._write_value(buffer, message)
+    return bytes(buffer)
+
+class Decoder:
+  """ Decodes the events of an Encoder, checks and sections are
+  resolved by spec. """
+  def __init__(self, spec):
+    self._spec = spec
+    self._sections = {section.name: section for section in spec.sections}
+    self._checks = {}
+    self._names = []
+    self._identities = []
+
+  def _read_name(self, reader):
+    index = reader.uint()
+    if index == 0:
+      return None
+    if index == 1:
+      name = reader.str()
+      self._names.append(name)
+      return name
+    return self._names[index - 2]
+
+  def _read_status(self, reader):
+    tag = reader.byte()
+    if tag == _NAMED_STATUS:
+      name = reader.str()
+      return Status(name, reader.int())
+    try:
+      return _STATUSES[tag - _WEIGHT_OFFSET]
+    except KeyError:
+      raise CodecError(f'Unknown status weight {tag - _WEIGHT_OFFSET}.')
+
+  def _get_check(self, check_id):
+    check = self._checks.get(check_id, None)
+    if check is None:
+      try:
+        check, _ = self._spec.get_check(check_id)
+      except KeyError:
+        raise CodecError(f'Unknown check "{check_id}".')
+      self._checks[check_id] = check
+    return check
+
+  def _get_section(self, name):
+    try:
+      return self._sections[name]
+    except KeyError:
+      raise CodecError(f'Unknown section "{name}".')
+
+  def _read_identity(self, reader):
+    index = reader.uint()
+    if index:
+      return self._identities[index - 1]
+    section = self._read_name(reader)
+    check_id = self._read_name(reader)
+    length = reader.uint()
+    iterargs = None
+    if length:
+      iterargs = tuple((self._read_name(reader), reader.uint())
+                                            for _ in range(length - 1))
+    identity = (section and self._get_section(section)
+              , check_id and self._get_check(check_id)
+              , iterargs)
+    self._identities.append(identity)
+    return identity
+
+  def _read_value(self, reader):
+    tag = reader.byte()
+    if tag == _NONE:
+      return None
+    if tag == _TRUE:
+      return True
+    if tag == _FALSE:
+      return False
+    if tag == _STR:
+      return reader.str()
+    if tag == _STATUS:
+      return self._read_status(reader)
+    if tag == _INT:
+      return reader.int()
+    if tag == _FLOAT:
+      return reader.float()
+    if tag == _MESSAGE:
+      code = self._read_value(reader)
+      return Message(code, self._read_value(reader))
+    if tag == _CHECK:
+      return self._get_check(self._read_name(reader))
+    if tag == _SECTION:
+      return self._get_section(self._read_name(reader))
+    if tag == _ERROR:
+      cls = getattr(fontbakery.checkrunner, self._read_name(reader), None)
+      if not (isinstance(cls, type) and issubclass(cls, FontBakeryRunnerError)):
+        cls = FontBakeryRunnerError
+      message = reader.str()
+      return _rebuild_runner_error(cls, message, self._read_value(reader))
+    if tag in (_DICT, _COUNTER):
+      result = Counter() if tag == _COUNTER else {}
+      for _ in range(reader.uint()):
+        key = self._read_value(reader)
+        result[key] = self._read_value(reader)
+      return result
+    if tag == _LIST:
+      return [self._read_value(reader) for _ in range(reader.uint())]
+    if tag == _TUPLE:
+      return tuple(self._read_value(reader) for _ in range(reader.uint()))
+    raise CodecError(f'Unknown type tag {tag}.')
+
+  def decode(self, data):
+    """ Returns the event encoded in data. """
+    reader = _Reader(data)
+    status = self._read_status(reader)
+    identity = self._read_identity(reader)
+    return status, self._read_value(reader), identity
+
+class EventWriter:
+  """ Writes events to a binary file, e.g. as a reporter:
+  `distribute_generator(runner.run(), [EventWriter(file).write])`
+  Each event is prefixed with its length.
+  """
+  def __init__(self, file):
+    self._file = file
+    self._encoder = Encoder()
+    file.write(MAGIC + bytes((VERSION, )))
+
+  def write(self, event):
+    data = self._encoder.encode(event)
+    buffer = bytearray()
+    _write_uint(buffer, len(data))
+    buffer += data
+    self._file.write(buffer)
+
+def write_events(file, events):
+  """ Writes the header and then events to the binary file. """
+  writer = EventWriter(file)
+  for event in events:
+    writer.write(event)
+
+def read_events(file, spec):
+  """ Yields the events of a binary file written by `write_events`. """
+  header = file.read(len(MAGIC) + 1)
+  if header[:len(MAGIC)] != MAGIC:
+    raise CodecError('Not a file of fontbakery events.')
+  if header[-1] != VERSION:
+    raise CodecError(f'Version {header[-1]} of the events is not supported.')
+  decoder = Decoder(spec)
+  while True:
+    length = shift = 0
+    while True:
+      byte = file.read(1)
+      if not byte:
+        if shift:
+          raise CodecError('Truncated event.')
+        return
+      length |= (byte[0] & 0x7f) << shift
+      if byte[0] < 0x80:
+        break
+      shift += 7
+    data = file.read(length)
+    if len(data) < length:
+      raise CodecError('Truncated event.')
+    yield decoder.decode(data)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# usage:
+# $ fontbakery check-collection collection/ofl/* collection/apache/*
+"""Check many font families in one process.
+
+Each family directory is checked in a run of its own with the fonts in
+it as the "fonts" value. The specification is imported only once and
+conditions and checks that don't depend on the fonts, e.g. the list of
+registered vendor ids or the installed Font Bakery version, are evaluated
+only once for all families. A JSON report is written for each family and
+a summary of all families to OUTPUT_DIR.
+"""
+import argparse
+from collections import Counter, OrderedDict
+import glob
+import json
+import logging
+import os
+import sys
+
+from fontbakery.cache import ConditionCache, DiskCache, ResultCache
+from fontbakery.checkrunner import (
+              distribute_generator
+            , get_module_specification
+            , CheckRunner
+            , ExecutionOptions
+            , ValueValidationError
+            , ERROR
+            , FAIL
+            , END
+            )
+from fontbakery.commands.check_specification import get_module
+from fontbakery.reporters.serialize import SerializeReporter
+
+DEFAULT_SPECIFICATION = 'fontbakery.specifications.googlefonts'
+
+def get_family_fonts(family_directory):
+  """ The font files to check in family_directory, sorted by name. """
+  return sorted(path for path in glob.glob(os.path.join(family_directory, '*'))
+                if path.lower().rsplit('.', 1)[-1] in ('otf', 'ttf'))
+
+def get_report_names(family_directories):
+  """ Returns a dict family directory => name of its report, the path
+  relative to the common directory of all families, e.g. "ofl/nunito".
+  """
+  paths = [os.path.abspath(directory) for directory in family_directories]
+  common = os.path.commonpath(paths) if len(paths) > 1 \
+                                      else os.path.dirname(paths[0])
+  return OrderedDict((directory, os.path.relpath(path, common))
+                    for directory, path in zip(family_directories, paths))
+
+def check_families(specification, families, values=None, **kwds):
+  """ Yields for each of families, a dict family name => list of fonts,
+  a tuple (name, runner). All runners share the conditions and checks
+  that don't depend on the fonts. Families with fonts that can't be
+  checked are logged and skipped.
+
+  values: more values for each runner.
+  kwds: are passed on to the CheckRunner.
+  """
+  shared_cache = {}
+  for name, fonts in families.items():
+    family_values = dict(values or {})
+    family_values['fonts'] = fonts
+    try:
+      runner = CheckRunner(specification, values=family_values
+                         , shared_cache=shared_cache, **kwds)
+    except ValueValidationError as e:
+      logging.error(f'Skipping {name}: {e}')
+      continue
+    yield name, runner
+
+def ArgumentParser():
+  argument_parser = argparse.ArgumentParser(description=__doc__,
+                                  formatter_class=argparse.RawTextHelpFormatter)
+
+  argument_parser.add_argument('families', nargs='+',
+      metavar='FAMILY_DIR',
+      help='Directories with the font files of a family each.')
+
+  argument_parser.add_argument('-s', '--specification',
+      default=DEFAULT_SPECIFICATION,
+      help='File/Module name, must define a fontbakery "specification".\n'
+           f'(default: {DEFAULT_SPECIFICATION})')
+
+  argument_parser.add_argument('-O', '--output-dir', default='check_results',
+      metavar='OUTPUT_DIR',
+      help='Write the JSON report of each family and summary.json,\n'
+           'the results of all families, to OUTPUT_DIR.\n'
+           '(default: check_results)')
+
+  argument_parser.add_argument('-c', '--checkid', action='append',
+      help='Explicit check-ids (or parts of their name) to be executed.\n'
+           'Use this option multiple times to select multiple checks.')
+
+  argument_parser.add_argument('-x', '--exclude-checkid', action='append',
+      help='Exclude check-ids (or parts of their name) from execution.\n'
+           'Use this option multiple times to exclude multiple checks.')
+
+  argument_parser.add_argument('-j', '--jobs', default=1, type=int,
+      metavar='JOBS',
+      help='Run the checks of each family in JOBS worker processes.\n'
+           '(default: 1)')
+
+  argument_parser.add_argument('-t', '--threads', default=0, type=int,
+      metavar='THREADS',
+      help='Run checks and conditions that are waiting for\n'
+           'the network or for subprocesses in a pool of THREADS.\n'
+           '(default: 0, run them in line with all other checks)')
+
+  argument_parser.add_argument('--cache-dir', default=None,
+      metavar='CACHE_DIR',
+      help='Store the results of expensive conditions in\n'
+           'CACHE_DIR and reuse them in later runs if the\n'
+           'checked files did not change.')
+
+  argument_parser.add_argument('--cache-size', default=512, type=int,
+      metavar='MEGABYTES',
+      help='Size limit of CACHE_DIR, least recently used\n'
+           'entries are removed first. (default: 512)')
+
+  argument_parser.add_argument('--cache-results', default=False,
+      action='store_true',
+      help='Also store the results of the checks in\n'
+           'CACHE_DIR and replay them when neither the check nor\n'
+           'the files it uses changed. Requires --cache-dir.')
+
+  argument_parser.add_argument('--timeout', default=None, type=float,
+      metavar='SECONDS',
+      help='Stop checks that run longer than SECONDS and\n'
+           'report them as ERROR. Checks can define their own\n'
+           'timeout. Each check and each persisted condition\n'
+           'then runs in a forked process, which makes the run\n'
+           'slower. (default: no timeout)')
+  return argument_parser
+
+def main(args=None):
+  argument_parser = ArgumentParser()
+  args = argument_parser.parse_args(args)
+  if args.cache_results and not args.cache_dir:
+    argument_parser.error('--cache-results requires --cache-dir')
+
+  specification = get_module_specification(get_module(args.specification))
+  if not specification:
+    argument_parser.error(f'Can\'t get a specification from {args.specification}.')
+
+  condition_cache = result_cache = None
+  if args.cache_dir:
+    disk_cache = DiskCache(args.cache_dir
+                         , max_size=args.cache_size * 1024 * 1024)
+    condition_cache = ConditionCache(disk_cache)
+    if args.cache_results:
+      result_cache = ResultCache(disk_cache)
+
+  families = OrderedDict((name, get_family_fonts(directory))
+          for directory, name in get_report_names(args.families).items())
+
+  summary = {'families': OrderedDict(), 'result': Counter()}
+  failed = False
+  for name, runner in check_families(specification, families
+                          , explicit_checks=args.checkid
+                          , exclude_checks=args.exclude_checkid
+                          , options=ExecutionOptions(jobs=args.jobs
+                                                   , threads=args.threads
+                                                   , timeout=args.timeout)
+                          , condition_cache=condition_cache
+                          , result_cache=result_cache):
+    print(f'Checking {name}...', file=sys.stderr)
+    reporter = SerializeReporter(runner=runner)
+    result = Counter()
+    def collect(event):
+      status, message, _ = event
+      if status is END:
+        result.update(message)
+    distribute_generator(runner.run(), [reporter.receive, collect])
+
+    report = os.path.join(args.output_dir, f'{name}.json')
+    os.makedirs(os.path.dirname(report), exist_ok=True)
+    with open(report, 'w') as f:
+      json.dump(reporter.getdoc(), f, sort_keys=True, indent=4)
+    summary['families'][name] = {'result': dict(result), 'report': report}
+    summary['result'].update(result)
+    failed = failed or result[ERROR.name] or result[FAIL.name]
+    print('{}: {}'.format(name, ', '.join(f'{count} {status}'
+                          for status, count in sorted(result.items()))))
+
+  summary['result'] = dict(summary['result'])
+  os.makedirs(args.output_dir, exist_ok=True)
+  summary_path = os.path.join(args.output_dir, 'summary.json')
+  with open(summary_path, 'w') as f:
+    json.dump(summary, f, indent=4)
+  print(f'Checked {len(summary["families"])} families: ' + ', '.join(
+                                  f'{count} {status}' for status, count
+                                  in sorted(summary['result'].items())))
+  print(f'The reports have been saved to \'{args.output_dir}\'.')
+  # Fail and error let the command fail
+  return 1 if failed else 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
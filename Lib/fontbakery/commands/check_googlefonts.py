@@ -1,10 +1,13 @@
 #!/usr/bin/env python
+import importlib
 import sys
 
 from functools import partial
-from fontbakery.specifications.googlefonts import specification
 from fontbakery.commands.check_specification import (
-    runner_factory as super_runner_factory, main as super_main)
+    runner_factory as super_runner_factory, main as super_main,
+    get_module_specification)
+
+SPECIFICATION = 'fontbakery.specifications.googlefonts'
 
 # The values dict will probably get one or more specific blacklists
 # for the google font project. It would be good if it was not necessary
@@ -12,6 +15,11 @@ from fontbakery.commands.check_specification import (
 # the google/fonts repository is good.
 GOOGLEFONTS_SPECIFICS = {}
 
+# The specification is imported when it is used, `main` imports it
+# with only the modules needed for the checks selected by -c and -x.
+def get_specification():
+    return get_module_specification(importlib.import_module(SPECIFICATION))
+
 # runner_factory is used by the fontbakery dashboard.
 # It is here in order to have a single place from which
 # the spec is configured for the CLI and the worker.
@@ -19,9 +27,9 @@ def runner_factory(fonts):
     values = {}
     values.update(GOOGLEFONTS_SPECIFICS)
     values['fonts'] = fonts
-    return super_runner_factory(specification, values=values)
+    return super_runner_factory(get_specification(), values=values)
 
-main = partial(super_main, specification, values=GOOGLEFONTS_SPECIFICS)
+main = partial(super_main, SPECIFICATION, values=GOOGLEFONTS_SPECIFICS)
 
 
 if __name__ == '__main__':
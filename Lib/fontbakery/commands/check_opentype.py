@@ -2,12 +2,11 @@
 import sys
 from functools import partial
 
-import fontbakery.specifications.opentype
-from fontbakery.commands.check_specification import (
-    main as super_main, get_module_specification)
+from fontbakery.commands.check_specification import main as super_main
 
-main = partial(super_main,
-               get_module_specification(fontbakery.specifications.opentype))
+# imported by main with only the modules needed for the checks
+# selected by -c and -x.
+main = partial(super_main, 'fontbakery.specifications.opentype')
 
 if __name__ == '__main__':
   sys.exit(main())
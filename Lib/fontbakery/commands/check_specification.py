@@ -4,12 +4,16 @@
 import argparse
 import importlib.util
 import os
+import secrets
 import sys
 from collections import OrderedDict
+from itertools import chain
 
 from fontbakery.checkrunner import (
               distribute_generator
             , CheckRunner
+            , ExecutionOptions
+            , SetupError
             , ValueValidationError
             , Spec
             , get_module_specification
@@ -36,6 +40,15 @@ log_levels =  OrderedDict((s.name,s) for s in sorted((
 
 DEFAULT_LOG_LEVEL = WARN
 
+AUTHKEY_VARIABLE = 'FONTBAKERY_AUTHKEY'
+
+from fontbakery.cache import ConditionCache, DiskCache, ResultCache
+from fontbakery.codec import CodecError, EventWriter
+from fontbakery.constants import PriorityLevel
+from fontbakery.distribute import Coordinator, is_loopback, parse_address
+from fontbakery.journal import Journal
+from fontbakery.manifest import Manifest, get_default_path, select
+from fontbakery.schedule import DurationProfile
 from fontbakery.reporters.terminal import TerminalReporter
 from fontbakery.reporters.serialize import SerializeReporter
 from fontbakery.reporters.ghmarkdown import GHMarkdownReporter
@@ -73,6 +86,14 @@ def ArgumentParser(specification, spec_arg=True):
       ),
   )
 
+  argument_parser.add_argument('--manifest', default=get_default_path(),
+                      metavar='FILE',
+                      help='Keep a manifest of the checks of the modules of\n'
+                      'the specification in the JSON file FILE. With -c\n'
+                      'or -x, modules without selected checks and without\n'
+                      'conditions they need are then not imported.\n'
+                      f'(default: {get_default_path()})')
+
   def log_levels_get(key):
     if key in log_levels:
       return log_levels[key]
@@ -161,6 +182,163 @@ def ArgumentParser(specification, spec_arg=True):
                       'collection against a selection of checks picked with `--checkid`.'
                       ''.format(', '.join(iterargs))
                       )
+
+  argument_parser.add_argument('-j', '--jobs', default=1, type=int,
+                      metavar='JOBS',
+                      help='Run the checks in JOBS worker processes.\n'
+                      'Check executions are distributed by {}, checks that\n'
+                      'don\'t use it run in the main process.\n'
+                      '(default: 1)'.format(iterargs[0] if iterargs else
+                                                    'ITERATED_ARG')
+                      )
+
+  argument_parser.add_argument('-t', '--threads', default=0, type=int,
+                      metavar='THREADS',
+                      help='Run checks and conditions that are waiting for\n'
+                      'the network or for subprocesses in a pool of THREADS.\n'
+                      '(default: 0, run them in line with all other checks)'
+                      )
+
+  argument_parser.add_argument('--prefetch', default=0, type=int,
+                      metavar='COUNT',
+                      help='While a check runs, evaluate expensive conditions\n'
+                      'of the next COUNT checks in background threads.\n'
+                      '(default: 0, evaluate them when they are needed)'
+                      )
+
+  argument_parser.add_argument('--cache-dir', default=None,
+                      metavar='CACHE_DIR',
+                      help='Store the results of expensive conditions in\n'
+                      'CACHE_DIR and reuse them in later runs if the\n'
+                      'checked files did not change.')
+
+  argument_parser.add_argument('--cache-size', default=512, type=int,
+                      metavar='MEGABYTES',
+                      help='Size limit of CACHE_DIR, least recently used\n'
+                      'entries are removed first. (default: 512)')
+
+  argument_parser.add_argument('--cache-results', default=False,
+                      action='store_true',
+                      help='Also store the results of the checks in\n'
+                      'CACHE_DIR and replay them when neither the check nor\n'
+                      'the files it uses changed. Requires --cache-dir.')
+
+  argument_parser.add_argument('--profile', default=False,
+                      action='store_true',
+                      help='List the slowest check executions and\n'
+                      'condition evaluations at the end of the run.')
+
+  argument_parser.add_argument('--low-memory', default=False,
+                      action='store_true',
+                      help='Drop the values of conditions as soon as no\n'
+                      'remaining check can use them and keep the conditions\n'
+                      'of only one {} in memory at a time, unless\n'
+                      '--max-resident is given.'.format(iterargs[0] if iterargs
+                                                      else 'ITERATED_ARG')
+                      )
+
+  argument_parser.add_argument('--max-resident', default=None, type=int,
+                      metavar='COUNT',
+                      help='Keep the conditions of at most COUNT {}s in\n'
+                      'memory, evaluate them again when needed.'
+                      ''.format(iterargs[0] if iterargs else 'ITERATED_ARG')
+                      )
+
+  argument_parser.add_argument('--memory-budget', default=None, type=float,
+                      metavar='MEGABYTES',
+                      help='Keep large values, e.g. parsed fonts, within\n'
+                      'MEGABYTES of memory. The least recently used are\n'
+                      'dropped first and parsed again when needed. The\n'
+                      'hits and misses are reported at the end.'
+                      )
+
+  argument_parser.add_argument('--timeout', default=None, type=float,
+                      metavar='SECONDS',
+                      help='Stop checks that run longer than SECONDS and\n'
+                      'report them as ERROR. Checks can define their own\n'
+                      'timeout. Each check and each persisted condition\n'
+                      'then runs in a forked process, which makes the run\n'
+                      'slower. (default: no timeout)')
+
+  argument_parser.add_argument('--fail-fast', default=None, nargs='?',
+                      const='TRIVIAL', type=str.upper, metavar='PRIORITY',
+                      choices=[level.name for level in PriorityLevel],
+                      help='Run the most important checks first and stop\n'
+                      'at the first FAIL or ERROR of a check with at least\n'
+                      'PRIORITY, one of {}. Without PRIORITY any\n'
+                      'FAIL or ERROR stops the run.'.format(', '.join(
+                                        level.name for level in PriorityLevel))
+                      )
+
+  argument_parser.add_argument('--durations', default=None,
+                      metavar='FILE',
+                      help='Keep estimated durations of the checks in the\n'
+                      'JSON file FILE, updated after each run. They are used\n'
+                      'to start the longest jobs first and, on a terminal,\n'
+                      'to run cheap checks first.')
+
+  argument_parser.add_argument('--time-budget', default=None, type=float,
+                      metavar='SECONDS',
+                      help='Run only the most important checks that are\n'
+                      'estimated to fit in SECONDS, by their priority and\n'
+                      'the durations of --durations, which it requires.')
+
+  argument_parser.add_argument('--stop-at-budget', default=False,
+                      action='store_true',
+                      help='Run the most important checks first and, when\n'
+                      'the --time-budget is spent, report the checks that\n'
+                      'did not run yet as SKIP.')
+
+  argument_parser.add_argument('--coordinator', default=None,
+                      metavar='[HOST:]PORT',
+                      help='Don\'t execute the checks here, wait for\n'
+                      '`fontbakery worker` processes to connect to HOST:PORT\n'
+                      'and distribute the checks to them. Workers must use\n'
+                      'the same key in the environment variable\n'
+                      '{}. If it is not set and HOST is not\n'
+                      'localhost, a key is generated and printed.'
+                      ''.format(AUTHKEY_VARIABLE))
+
+  argument_parser.add_argument('--worker-timeout', default=600, type=float,
+                      metavar='SECONDS',
+                      help='With --coordinator, report the checks that did\n'
+                      'not run yet as ERROR when no worker is connected for\n'
+                      'SECONDS (default: %(default)s).')
+
+  argument_parser.add_argument('--event-log', default=None,
+                      type=argparse.FileType('wb'),
+                      metavar='EVENT_LOG_FILE',
+                      help='Write all events of the run to EVENT_LOG_FILE,\n'
+                      'in the binary format of fontbakery.codec.')
+
+  argument_parser.add_argument('--stream', default=None,
+                      type=argparse.FileType('r'),
+                      metavar='FILE',
+                      help='Read more {0}s from FILE, one per line, "-" for\n'
+                      'standard input, and check each {0} as soon as it is\n'
+                      'read. Checks that use all {0}s run at the end.'
+                      ''.format(iterargs[0] if iterargs else 'ITERATED_ARG')
+                      )
+
+  argument_parser.add_argument('--journal', default=None,
+                      metavar='JOURNAL',
+                      help='Record the results of the checks in the file\n'
+                      'JOURNAL as they complete, so that the run can be\n'
+                      'continued with --resume if it is interrupted.')
+
+  argument_parser.add_argument('--resume', default=None,
+                      metavar='JOURNAL',
+                      help='Continue the run recorded in JOURNAL: report the\n'
+                      'results it has and execute only the remaining checks,\n'
+                      'recording them in JOURNAL as well.')
+
+  argument_parser.add_argument('--watch', default=False,
+                      action='store_true',
+                      help='Keep running after the checks and watch the\n'
+                      'checked files and the files next to them that the\n'
+                      'checks read, e.g. METADATA.pb. When they change, run\n'
+                      'the checks that can depend on them again and report\n'
+                      'the updated results. The reports are not watched.')
   return argument_parser, values_keys
 
 class ArgumentParserError(Exception): pass
@@ -190,16 +368,26 @@ def get_module(name):
     imported = import_module(name, package=None)
   return imported
 
-def get_spec():
-  """ Prefetch the specification module, to fill some holes in the help text."""
+def get_spec(name=None):
+  """ Prefetch the specification module, to fill some holes in the help text.
+
+  name: of the specification module, if not given it is taken from the
+      command line. The module is imported with the checks selected by
+      -c and -x only, see `fontbakery.manifest`.
+  """
   argument_parser = ThrowingArgumentParser(add_help=False)
-  argument_parser.add_argument('specification')
+  if name is None:
+    argument_parser.add_argument('specification')
+  argument_parser.add_argument('-c', '--checkid', action='append')
+  argument_parser.add_argument('-x', '--exclude-checkid', action='append')
+  argument_parser.add_argument('--manifest', default=get_default_path())
   try:
     args, _ = argument_parser.parse_known_args()
   except ArgumentParserError:
     # silently fails, the main parser will show usage string.
     return Spec()
-  imported = get_module(args.specification)
+  with select(args.checkid, args.exclude_checkid, Manifest(args.manifest)):
+    imported = get_module(name or args.specification)
   specification = get_module_specification(imported)
   if not specification:
     raise Exception(f"Can't get a specification from {imported}.")
@@ -212,10 +400,12 @@ runner_factory = CheckRunner
 
 def main(specification=None, values=None):
   # specification can be injected by e.g. check-googlefonts injects it's own spec
+  # or the name of its module, which is then imported only with the modules
+  # needed for the selected checks.
   add_spec_arg = False
-  if specification is None:
-    specification = get_spec()
-    add_spec_arg = True
+  if specification is None or isinstance(specification, str):
+    add_spec_arg = specification is None
+    specification = get_spec(specification)
 
   argument_parser, values_keys = ArgumentParser(specification, spec_arg=add_spec_arg)
   args = argument_parser.parse_args()
@@ -239,17 +429,124 @@ def main(specification=None, values=None):
       if hasattr(args, key):
         values_[key] = getattr(args, key)
 
+  if args.cache_results and not args.cache_dir:
+    argument_parser.error('--cache-results requires --cache-dir')
+
+  stream = None
+  if args.stream:
+    for option, value in (('--jobs', args.jobs > 1)
+                        , ('--coordinator', args.coordinator)
+                        , ('--cache-results', args.cache_results)
+                        , ('--journal', args.journal)
+                        , ('--resume', args.resume)):
+      if value:
+        argument_parser.error(f'--stream can\'t be used with {option}')
+    stream = next(iter(specification.iterargs))
+    plural = specification.iterargs[stream]
+    lines = (line.strip() for line in args.stream)
+    values_[plural] = chain(values_.get(plural, ()), filter(None, lines))
+
+  # the files written by the run must neither change the keys of results
+  # nor trigger --watch
+  outputs = [output_file.name for output_file
+                      in (args.json, args.ghmarkdown, args.html, args.event_log)
+                                                              if output_file]
+  outputs += filter(None, (args.journal, args.resume, args.durations
+                                                    , args.manifest))
+
+  condition_cache = result_cache = None
+  if args.cache_dir:
+    disk_cache = DiskCache(args.cache_dir
+                         , max_size=args.cache_size * 1024 * 1024)
+    condition_cache = ConditionCache(disk_cache)
+    if args.cache_results:
+      result_cache = ResultCache(disk_cache, ignored=outputs)
+
+  duration_profile = None
+  if args.durations:
+    duration_profile = DurationProfile(args.durations)
+
+  if args.time_budget is not None and not args.durations:
+    argument_parser.error('--time-budget requires --durations')
+  if args.stop_at_budget and args.time_budget is None:
+    argument_parser.error('--stop-at-budget requires --time-budget')
+  if args.time_budget is not None and args.stream:
+    argument_parser.error('--time-budget can\'t be used with --stream')
+
+  coordinator = None
+  if args.coordinator:
+    address = parse_address(args.coordinator)
+    authkey = os.environ.get(AUTHKEY_VARIABLE, None)
+    if not authkey and not is_loopback(address[0]):
+      # the checks are sent pickled, strangers must not connect
+      authkey = secrets.token_hex(16)
+      print(f'Start the workers with {AUTHKEY_VARIABLE}={authkey}'
+                                                        , file=sys.stderr)
+    coordinator = Coordinator(address
+                          , authkey=authkey.encode('utf-8') if authkey else None
+                          , worker_timeout=args.worker_timeout)
+    print('Distributing the checks to workers connecting to {}:{}.'.format(
+                                    *coordinator.address), file=sys.stderr)
+
+  if args.journal and args.resume:
+    argument_parser.error('--journal can\'t be used with --resume')
+  if args.watch:
+    for option, value in (('--stream', args.stream)
+                        , ('--coordinator', args.coordinator)
+                        , ('--journal', args.journal)
+                        , ('--resume', args.resume)):
+      if value:
+        argument_parser.error(f'--watch can\'t be used with {option}')
+  journal = None
+  if args.journal or args.resume:
+    try:
+      journal = Journal(args.resume or args.journal, resume=bool(args.resume))
+    except (OSError, CodecError) as e:
+      argument_parser.error(f'Can\'t use the journal: {e}')
+
+  max_resident = args.max_resident
+  if args.low_memory and max_resident is None:
+    max_resident = 1
+
   try:
+    options = ExecutionOptions(
+                          jobs=args.jobs
+                        , threads=args.threads
+                        , prefetch=args.prefetch
+                        , timeout=args.timeout
+                        , release_conditions=args.low_memory and not stream
+                        , max_resident=max_resident
+                        , memory_budget=args.memory_budget
+                                    and int(args.memory_budget * 1024 * 1024)
+                        , timing=args.profile or duration_profile is not None
+                        , fail_fast=args.fail_fast and PriorityLevel[args.fail_fast]
+                        , cheapest_first=duration_profile is not None
+                                                    and sys.stdout.isatty()
+                        , time_budget=args.time_budget
+                        , stop_at_budget=args.stop_at_budget
+                        )
     runner = CheckRunner(specification
                         , values=values_
                         , custom_order=args.order
                         , explicit_checks=args.checkid
                         , exclude_checks=args.exclude_checkid
+                        , options=options
+                        , condition_cache=condition_cache
+                        , result_cache=result_cache
+                        , duration_profile=duration_profile
+                        , coordinator=coordinator
+                        , stream=stream
+                        , journal=journal
                         )
   except ValueValidationError as e:
     print(e)
     argument_parser.print_usage()
     sys.exit(1)
+  except SetupError as e:
+    if journal is None:
+      raise
+    # e.g. the journal was recorded with other fonts or checks
+    argument_parser.error(str(e))
 
   # The default Windows Terminal just displays the escape codes. The argument
   # parser above therefore has these options disabled.
@@ -259,54 +556,91 @@ def main(specification=None, values=None):
 
   # the most verbose loglevel wins
   loglevel = min(args.loglevels) if args.loglevels else DEFAULT_LOG_LEVEL
-  tr = TerminalReporter(runner=runner, is_async=False
-                       , print_progress=not args.no_progress
-                       , check_threshold=loglevel
-                       , log_threshold=args.loglevel_messages or loglevel
-                       , usecolor=not args.no_colors
-                       , collect_results_by=args.gather_by
-                       , skip_status_report=None if args.show_sections\
-                                                      else (STARTSECTION, ENDSECTION)
-
-                       )
-  reporters = [tr.receive]
-
-  if args.json:
-    sr = SerializeReporter(runner=runner, collect_results_by=args.gather_by)
-    reporters.append(sr.receive)
-
-  if args.ghmarkdown:
-    mdr = GHMarkdownReporter(loglevels=args.loglevels,
-                             runner=runner,
-                             collect_results_by=args.gather_by)
-    reporters.append(mdr.receive)
-
-  if args.html:
-    hr = HTMLReporter(loglevels=args.loglevels,
-                      runner=runner,
-                      collect_results_by=args.gather_by)
-    reporters.append(hr.receive)
-
-  distribute_generator(runner.run(), reporters)
-
-  if args.json:
-    import json
-    json.dump(sr.getdoc(), args.json, sort_keys=True, indent=4)
-    print("A report in JSON format has been"
-          " saved to '{}'".format(args.json.name))
-
-  if args.ghmarkdown:
-    args.ghmarkdown.write(mdr.get_markdown())
-    print("A report in GitHub Markdown format which can be useful\n"
-          " for posting issues on a GitHub issue tracker has been\n"
-          " saved to '{}'".format(args.ghmarkdown.name))
-
-  if args.html:
-    args.html.write(hr.get_html())
-    print(f"A report in HTML format has been saved to '{args.html.name}'")
+  event_writer = EventWriter(args.event_log) if args.event_log else None
+
+  def report(events):
+    """ Reports events, a run, and returns the worst check status. """
+    tr = TerminalReporter(runner=runner, is_async=False
+                         , print_progress=not args.no_progress
+                         , check_threshold=loglevel
+                         , log_threshold=args.loglevel_messages or loglevel
+                         , usecolor=not args.no_colors
+                         , collect_results_by=args.gather_by
+                         , profile=args.profile
+                         , skip_status_report=None if args.show_sections\
+                                                        else (STARTSECTION, ENDSECTION)
+
+                         )
+    reporters = [tr.receive]
+
+    if args.json:
+      sr = SerializeReporter(runner=runner, collect_results_by=args.gather_by)
+      reporters.append(sr.receive)
+
+    if args.ghmarkdown:
+      mdr = GHMarkdownReporter(loglevels=args.loglevels,
+                               runner=runner,
+                               collect_results_by=args.gather_by)
+      reporters.append(mdr.receive)
+
+    if args.html:
+      hr = HTMLReporter(loglevels=args.loglevels,
+                        runner=runner,
+                        collect_results_by=args.gather_by)
+      reporters.append(hr.receive)
+
+    if event_writer:
+      reporters.append(event_writer.write)
+
+    distribute_generator(events, reporters)
+
+    # with --watch, each run replaces the reports of the run before
+    for report_file in (args.json, args.ghmarkdown, args.html):
+      if report_file and report_file.seekable():
+        report_file.seek(0)
+        report_file.truncate()
+
+    if args.json:
+      import json
+      json.dump(sr.getdoc(), args.json, sort_keys=True, indent=4)
+      args.json.flush()
+      print("A report in JSON format has been"
+            " saved to '{}'".format(args.json.name))
+
+    if args.ghmarkdown:
+      args.ghmarkdown.write(mdr.get_markdown())
+      args.ghmarkdown.flush()
+      print("A report in GitHub Markdown format which can be useful\n"
+            " for posting issues on a GitHub issue tracker has been\n"
+            " saved to '{}'".format(args.ghmarkdown.name))
+
+    if args.html:
+      args.html.write(hr.get_html())
+      args.html.flush()
+      print(f"A report in HTML format has been saved to '{args.html.name}'")
+    return tr.worst_check_status
+
+  if args.watch:
+    worst_check_status = None
+    try:
+      for changed, events in runner.watch(ignored=outputs):
+        if changed:
+          print('\nChanged: {}'.format(', '.join(sorted(changed))))
+        worst_check_status = report(events)
+        print('Watching for changes, press Ctrl+C to stop.')
+    except KeyboardInterrupt:
+      pass
+  else:
+    worst_check_status = report(runner.run())
+
+  if args.event_log:
+    args.event_log.close()
+
+  if journal is not None:
+    journal.close()
 
   # Fail and error let the command fail
-  return 1 if tr.worst_check_status in (ERROR, FAIL) else 0
+  return 1 if worst_check_status in (ERROR, FAIL) else 0
 
 if __name__ == '__main__':
     sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# usage:
+# $ fontbakery serve --socket /tmp/fontbakery.sock
+"""Keep specifications loaded and check fonts for clients.
+
+The server accepts check jobs over HTTP, on a unix socket or a TCP port,
+and streams the events of each run back, one JSON object per line. See
+`fontbakery.server` for the protocol, e.g.:
+
+  curl --unix-socket /tmp/fontbakery.sock http://localhost/check \\
+       -d '{"values": {"fonts": ["/path/to/Family-Regular.ttf"]}}'
+
+Conditions and checks that don't depend on the fonts, e.g. the list of
+registered vendor ids, stay cached between jobs.
+"""
+import argparse
+import logging
+import sys
+
+from fontbakery.cache import ConditionCache, DiskCache
+from fontbakery.checkrunner import ExecutionOptions, get_module_specification
+from fontbakery.commands.check_specification import get_module
+from fontbakery.distribute import parse_address
+from fontbakery.server import Server
+
+DEFAULT_SPECIFICATION = 'fontbakery.specifications.googlefonts'
+
+def main(args=None):
+  argument_parser = argparse.ArgumentParser(description=__doc__,
+                                  formatter_class=argparse.RawTextHelpFormatter)
+  address = argument_parser.add_mutually_exclusive_group(required=True)
+  address.add_argument('--socket', default=None, metavar='PATH',
+      help='Listen on the unix socket PATH, only the user\n'
+           'running the server can connect to it.')
+  address.add_argument('--port', default=None, metavar='[HOST:]PORT',
+      help='Listen on the TCP port PORT of HOST. (default HOST: localhost)\n'
+           'There is no authentication, all local users can submit\n'
+           'jobs, use a HOST that only trusted clients can reach.')
+  argument_parser.add_argument('-s', '--specification', action='append',
+      help='File/Module name, must define a fontbakery "specification".\n'
+           'Use this option multiple times to serve multiple\n'
+           f'specifications. (default: {DEFAULT_SPECIFICATION})')
+  argument_parser.add_argument('-t', '--threads', default=0, type=int,
+      metavar='THREADS',
+      help='Run checks and conditions that are waiting for\n'
+           'the network or for subprocesses in a pool of THREADS.\n'
+           '(default: 0, run them in line with all other checks)')
+  argument_parser.add_argument('--cache-dir', default=None,
+      metavar='CACHE_DIR',
+      help='Store the results of expensive conditions in\n'
+           'CACHE_DIR and reuse them in later jobs if the\n'
+           'checked files did not change.')
+  argument_parser.add_argument('--cache-size', default=512, type=int,
+      metavar='MEGABYTES',
+      help='Size limit of CACHE_DIR, least recently used\n'
+           'entries are removed first. (default: 512)')
+  argument_parser.add_argument('--max-age', default=3600, type=float,
+      metavar='SECONDS',
+      help='Evaluate the conditions and checks that are shared between\n'
+           'jobs again when they are older than SECONDS. (default: 3600)')
+  argument_parser.add_argument('--timeout', default=None, type=float,
+      metavar='SECONDS',
+      help='Stop checks that run longer than SECONDS and\n'
+           'report them as ERROR. Checks can define their own\n'
+           'timeout. Each check and each persisted condition\n'
+           'then runs in a forked process, which makes the run\n'
+           'slower. (default: no timeout)')
+  args = argument_parser.parse_args(args)
+  logging.basicConfig(level=logging.INFO)
+
+  specifications = {}
+  for name in args.specification or [DEFAULT_SPECIFICATION]:
+    specification = get_module_specification(get_module(name))
+    if not specification:
+      argument_parser.error(f'Can\'t get a specification from {name}.')
+    specifications[name] = specification
+
+  condition_cache = None
+  if args.cache_dir:
+    condition_cache = ConditionCache(DiskCache(args.cache_dir
+                                  , max_size=args.cache_size * 1024 * 1024))
+
+  server = Server(specifications, max_age=args.max_age
+                , options=ExecutionOptions(threads=args.threads
+                                         , timeout=args.timeout)
+                , condition_cache=condition_cache)
+  http_server = server.listen(args.socket or parse_address(args.port))
+  print('Serving {} at {}.'.format(', '.join(specifications)
+                      , args.socket or '{}:{}'.format(*http_server.server_address))
+                      , file=sys.stderr)
+  try:
+    http_server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    http_server.server_close()
+
+
+if __name__ == '__main__':
+  sys.exit(main())
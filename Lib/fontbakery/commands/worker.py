@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# usage:
+# $ fontbakery worker fontbakery.specifications.googlefonts coordinator:5000
+"""Execute checks for a coordinator, see `--coordinator` of the check commands.
+
+The worker connects to the coordinator, executes the checks it sends and
+exits when the coordinator is done. Start as many workers per machine as
+it has CPUs.
+"""
+import argparse
+import os
+import sys
+
+from fontbakery.checkrunner import get_module_specification
+from fontbakery.commands.check_specification import (
+    AUTHKEY_VARIABLE, get_module)
+from fontbakery.distribute import is_loopback, parse_address, work
+
+
+def main(args=None):
+  argument_parser = argparse.ArgumentParser(description=__doc__,
+                                  formatter_class=argparse.RawTextHelpFormatter)
+  argument_parser.add_argument('specification',
+      help='File/Module name, must define the fontbakery "specification"\n'
+           'of the coordinator, e.g. fontbakery.specifications.googlefonts')
+  argument_parser.add_argument('coordinator', metavar='[HOST:]PORT',
+      help='Address of the coordinator. Unless it is localhost, set\n'
+           f'{AUTHKEY_VARIABLE} to the key of the coordinator.')
+  argument_parser.add_argument('--retry-for', default=60, type=float,
+      metavar='SECONDS',
+      help='Keep trying to connect for SECONDS, e.g. while the coordinator\n'
+           'is starting. (default: 60)')
+  args = argument_parser.parse_args(args)
+
+  specification = get_module_specification(get_module(args.specification))
+  if not specification:
+    argument_parser.error(f'Can\'t get a specification from {args.specification}.')
+  address = parse_address(args.coordinator)
+  authkey = os.environ.get(AUTHKEY_VARIABLE, None)
+  if not authkey and not is_loopback(address[0]):
+    argument_parser.error(f'{AUTHKEY_VARIABLE} must be set to the key of the'
+                           ' coordinator, it is not on localhost.')
+  count = work(address, specification
+             , authkey=authkey.encode('utf-8') if authkey else None
+             , retry_for=args.retry_for)
+  print(f'Executed {count} checks.')
+
+
+if __name__ == '__main__':
+  sys.exit(main())
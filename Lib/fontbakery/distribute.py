@@ -0,0 +1,298 @@
+"""
+Font Bakery distribute runs the checks of a CheckRunner on workers that
+connect over TCP, e.g. from other machines, see `Coordinator` and `work`.
+The messages are pickled, whoever can connect without the `authkey` can
+execute code on the other side, hence an authkey is required for all
+addresses but loopback ones.
+"""
+from collections import deque
+import ipaddress
+from multiprocessing.connection import Client, Listener, wait
+import logging
+import queue
+import socket
+import threading
+import time
+
+from fontbakery.checkrunner import (
+              CheckRunner
+            , ExecutionOptions
+            , STARTCHECK
+            , ERROR
+            )
+from fontbakery.codec import Decoder, Encoder, VERSION as CODEC_VERSION
+from fontbakery.multiproc import shard_order
+from fontbakery.schedule import longest_first
+
+def parse_address(address):
+  """ Returns the tuple (host, port) of a "host:port" string. """
+  host, _, port = address.rpartition(':')
+  return host or 'localhost', int(port)
+
+def is_loopback(host):
+  """ True if all addresses of host are loopback addresses, which only
+  processes of the same machine can connect to. """
+  try:
+    addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+  except (OSError, UnicodeError):
+    return False
+  return bool(addresses) and all(ipaddress.ip_address(address.split('%')[0])
+                                      .is_loopback for address in addresses)
+
+def _check_authkey(address, authkey):
+  if authkey is None and not is_loopback(address[0]):
+    raise ValueError(f'An authkey is required for {address[0]}, it is not'
+                      ' a loopback address.')
+
+class Coordinator:
+  """ Hands out the checks of a run to the workers that connect to
+  address. Set it as the `coordinator` of a CheckRunner.
+
+  The order is split into batches like the shards of `fontbakery.multiproc`
+  and each worker gets one batch at a time, as identities serialized by
+  `Spec.serialize_identity`. The events that workers stream back are
+  yielded in the original order. When a worker disconnects, the
+  identities of its batch it did not finish are handed out again.
+  Workers must be able to import the same specification and the values
+  of the run (e.g. file paths) must be valid where they run.
+
+  A Coordinator is used for one run, its listener is closed when the
+  run ends.
+  """
+  def __init__(self, address, authkey=None, max_attempts=3
+                                                    , worker_timeout=600):
+    """
+      address: tuple (host, port), with port 0 a free port is used,
+          see `address`.
+      authkey: bytes, workers must use the same key. Required unless
+          host is a loopback address, otherwise ValueError is raised.
+      max_attempts: a check is executed at most this often, if its
+          workers keep disconnecting it is reported as an ERROR.
+      worker_timeout: seconds to wait while no worker is connected,
+          then the checks that were not executed yet are reported as
+          an ERROR. None to wait forever.
+    """
+    _check_authkey(address, authkey)
+    self._listener = Listener(address, authkey=authkey)
+    # kept after the listener is closed
+    self._address = self._listener.address
+    self._max_attempts = max_attempts
+    self._worker_timeout = worker_timeout
+    self._connections = queue.Queue()
+    self._closed = False
+    self._accept_thread = threading.Thread(target=self._accept, daemon=True)
+    self._accept_thread.start()
+
+  @property
+  def address(self):
+    return self._address
+
+  def _accept(self):
+    while True:
+      try:
+        connection = self._listener.accept()
+      except Exception as e:
+        if self._closed:
+          return
+        # e.g. a wrong authkey
+        logging.warning(f'A worker could not connect: {e}')
+        continue
+      if self._closed:
+        connection.close()
+        return
+      self._connections.put(connection)
+
+  def close(self):
+    if self._closed:
+      return
+    self._closed = True
+    # The socket keeps listening while a thread accepts on it, wake
+    # that thread up first.
+    try:
+      socket.create_connection(self._address, timeout=1).close()
+    except OSError:
+      pass
+    else:
+      self._accept_thread.join()
+    self._listener.close()
+
+  def _get_error_events(self, runner, check, message):
+    return ((STARTCHECK, None), ) + tuple(runner._summarize_check(check
+                                                  , ((ERROR, message), )))
+
+  def run(self, runner, order):
+    """ Yields for each identity in order, in the same order, an iterable
+    of the check events. See `CheckRunner._run_order`.
+    """
+    spec = runner.specification
+    parent_indexes, shards = shard_order(order, runner.shard_by)
+    if runner._duration_profile is not None:
+      shards = longest_first(shards, order, runner._duration_profile)
+    pending = deque([indexes for _, _, indexes in shards])
+    if parent_indexes:
+      pending.appendleft(sorted(parent_indexes))
+    setup = {
+      'values': runner._values
+    , 'options': {'timing': runner.options.timing
+                , 'timeout': runner.options.timeout}
+    , 'checks': sorted({check.id for _, check, _ in order})
+    , 'codec': CODEC_VERSION
+    }
+    # connection => indexes of its batch that are not done, None if idle
+    workers = {}
+    decoders = {}
+    attempts = {}
+    done = {}
+
+    def add_worker(connection):
+      try:
+        connection.send(('setup', setup))
+      except OSError:
+        connection.close()
+        return
+      workers[connection] = None
+      decoders[connection] = Decoder(spec)
+
+    def remove_worker(connection):
+      connection.close()
+      del decoders[connection]
+      remaining = workers.pop(connection)
+      if not remaining:
+        return
+      # probably the first remaining identity made the worker fail
+      first = remaining[0]
+      attempts[first] = attempts.get(first, 0) + 1
+      logging.warning(f'A worker disconnected, {len(remaining)} checks'
+                      ' are handed out again.')
+      if attempts[first] >= self._max_attempts:
+        done[first] = self._get_error_events(runner, order[first][1]
+                          , f'The check was not executed, the workers'
+                            f' disconnected {self._max_attempts} times.')
+        remaining = remaining[1:]
+      if remaining:
+        pending.appendleft(remaining)
+
+    def step():
+      if not workers:
+        logging.info(f'Waiting for workers at {self.address}.')
+        try:
+          add_worker(self._connections.get(timeout=self._worker_timeout))
+        except queue.Empty:
+          message = (f'The check was not executed, no worker connected'
+                     f' within {self._worker_timeout} seconds.')
+          while pending:
+            for index in pending.popleft():
+              done[index] = self._get_error_events(runner, order[index][1]
+                                                                  , message)
+          return
+      while not self._connections.empty():
+        add_worker(self._connections.get_nowait())
+      for connection, batch in list(workers.items()):
+        if batch is None and pending:
+          batch = pending.popleft()
+          workers[connection] = batch
+          try:
+            connection.send(('batch', [(index, spec.serialize_identity(
+                                      order[index])) for index in batch]))
+          except OSError:
+            remove_worker(connection)
+      for connection in wait(list(workers), timeout=1):
+        try:
+          _, index, data = connection.recv()
+        except (EOFError, OSError):
+          remove_worker(connection)
+          continue
+        decode = decoders[connection].decode
+        done[index] = tuple(decode(event)[:2] for event in data)
+        batch = workers[connection]
+        batch.remove(index)
+        if not batch:
+          workers[connection] = None
+
+    try:
+      for index in range(len(order)):
+        while index not in done:
+          step()
+        yield done.pop(index)
+    finally:
+      self.close()
+      # including the workers that connected but got no batch yet
+      connections = list(workers)
+      while not self._connections.empty():
+        connections.append(self._connections.get_nowait())
+      for connection in connections:
+        try:
+          connection.send(('done', ))
+        except OSError:
+          pass
+        connection.close()
+
+def _connect(address, authkey, retry_for):
+  deadline = time.monotonic() + retry_for
+  while True:
+    try:
+      return Client(address, authkey=authkey)
+    except ConnectionRefusedError:
+      if time.monotonic() >= deadline:
+        raise
+      time.sleep(1)
+
+def work(address, specification, authkey=None, retry_for=60, options=None
+                                                                  , **kwds):
+  """ Connects to the Coordinator at address and executes the checks it
+  sends, until it is done. Returns the number of executed checks.
+
+  address: tuple (host, port)
+  specification: the same Spec as used by the coordinator.
+  authkey: bytes, the key of the coordinator. Required unless host is a
+      loopback address, otherwise ValueError is raised.
+  retry_for: seconds to retry connecting, e.g. while the coordinator
+      is not started yet.
+  options: the `ExecutionOptions` of the CheckRunner, e.g. threads. The
+      timing and timeout are those of the coordinator.
+  kwds: are passed on to the CheckRunner, e.g. a condition_cache.
+  """
+  _check_authkey(address, authkey)
+  count = 0
+  with _connect(address, authkey, retry_for) as connection:
+    try:
+      _, setup = connection.recv()
+      missing = []
+      for check_id in setup['checks']:
+        try:
+          specification.get_check(check_id)
+        except KeyError:
+          missing.append(check_id)
+      if missing:
+        logging.error('The specification of the coordinator has other'
+                      ' checks, missing: {}'.format(', '.join(missing)))
+        return count
+      if setup['codec'] != CODEC_VERSION:
+        logging.error(f'The coordinator uses version {setup["codec"]} of'
+                      f' the event codec, this worker {CODEC_VERSION}.')
+        return count
+      encode = Encoder().encode
+      options = (options or ExecutionOptions()).replace(**setup['options'])
+      runner = CheckRunner(specification, setup['values'], options=options
+                                                                  , **kwds)
+      shard_by = runner.shard_by
+      while True:
+        message = connection.recv()
+        if message[0] == 'done':
+          break
+        _, batch = message
+        for index, identity in batch:
+          identity, = specification.deserialize_order([identity])
+          _, check, iterargs = identity
+          events = [encode((status, message, identity)) for status, message
+                                      in runner._run_check(check, iterargs)]
+          connection.send(('events', index, events))
+          count += 1
+        # like in multiproc, keep only conditions not using shard_by
+        conditions = runner._cache['conditions']
+        for key in [key for key in conditions
+                          if any(name == shard_by for name, _ in key[1])]:
+          del conditions[key]
+    except (EOFError, OSError):
+      logging.warning('The coordinator disconnected.')
+  return count
@@ -52,6 +52,27 @@ fonts_expected_value = ExpectedValue(
                                     else (False, 'Value is empty.')
 )
 
+# The parsed tables of a font take about this many times the bytes of
+# their binary data.
+TTFONT_MEMORY_FACTOR = 10
+
+def ttfont_memory(ttFont):
+  """ The estimated bytes of memory used by ttFont, a fontTools TTFont,
+  when all its tables are parsed. Used as the `memory` of the "ttFont"
+  condition, see `ExecutionOptions.memory_budget`. """
+  reader = ttFont.reader
+  if reader is None:
+    return 0
+  return TTFONT_MEMORY_FACTOR * sum(entry.length
+                                    for entry in reader.tables.values())
+
+# The files next to the checked fonts that checks read.
+SIBLING_FILES = (
+    '*.otf', '*.ttf', '*.ttc', '*.woff', '*.woff2'
+  , 'METADATA.pb', 'DESCRIPTION*.html', 'FONTLOG.txt'
+  , 'OFL.txt', 'LICENSE.txt', 'UFL.txt', 'fval.xsl'
+)
+
 def spec_factory(**kwds):
   from fontbakery.specifications.shared_conditions import ttFont
   spec = FontsSpec(
@@ -59,6 +80,7 @@ def spec_factory(**kwds):
     , conditions={ttFont.name: ttFont}
     , derived_iterables={'ttFonts': ('ttFont', True)}
     , expected_values={fonts_expected_value.name: fonts_expected_value}
+    , sibling_files=SIBLING_FILES
     , **kwds
   )
   return spec
@@ -0,0 +1,184 @@
+"""
+Font Bakery journal records the check executions of a CheckRunner as
+they complete, so that an interrupted run can be resumed.
+"""
+from collections import OrderedDict
+import logging
+import os
+import time
+
+from fontbakery.codec import (
+              CodecError
+            , Decoder
+            , Encoder
+            , VERSION
+            , _Reader
+            , _write_str
+            , _write_uint
+            )
+
+MAGIC = b'FBJN'
+
+_NO_IDENTITY = (None, None, None)
+
+class Journal:
+  """ Appends the events of each completed check execution to a file.
+  Use it with `CheckRunner(journal=...)`.
+
+  The file starts with `MAGIC` and the `VERSION` of `fontbakery.codec`,
+  then there's one record per completed identity: the identity
+  serialized by `Spec.serialize_identity` and the events of the check
+  after STARTCHECK, encoded by `fontbakery.codec`. Each record is
+  prefixed with its length and encoded on its own, hence a record that
+  was cut off by a crash is detected and dropped on resume.
+  """
+  def __init__(self, path, resume=False, sync_interval=1.0):
+    """
+      path: of the journal file.
+      resume: if True, the records of an existing journal at path are
+          read and new records are appended to it. Otherwise the file
+          is overwritten.
+      sync_interval: seconds, the file is synced to the disk (fsync)
+          after a record when the last sync is at least this long ago,
+          and when the journal is closed. 0 syncs after each record.
+    """
+    self.path = path
+    self.sync_interval = sync_interval
+    self._synced = time.monotonic()
+    # serialized identity => bytes of the encoded events
+    self._records = OrderedDict()
+    self._file = None
+    if resume:
+      try:
+        self._file = open(path, 'r+b')
+      except FileNotFoundError:
+        pass
+    if self._file is None:
+      self._file = open(path, 'wb')
+      self._file.write(MAGIC + bytes((VERSION, )))
+      self._sync()
+      return
+    try:
+      end = self._read_records()
+    except Exception:
+      self._file.close()
+      raise
+    # drop a record that was cut off, new records follow the last one
+    self._file.seek(end)
+    self._file.truncate()
+
+  def _read_records(self):
+    """ Reads the records of the file into `_records` and returns the
+    position after the last complete record. """
+    data = self._file.read()
+    header_size = len(MAGIC) + 1
+    if data[:len(MAGIC)] != MAGIC:
+      raise CodecError(f'{self.path} is not a journal of fontbakery events.')
+    if data[len(MAGIC):header_size] != bytes((VERSION, )):
+      raise CodecError(f'{self.path} was written with another version'
+                       ' of the fontbakery codec.')
+    reader = _Reader(data)
+    reader.position = end = header_size
+    try:
+      while reader.position < len(data):
+        length = reader.uint()
+        if reader.position + length > len(data):
+          break
+        record = _Reader(data[reader.position:reader.position + length])
+        reader.position += length
+        key = record.str()
+        self._records[key] = record.data[record.position:]
+        end = reader.position
+    except IndexError:
+      pass
+    if end < len(data):
+      logging.warning(f'Dropped the incomplete last record of {self.path}.')
+    return end
+
+  def __len__(self):
+    return len(self._records)
+
+  def __contains__(self, key):
+    return key in self._records
+
+  def keys(self):
+    """ The serialized identities of the records, in the order they
+    were written. """
+    return self._records.keys()
+
+  def get(self, key, spec):
+    """ Returns the events (status, message) of the record at key,
+    checks and sections of the messages are resolved by spec. """
+    decoder = Decoder(spec)
+    reader = _Reader(self._records[key])
+    events = []
+    for _ in range(reader.uint()):
+      length = reader.uint()
+      start = reader.position
+      reader.position += length
+      status, message, _ = decoder.decode(reader.data[start:reader.position])
+      events.append((status, message))
+    return tuple(events)
+
+  def _sync(self):
+    self._file.flush()
+    os.fsync(self._file.fileno())
+    self._synced = time.monotonic()
+
+  def append(self, key, events):
+    """ Writes a record of events (status, message) for the serialized
+    identity key. The file is flushed, so the record survives a crash
+    of this process. It survives a crash of the system once the file is
+    synced, at most `sync_interval` seconds later. """
+    encoder = Encoder()
+    events = [encoder.encode((status, message, _NO_IDENTITY))
+                                            for status, message in events]
+    body = bytearray()
+    _write_uint(body, len(events))
+    for data in events:
+      _write_uint(body, len(data))
+      body += data
+    record = bytearray()
+    _write_str(record, key)
+    record += body
+    buffer = bytearray()
+    _write_uint(buffer, len(record))
+    buffer += record
+    self._file.write(buffer)
+    self._file.flush()
+    if time.monotonic() - self._synced >= self.sync_interval:
+      self._sync()
+    self._records[key] = bytes(body)
+
+  def close(self):
+    if not self._file.closed:
+      self._sync()
+    self._file.close()
+
+class MemoryJournal:
+  """ A Journal that keeps the events in memory, used by
+  `CheckRunner.watch` to replay the results that did not change.
+  Records can be discarded. """
+  def __init__(self):
+    self._records = OrderedDict()
+
+  def __len__(self):
+    return len(self._records)
+
+  def __contains__(self, key):
+    return key in self._records
+
+  def keys(self):
+    return self._records.keys()
+
+  def get(self, key, spec):
+    return self._records[key]
+
+  def append(self, key, events):
+    self._records[key] = tuple(events)
+
+  def discard(self, key):
+    self._records.pop(key, None)
+
+  def close(self):
+    pass
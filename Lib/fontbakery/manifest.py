@@ -0,0 +1,241 @@
+"""
+Font Bakery manifest lets a specification import only the modules that
+are needed for the selected checks, see `Manifest` and `select`.
+"""
+from contextlib import contextmanager
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import tempfile
+
+from fontbakery.callable import (
+              FontBakeryCheck
+            , FontBakeryCondition
+            , FontBakeryExpectedValue
+            )
+from fontbakery.checkrunner import is_negated
+
+def get_default_path():
+  """ The manifest in the user's cache directory. """
+  cache_home = os.environ.get('XDG_CACHE_HOME', None) \
+                      or os.path.join(os.path.expanduser('~'), '.cache')
+  return os.path.join(cache_home, 'fontbakery', 'manifest.json')
+
+def _get_file(module_name):
+  try:
+    module_spec = importlib.util.find_spec(module_name)
+  except (ImportError, ValueError):
+    return None
+  if module_spec is None or not module_spec.has_location:
+    return None
+  return module_spec.origin
+
+def _stat(path):
+  stat = os.stat(path)
+  return [stat.st_mtime_ns, stat.st_size]
+
+def _get_check_dependencies(check):
+  return sorted(set(check.args) | {name for _, name in map(is_negated
+                                        , getattr(check, 'conditions', ()))})
+
+class Manifest:
+  """ The checks and names of specification modules, by module name,
+  kept in a JSON file.
+
+  A specification module imports all modules of its `spec_imports`,
+  see `Spec.auto_register`. While a `Selection` is active, the modules
+  that provide neither a selected check nor a name that the selected
+  checks depend on are skipped, according to their entries.
+
+  An entry is only used while the file of its module has the recorded
+  modification time and size. Entries are recorded when the modules
+  are imported, hence the first run imports all modules. To have a
+  complete manifest before, e.g. at build time, call `build_manifest`.
+  """
+  def __init__(self, path):
+    """ path: of the JSON file, it is created by `save` if it doesn't
+    exist. """
+    self.path = path
+    self._entries = {}
+    self._changed = False
+    try:
+      with open(path) as f:
+        self._entries = dict(json.load(f))
+    except FileNotFoundError:
+      pass
+    except (OSError, ValueError, TypeError) as e:
+      logging.warning(f'Ignoring the manifest {path}: {e}')
+
+  def get(self, module_name):
+    """ Returns the entry of module_name, a dict with the keys:
+      checks: check id => list of the names the check depends on.
+      names: the names of the conditions and expected values of the
+          module => list of the names each depends on.
+    None if there's no entry or if the file of the module changed since
+    the entry was recorded.
+    """
+    entry = self._entries.get(module_name, None)
+    if entry is None:
+      return None
+    path = _get_file(module_name)
+    try:
+      if path is None or path != entry['file'] or _stat(path) != entry['stat']:
+        return None
+    except (OSError, KeyError, TypeError):
+      return None
+    return entry
+
+  def record(self, module):
+    """ Records the entry of module, an imported specification module. """
+    path = getattr(module, '__file__', None)
+    if path is None:
+      return
+    checks = {}
+    names = {}
+    for item in module.__dict__.values():
+      if isinstance(item, FontBakeryCheck):
+        checks[item.id] = _get_check_dependencies(item)
+      elif isinstance(item, FontBakeryCondition):
+        names[item.name] = list(item.args)
+      elif isinstance(item, FontBakeryExpectedValue):
+        names[item.name] = []
+    entry = {'file': path, 'stat': _stat(path), 'checks': checks
+           , 'names': names}
+    if self._entries.get(module.__name__, None) != entry:
+      self._entries[module.__name__] = entry
+      self._changed = True
+
+  def save(self):
+    """ Writes the manifest, if entries were recorded. """
+    if not self._changed:
+      return
+    directory = os.path.dirname(os.path.abspath(self.path))
+    os.makedirs(directory, exist_ok=True)
+    # write atomically, runs can end at the same time.
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.')
+    with os.fdopen(fd, 'w') as f:
+      json.dump(self._entries, f, sort_keys=True, indent=2)
+    os.replace(tmp_path, self.path)
+    self._changed = False
+
+class Selection:
+  """ The checks that are registered while the selection is active,
+  like the `explicit_checks` and `exclude_checks` of the CheckRunner:
+  parts of the ids of the checks. """
+  def __init__(self, explicit_checks=None, exclude_checks=None
+                                                          , manifest=None):
+    self.explicit_checks = tuple(explicit_checks or ())
+    self.exclude_checks = tuple(exclude_checks or ())
+    self.manifest = manifest
+
+  def selects(self, check_id):
+    if self.explicit_checks and not any(part in check_id
+                                        for part in self.explicit_checks):
+      return False
+    return not any(part in check_id for part in self.exclude_checks)
+
+  def filter(self, filter_func=None):
+    """ Returns a `filter_func` for `Spec.auto_register` that rejects the
+    checks that are not selected and calls filter_func, if given, for
+    all other items. """
+    def selection_filter(type, name_or_id, item):
+      if type == 'check' and not self.selects(name_or_id):
+        return False
+      return filter_func is None or filter_func(type, name_or_id, item)
+    return selection_filter
+
+  def get_skipped(self, spec, symbol_table, module_names):
+    """ Returns the set of module_names, the modules of the `spec_imports`
+    of symbol_table, that can be skipped: they provide neither a selected
+    check nor a name that the selected checks depend on. spec is the
+    specification these are registered in.
+
+    If any of the modules has no valid entry in the manifest, nothing
+    is skipped.
+    """
+    if self.manifest is None or not (self.explicit_checks
+                                                  or self.exclude_checks):
+      return set()
+    entries = {}
+    for module_name in module_names:
+      entries[module_name] = self.manifest.get(module_name)
+      if entries[module_name] is None:
+        return set()
+
+    needed = set()
+    pending = []
+    # name => list of the names it depends on, for each provider
+    local_names = {}
+    providers = {}
+    for item in symbol_table.values():
+      if isinstance(item, FontBakeryCheck) and self.selects(item.id):
+        pending += _get_check_dependencies(item)
+      elif isinstance(item, FontBakeryCondition):
+        local_names[item.name] = list(item.args)
+    for module_name, entry in entries.items():
+      for check_id, dependencies in entry['checks'].items():
+        if self.selects(check_id):
+          needed.add(module_name)
+          pending += dependencies
+      for name in entry['names']:
+        providers.setdefault(name, []).append(module_name)
+
+    seen = set()
+    while pending:
+      name = pending.pop()
+      if name in seen:
+        continue
+      seen.add(name)
+      name = spec.resolve_alias(name)
+      nametype = spec.get_type(name, None)
+      if nametype == 'derived_iterables':
+        condition_name, _ = spec.get(name)
+        pending.append(condition_name)
+      elif nametype == 'conditions':
+        pending += spec.conditions[name].args
+      pending += local_names.get(name, [])
+      for module_name in providers.get(name, ()):
+        needed.add(module_name)
+        pending += entries[module_name]['names'][name]
+    return set(entries) - needed
+
+_selection = None
+
+def get_selection():
+  """ The active `Selection` or None. """
+  return _selection
+
+@contextmanager
+def select(explicit_checks=None, exclude_checks=None, manifest=None):
+  """ Activates a `Selection` for the specification modules that are
+  imported in the with-block and saves manifest at the end, e.g.:
+
+    with select(['com.google.fonts/check/153'], manifest=Manifest(path)):
+      module = importlib.import_module('fontbakery.specifications.googlefonts')
+
+  Modules that were imported before are not imported again, their
+  specifications have all checks.
+  """
+  global _selection
+  previous = _selection
+  _selection = Selection(explicit_checks, exclude_checks, manifest)
+  try:
+    yield _selection
+  finally:
+    _selection = previous
+    if manifest is not None:
+      try:
+        manifest.save()
+      except OSError as e:
+        logging.warning(f'Can\'t save the manifest {manifest.path}: {e}')
+
+def build_manifest(module_name, path=None):
+  """ Imports the specification module module_name with all its
+  `spec_imports` and writes their entries to the manifest at path,
+  by default `get_default_path()`. Returns the Manifest. """
+  manifest = Manifest(path or get_default_path())
+  with select(manifest=manifest):
+    importlib.import_module(module_name)
+  return manifest
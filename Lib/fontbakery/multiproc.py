@@ -0,0 +1,195 @@
+"""
+Font Bakery multiproc runs the checks of a CheckRunner in worker processes,
+see `run_sharded`, and single calls in child processes that are killed
+after a timeout, see `call_isolated`.
+"""
+from collections import OrderedDict
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import time
+
+from fontbakery.schedule import longest_first
+
+# These are set in the parent before the pool is created. The workers
+# are forked and inherit them, hence the runner and its specification
+# don't need to be picklable.
+_runner = None
+_order = None
+
+def portable_message(message):
+  """ Messages can be anything. If they can't be pickled, we send their
+  string representation, which is what reporters use anyways.
+  """
+  try:
+    pickle.dumps(message)
+  except Exception:
+    return str(message)
+  return message
+
+def _run_shard(shard):
+  shard_by, shard_index, indexes = shard
+  results = []
+  for index in indexes:
+    _, check, iterargs = _order[index]
+    events = tuple((status, portable_message(message))
+                      for status, message in _runner._run_check(check, iterargs))
+    results.append((index, events))
+    _runner._release(index)
+  # A pool worker will run more shards, the conditions of this one are
+  # not needed anymore.
+  conditions = _runner._cache['conditions']
+  for key in [key for key in conditions if (shard_by, shard_index) in key[1]]:
+    del conditions[key]
+  return results
+
+def shard_order(order, shard_by):
+  """ Returns a tuple (parent_indexes, shards)
+
+  parent_indexes: a set of indexes into order of the identities that
+      don't use the `shard_by` iterarg.
+  shards: a list of tuples (shard_by, shard_index, indexes) where indexes
+      is a list of indexes into order of all identities that use
+      `shard_by` with `shard_index`.
+  """
+  parent_indexes = set()
+  shards = OrderedDict()
+  for index, (_, _, iterargs) in enumerate(order):
+    shard_index = dict(iterargs).get(shard_by, None)
+    if shard_index is None:
+      parent_indexes.add(index)
+    else:
+      shards.setdefault(shard_index, []).append(index)
+  return parent_indexes, [(shard_by, shard_index, indexes)
+                                for shard_index, indexes in shards.items()]
+
+def run_sharded(runner, order):
+  """ Yields for each identity in order, in the same order, an iterable
+  of the check events. See `CheckRunner._run_order`.
+
+  The order is partitioned by `runner.shard_by`, see `shard_order`, and
+  the shards are executed by forked worker processes, the longest first
+  with a duration profile. Identities that don't use the sharding
+  iterarg run in this process while the workers are busy.
+  """
+  global _runner, _order
+  parent_indexes, shards = shard_order(order, runner.shard_by)
+  if len(shards) < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+    if len(shards) >= 2:
+      logging.warning('Can\'t run checks in parallel on this platform,'
+                      ' running them in a single process.')
+    for _, check, iterargs in order:
+      yield runner._run_check(check, iterargs)
+    return
+
+  if runner._duration_profile is not None:
+    shards = longest_first(shards, order, runner._duration_profile)
+  # make sure the workers don't compute the order themselves
+  runner.order # pylint: disable=pointless-statement
+  _runner, _order = runner, order
+  context = multiprocessing.get_context('fork')
+  try:
+    # The pool forks new workers when others exit, these inherit the
+    # globals too, hence they are set while the pool exists.
+    with context.Pool(min(runner.jobs, len(shards))) as pool:
+      pending = pool.imap_unordered(_run_shard, shards)
+      done = {}
+      for index, (_, check, iterargs) in enumerate(order):
+        if index in parent_indexes:
+          yield runner._run_check(check, iterargs)
+          continue
+        while index not in done:
+          done.update(next(pending))
+        yield done.pop(index)
+  finally:
+    _runner, _order = None, None
+
+def _portable_error(error):
+  try:
+    pickle.dumps(error)
+  except Exception:
+    return RuntimeError(f'{type(error).__name__}: {error}')
+  return error
+
+def _call_isolated_child(func, sender):
+  try:
+    # A process group of its own, so that the processes it starts are
+    # killed with it.
+    os.setsid()
+    try:
+      for item in func():
+        sender.send(('item', item))
+    except Exception as e:
+      sender.send(('error', _portable_error(e)))
+    else:
+      sender.send(('done', None))
+    sender.close()
+  finally:
+    os._exit(0)
+
+def call_isolated(func, timeout):
+  """ Yields the items of the iterable returned by `func()`, which is
+  called in a forked child process. The items must be picklable.
+
+  If the child doesn't finish within timeout seconds, it is killed
+  together with the processes it started, and TimeoutError is raised
+  after the items received so far. Exceptions raised by func are
+  raised again.
+
+  Without fork, func is called in this process and there's no timeout.
+
+  Only the calling thread exists in the child. If another thread, e.g.
+  of the thread pool or prefetch of the CheckRunner, holds a lock when
+  the child is forked, the child blocks when it uses that lock (e.g. an
+  import or a logging handler) and is killed at the timeout, reported
+  as a TimeoutError. Don't combine a timeout with threads, if checks
+  use such locks.
+  """
+  if not hasattr(os, 'fork'):
+    logging.warning('Can\'t stop calls on this platform, timeout is ignored.')
+    yield from func()
+    return
+  receiver, sender = multiprocessing.Pipe(duplex=False)
+  # not multiprocessing.Process, the worker processes of a Pool
+  # are not allowed to have children.
+  pid = os.fork()
+  if pid == 0:
+    receiver.close()
+    _call_isolated_child(func, sender)
+  sender.close()
+  deadline = time.monotonic() + timeout
+  finished = False
+  try:
+    while True:
+      remaining = deadline - time.monotonic()
+      if remaining <= 0 or not receiver.poll(remaining):
+        raise TimeoutError(f'Did not finish within {timeout} seconds.')
+      try:
+        kind, item = receiver.recv()
+      except EOFError:
+        finished = True
+        raise RuntimeError('The isolated process ended unexpectedly.')
+      if kind == 'item':
+        yield item
+      elif kind == 'error':
+        finished = True
+        raise item
+      else:
+        finished = True
+        return
+  finally:
+    receiver.close()
+    if not finished:
+      try:
+        os.killpg(pid, signal.SIGKILL)
+      except ProcessLookupError:
+        # The child didn't call setsid yet, it started no processes.
+        try:
+          os.kill(pid, signal.SIGKILL)
+        except OSError:
+          pass
+      except OSError:
+        pass
+    os.waitpid(pid, 0)
@@ -90,6 +90,14 @@ class FontbakeryReporter:
     if status == END:
       self._ended = event
 
+    if status == STARTCHECK:
+      key = self._get_key(identity)
+      if key not in self._indexes:
+        # the order of a streamed run grows while it runs
+        self._indexes[key] = len(self._indexes)
+        self._order += (identity, )
+        self._counter['(not finished)'] += 1
+
     if status == ENDCHECK:
       self._results.append(event)
       self._counter[message.name] += 1
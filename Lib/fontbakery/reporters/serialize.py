@@ -17,6 +17,7 @@ from fontbakery.checkrunner import (
             , ENDCHECK
             , START
             , END
+            , TIMING
             )
 from fontbakery.reporters import FontbakeryReporter
 
@@ -105,6 +106,8 @@ class SerializeReporter(FontbakeryReporter):
       item['result'] = message # is a Counter
     if status == ENDCHECK:
       item['result'] = message.name # is a Status
+    if status == TIMING:
+      item['timing'] = message # is a dict
     if status >= DEBUG:
       item['logs'].append(dict(
                           status= status.name
@@ -124,6 +127,9 @@ class SerializeReporter(FontbakeryReporter):
     # this puts all in the original order
     for identity in self._order:
       key = self._get_key(identity)
+      if key not in self._items:
+        # not executed, the run ended early
+        continue
       section, _, _ = identity
       sectionKey = self._get_key((section, None, None))
       sectionDoc = self._items[sectionKey]
@@ -41,6 +41,7 @@ from fontbakery.checkrunner import (  # NOQA
             , ENDSECTION
             , START
             , END
+            , TIMING
             , Status
             )
 
@@ -57,6 +58,7 @@ statuses = (
             , ENDSECTION
             , START
             , END
+            , TIMING
             )
 # these are displayed in the result counters
 check_statuses = [ERROR, FAIL, SKIP, PASS, WARN, INFO]
@@ -265,7 +267,7 @@ class TerminalProgress(FontbakeryReporter):
 
   def _get_index(self, identity):
     index = super(TerminalProgress, self)._get_index(identity)
-    if self._print_progress and len(self._indexes) < len(self._progressbar):
+    while self._print_progress and len(self._progressbar) < len(self._indexes):
       self._progressbar.append('.')
     return index
 
@@ -368,11 +370,17 @@ class TerminalReporter(TerminalProgress):
   def __init__(self, collect_results_by=None
                    , check_threshold=None
                    , log_threshold=None
+                   , profile=False
                    , **kwd):
     super(TerminalReporter, self).__init__(**kwd)
     self.results_by = collect_results_by
     self._collected_results = {}
     self._event_buffers = {}
+    # if True, the slowest checks and conditions are listed at the end.
+    # Requires the TIMING events of `ExecutionOptions(timing=True)`.
+    self._profile = profile
+    self._check_timings = []
+    self._condition_timings = []
 
     # logs can occur at any point in the logging protocol
     # especially DEBUG, INFO, WARNING and ERROR
@@ -409,6 +417,43 @@ class TerminalReporter(TerminalProgress):
         self._collected_results[key] = Counter()
       self._collected_results[key][message.name] += 1
 
+    if self._profile and status == TIMING:
+      self._check_timings.append((message['wall'], message['cpu']
+                                , self._format_timed(check.id, iterargs)))
+      for timing in message['conditions']:
+        self._condition_timings.append((timing['wall'], timing['cpu']
+                  , self._format_timed(timing['name'], timing['iterargs'])))
+
+  @staticmethod
+  def _format_timed(name, iterargs):
+    if not iterargs:
+      return name
+    return '{} with {}'.format(name, ', '.join('{}[{}]'.format(*item)
+                                                      for item in iterargs))
+
+  def _render_profile(self, print, count=20):
+    for title, timings in ((f'Slowest {count} check executions'
+                                                      , self._check_timings)
+                         , (f'Slowest {count} condition evaluations'
+                                                 , self._condition_timings)):
+      print(f'{title}:')
+      print('')
+      print('{:>10} {:>10}  {}'.format('wall', 'cpu', 'name'))
+      for wall, cpu, name in sorted(timings, reverse=True)[:count]:
+        print(f'{wall:>9.3f}s {cpu:>9.3f}s  {name}')
+      print('')
+
+  @staticmethod
+  def _render_memory_pool(print, stats):
+    megabyte = 1024 * 1024
+    print('Memory pool ({:.1f} of {:.1f} MB, peak {:.1f} MB):'.format(
+              stats['bytes'] / megabyte, stats['budget'] / megabyte
+            , stats['peak_bytes'] / megabyte))
+    print('')
+    print('{hits} hits, {misses} misses ({reloads} reloads),'
+          ' {evictions} evictions'.format(**stats))
+    print('')
+
   def _render_event_sync(self, print, event):
     status, message, (section, check, iterargs) = event
 
@@ -484,6 +529,13 @@ class TerminalReporter(TerminalProgress):
                                                 color=self._use_color))
           print('')
 
+      if self._profile:
+        self._render_profile(print)
+
+      stats = self.runner and self.runner.memory_pool_stats
+      if stats:
+        self._render_memory_pool(print, stats)
+
       print('Total:')
       print('')
       print(_render_results_counter(message, color=self._use_color))
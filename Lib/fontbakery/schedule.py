@@ -0,0 +1,111 @@
+"""
+Font Bakery schedule orders the work of a CheckRunner by the durations
+of the checks in earlier runs, kept in a `DurationProfile`. Only
+identities of the same section with the same iterargs are reordered.
+"""
+from itertools import groupby
+import json
+import logging
+import os
+import tempfile
+
+class DurationProfile:
+  """ Estimated durations of the executions of checks in seconds, by
+  check id.
+
+  The estimates decay exponentially: after each run the estimate of
+  a check becomes `decay * estimate + (1 - decay) * measured`, where
+  measured is the mean duration of its executions in that run.
+  """
+  def __init__(self, path, decay=0.5):
+    """
+      path: of the JSON file, it is created by `save` if it doesn't exist.
+      decay: the weight of the earlier estimate, between 0 and 1.
+    """
+    self.path = path
+    self.decay = decay
+    self._durations = {}
+    # check id => list of durations measured in this run
+    self._measured = {}
+    try:
+      with open(path) as f:
+        self._durations = {check_id: float(duration)
+                            for check_id, duration in json.load(f).items()}
+    except FileNotFoundError:
+      pass
+    except (OSError, ValueError, AttributeError) as e:
+      logging.warning(f'Ignoring the duration profile {path}: {e}')
+    self._default = self._get_default()
+
+  def _get_default(self):
+    if not self._durations:
+      return 0
+    return sum(self._durations.values()) / len(self._durations)
+
+  def get(self, check_id):
+    """ The estimated duration of check_id. For unknown checks this is
+    the mean of all estimates. """
+    return self._durations.get(check_id, self._default)
+
+  def record(self, check_id, duration):
+    """ Records a measured duration of an execution of check_id. """
+    self._measured.setdefault(check_id, []).append(duration)
+
+  def update(self):
+    """ Moves the estimates towards the recorded durations. """
+    for check_id, durations in self._measured.items():
+      measured = sum(durations) / len(durations)
+      if check_id in self._durations:
+        measured = self.decay * self._durations[check_id] \
+                                            + (1 - self.decay) * measured
+      self._durations[check_id] = measured
+    self._measured = {}
+    self._default = self._get_default()
+
+  def save(self):
+    directory = os.path.dirname(os.path.abspath(self.path))
+    # write atomically, runs can end at the same time.
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.')
+    with os.fdopen(fd, 'w') as f:
+      json.dump(self._durations, f, sort_keys=True, indent=2)
+    os.replace(tmp_path, self.path)
+
+def cheapest_first(order, profile):
+  """ Returns a list of the identities of order where each run of
+  identities with the same section and iterargs is sorted by the
+  estimated duration of the checks, cheapest first. """
+  result = []
+  group_key = lambda identity: (str(identity[0]), identity[2])
+  cost = lambda identity: profile.get(identity[1].id)
+  for _, identities in groupby(order, key=group_key):
+    result += sorted(identities, key=cost)
+  return result
+
+def longest_first(shards, order, profile):
+  """ Returns the shards of `fontbakery.multiproc.shard_order` sorted
+  by their estimated duration, longest first. """
+  def cost(shard):
+    _, _, indexes = shard
+    return sum(profile.get(order[index][1].id) for index in indexes)
+  return sorted(shards, key=cost, reverse=True)
+
+def select_within_budget(order, profile, budget, priority):
+  """ Returns a list of the identities of order that are estimated to fit
+  in budget seconds, in the order they have in order.
+
+  The identities are chosen by the priority of their checks first,
+  `priority(check)` is lower for more important checks, then by their
+  estimated duration, cheapest first. An identity that doesn't fit in
+  what is left of the budget is passed over for cheaper ones.
+  """
+  cost = lambda index: profile.get(order[index][1].id)
+  ranked = sorted(range(len(order))
+                , key=lambda index: (priority(order[index][1]), cost(index)))
+  selected = set()
+  spent = 0
+  for index in ranked:
+    if spent + cost(index) <= budget:
+      spent += cost(index)
+      selected.add(index)
+  return [identity for index, identity in enumerate(order)
+                                                  if index in selected]
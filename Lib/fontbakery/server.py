@@ -0,0 +1,279 @@
+"""
+Font Bakery server keeps specifications loaded in a long-lived process
+and runs check jobs for clients over HTTP, on a TCP port or a unix
+socket, see `Server`.
+
+There's no authentication: anybody who can connect to the server can
+submit jobs, which read the files they name with the permissions of the
+server. A unix socket is created readable and writable only by the user
+running the server. A TCP port on localhost is open to all local users,
+don't listen on other addresses.
+"""
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import logging
+import os
+import socket
+from socketserver import ThreadingMixIn, UnixStreamServer
+import stat
+import threading
+import time
+
+from fontbakery import __version__ as fontbakery_version
+from fontbakery.checkrunner import (
+              CheckRunner
+            , FontBakeryRunnerError
+            , Status
+            , START
+            , STARTSECTION
+            )
+from fontbakery.message import Message
+
+class JobError(Exception):
+  pass
+
+def serialize_event(spec, event):
+  """ Returns event as a JSON string with the keys:
+    status: name of the status.
+    section: name of the section or null.
+    check: id of the check or null.
+    iterargs: list of [name, index] pairs or null.
+    message: for START a list of the identities of the order, each as in
+        `Spec.serialize_identity`, for STARTSECTION a list of
+        {"check", "iterargs"} objects, for `Message`s the dict of
+        `Message.getData`, the name of a Status, dicts (summaries, timing)
+        and JSON types as they are. Anything else as its string.
+    traceback: only for errors that have one.
+  """
+  status, message, (section, check, iterargs) = event
+  doc = {
+    'status': status.name
+  , 'section': section and str(section)
+  , 'check': check and check.id
+  , 'iterargs': iterargs and [list(iterarg) for iterarg in iterargs]
+  }
+  if status is START:
+    message = [json.loads(spec.serialize_identity(identity))
+                                                  for identity in message]
+  elif status is STARTSECTION:
+    message = [{'check': item_check.id
+              , 'iterargs': [list(iterarg) for iterarg in item_iterargs]}
+                                  for item_check, item_iterargs in message]
+  elif isinstance(message, Status):
+    message = message.name
+  elif isinstance(message, Message):
+    message = message.getData()
+  elif isinstance(message, dict):
+    message = dict(message)
+  elif not (message is None or isinstance(message, (str, int, float))):
+    traceback = getattr(message, 'traceback', None)
+    if traceback is not None:
+      doc['traceback'] = traceback
+    message = str(message)
+  doc['message'] = message
+  return json.dumps(doc, default=str)
+
+class Server:
+  """ Runs the jobs of clients with specifications that stay loaded.
+
+  A job is a JSON object, POSTed to "/check":
+    values: the values of the run, e.g. {"fonts": ["path/to/a.ttf"]}.
+        Paths must be valid where the server runs.
+    specification: name of the specification, can be omitted if the
+        server has only one.
+    explicit_checks, exclude_checks, custom_order: lists, like the
+        arguments of the CheckRunner.
+
+  The response streams the events of the run, one JSON object per line,
+  see `serialize_event`. A GET of "/" lists the specifications and their
+  checks. Conditions and checks that don't depend on the values of a job,
+  see the `shared_cache` of the CheckRunner, are evaluated once for all
+  jobs and again when they are older than `max_age`. Jobs run one after
+  the other.
+  """
+  def __init__(self, specifications, max_age=3600, **kwds):
+    """
+      specifications: dict name => Spec
+      max_age: seconds after which the values shared between jobs are
+          evaluated again, None to keep them for the life of the server.
+      kwds: are passed on to the CheckRunner of each job, e.g. options
+          or a condition_cache.
+    """
+    if not specifications:
+      raise ValueError('A server needs at least one specification.')
+    self.specifications = specifications
+    self._max_age = max_age
+    self._runner_options = kwds
+    # specification name => (created, shared_cache)
+    self._shared_caches = {}
+    self._lock = threading.Lock()
+
+  def _get_shared_cache(self, name):
+    created, shared_cache = self._shared_caches.get(name, (None, None))
+    now = time.monotonic()
+    if shared_cache is None or self._max_age is not None \
+                                      and now - created > self._max_age:
+      created, shared_cache = now, {}
+      self._shared_caches[name] = (created, shared_cache)
+    return shared_cache
+
+  def start(self, job):
+    """ Returns a tuple (runner, events) for job, a dict as described
+    for the Server. events is an iterator of the events of the
+    run, which starts when it is iterated, after the jobs before it.
+
+    Raises JobError if the job is not valid.
+    """
+    unknown = set(job) - {'values', 'specification', 'explicit_checks'
+                        , 'exclude_checks', 'custom_order'}
+    if unknown:
+      raise JobError('Unknown keys: {}.'.format(', '.join(sorted(unknown))))
+    name = job.get('specification', None)
+    if name is None:
+      if len(self.specifications) != 1:
+        raise JobError('The job must name one of the specifications: {}.'
+                          .format(', '.join(sorted(self.specifications))))
+      name, = self.specifications
+    if name not in self.specifications:
+      raise JobError(f'Unknown specification "{name}".')
+    values = job.get('values', None)
+    if not isinstance(values, dict):
+      raise JobError('The job needs "values", an object.')
+    spec = self.specifications[name]
+    try:
+      runner = CheckRunner(spec, values=dict(values)
+                         , values_can_override_spec_names=False
+                         , explicit_checks=job.get('explicit_checks', None)
+                         , exclude_checks=job.get('exclude_checks', None)
+                         , custom_order=job.get('custom_order', None)
+                         , shared_cache=self._get_shared_cache(name)
+                         , **self._runner_options)
+    except (FontBakeryRunnerError, KeyError, TypeError) as e:
+      raise JobError(str(e))
+    return runner, self._run(runner)
+
+  def _run(self, runner):
+    with self._lock:
+      yield from runner.run()
+
+  def listen(self, address):
+    """ Returns a `socketserver` serving this server at address, either
+    a tuple (host, port) or the path of a unix socket. Call its
+    `serve_forever` to accept jobs. """
+    if isinstance(address, str):
+      if os.path.exists(address) and stat.S_ISSOCK(os.stat(address).st_mode):
+        # left over by an earlier server
+        os.unlink(address)
+      http_server = _UnixHTTPServer(address, _RequestHandler)
+    else:
+      http_server = ThreadingHTTPServer(address, _RequestHandler)
+    http_server.fontbakery_server = self
+    return http_server
+
+# http.server.ThreadingHTTPServer is new in Python 3.7
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+  daemon_threads = True
+
+class _UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+  daemon_threads = True
+
+  def server_bind(self):
+    # only the user running the server can connect
+    umask = os.umask(0o177)
+    try:
+      super(_UnixHTTPServer, self).server_bind()
+    finally:
+      os.umask(umask)
+
+  def server_close(self):
+    super(_UnixHTTPServer, self).server_close()
+    try:
+      os.unlink(self.server_address)
+    except OSError:
+      pass
+
+class _RequestHandler(BaseHTTPRequestHandler):
+  server_version = f'FontBakery/{fontbakery_version}'
+
+  def address_string(self):
+    # empty for unix sockets
+    return self.client_address[0] if self.client_address else 'local'
+
+  def log_message(self, format, *args):
+    logging.info('%s %s', self.address_string(), format % args)
+
+  def _send_json(self, code, doc):
+    data = json.dumps(doc).encode('utf-8')
+    self.send_response(code)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+  def do_GET(self):
+    if self.path != '/':
+      self._send_json(404, {'error': f'Not found: {self.path}'})
+      return
+    specifications = self.server.fontbakery_server.specifications
+    self._send_json(200, {'specifications': {name: sorted(
+            check.id for section in spec.sections for check in section.checks)
+                                    for name, spec in specifications.items()}})
+
+  def do_POST(self):
+    if self.path != '/check':
+      self._send_json(404, {'error': f'Not found: {self.path}'})
+      return
+    try:
+      length = int(self.headers.get('Content-Length', 0))
+      job = json.loads(self.rfile.read(length).decode('utf-8'))
+      if not isinstance(job, dict):
+        raise JobError('The job must be an object.')
+      runner, events = self.server.fontbakery_server.start(job)
+    except (ValueError, JobError) as e:
+      self._send_json(400, {'error': str(e)})
+      return
+    self.send_response(200)
+    self.send_header('Content-Type', 'application/x-ndjson')
+    self.end_headers()
+    spec = runner.specification
+    try:
+      for event in events:
+        self.wfile.write(serialize_event(spec, event).encode('utf-8') + b'\n')
+        self.wfile.flush()
+    except (BrokenPipeError, ConnectionResetError):
+      logging.info('The client disconnected, the job was stopped.')
+    finally:
+      events.close()
+
+class _UnixHTTPConnection(HTTPConnection):
+  def __init__(self, path, **kwds):
+    super(_UnixHTTPConnection, self).__init__('localhost', **kwds)
+    self._path = path
+
+  def connect(self):
+    self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    self.sock.connect(self._path)
+
+def request_check(address, values, **job):
+  """ Sends a job to the server at address, a tuple (host, port) or the
+  path of a unix socket, and yields its events as dicts, see
+  `serialize_event`. job: the other keys of the job, e.g. specification.
+
+  Raises JobError if the server rejects the job.
+  """
+  if isinstance(address, str):
+    connection = _UnixHTTPConnection(address)
+  else:
+    connection = HTTPConnection(*address)
+  try:
+    body = json.dumps(dict(job, values=values)).encode('utf-8')
+    connection.request('POST', '/check', body
+                     , {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    if response.status != 200:
+      raise JobError(json.loads(response.read().decode('utf-8'))['error'])
+    for line in response:
+      yield json.loads(line.decode('utf-8'))
+  finally:
+    connection.close()
@@ -9,7 +9,8 @@ spec_imports = ['.shared_conditions']
 specification = spec_factory(default_section=Section("Checks inherited from Microsoft Font Validator"))
 
 @check(
-  id = 'com.google.fonts/check/037'
+  id = 'com.google.fonts/check/037',
+  io_bound = True
 )
 def com_google_fonts_check_037(font):
   """Checking with Microsoft Font Validator."""
@@ -1,4 +1,5 @@
 import os
+import sys
 from fontbakery.callable import check, condition, disable
 from fontbakery.checkrunner import ERROR, FAIL, INFO, PASS, SKIP, WARN
 from fontbakery.constants import PriorityLevel
@@ -11,7 +12,19 @@ spec_imports = [
     ('.shared_conditions', ('missing_whitespace_chars', ))
 ]
 
-@condition
+def fontforge_version():
+  import subprocess
+  p = subprocess.Popen([sys.executable, '-c',
+                        'import fontforge, sys;'
+                        'sys.stdout.write(fontforge.version())'],
+                       stderr=subprocess.PIPE,
+                       stdout=subprocess.PIPE
+                      )
+  version, _ = p.communicate()
+  return {"fontforge": version.decode("utf-8")}
+
+
+@condition(io_bound=True, persist=True, tool_versions=fontforge_version)
 def fontforge_check_results(font):
   # Would be AdobeBlank.ttf usually
   if "adobeblank" in font.lower():
@@ -25,7 +38,7 @@ def fontforge_check_results(font):
         'sys.stdout.write(status.__str__());'.format
         )
 
-  p = subprocess.Popen(['python', '-c', cmd(font)],
+  p = subprocess.Popen([sys.executable, '-c', cmd(font)],
                        stderr=subprocess.PIPE,
                        stdout=subprocess.PIPE
                       )
@@ -107,7 +120,8 @@ def com_google_fonts_check_ftxvalidator_is_available(ftxvalidator_is_available):
 
 @check(
   id = 'com.google.fonts/check/035',
-  conditions = ['ftxvalidator_is_available']
+  conditions = ['ftxvalidator_is_available'],
+  io_bound = True
 )
 def com_google_fonts_check_035(font):
   """Checking with ftxvalidator."""
@@ -146,8 +160,15 @@ def com_google_fonts_check_035(font):
     yield ERROR, "ftxvalidator is not available!"
 
 
+def ots_version():
+  import ots
+  return {"ots": ots.__version__}
+
+
 @check(
-  id = 'com.google.fonts/check/036'
+  id = 'com.google.fonts/check/036',
+  io_bound = True,
+  tool_versions = ots_version
 )
 def com_google_fonts_check_036(font):
   """Checking with ots-sanitize."""
@@ -192,7 +213,9 @@ def is_up_to_date(installed, latest):
 
 
 @check(
-  id = 'com.google.fonts/check/fontbakery_version'
+  id = 'com.google.fonts/check/fontbakery_version',
+  io_bound = True,
+  volatile = True
 )
 def com_google_fonts_check_fontbakery_version():
   """Do we have the latest version of FontBakery installed?"""
@@ -349,7 +349,9 @@ def description(descfile):
 
 @check(
   id = 'com.google.fonts/check/003',
-  conditions = ['description']
+  conditions = ['description'],
+  io_bound = True,
+  volatile = True
 )
 def com_google_fonts_check_003(description):
   """Does DESCRIPTION file contain broken links?"""
@@ -429,7 +431,7 @@ def com_google_fonts_check_006(description):
     yield PASS, "DESCRIPTION.en_us.html is smaller than 1000 bytes."
 
 
-@condition
+@condition(prefetch=True)
 def family_metadata(family_directory):
   from google.protobuf import text_format
   from fontbakery.utils import get_FamilyProto_Message
@@ -622,7 +624,13 @@ def com_google_fonts_check_016(ttFont):
     yield PASS, ("OS/2 fsType is properly set to zero.")
 
 
-@condition
+def bs4_version():
+  import bs4
+  return {"bs4": bs4.__version__}
+
+
+# The vendor list changes, don't reuse it for longer than a week.
+@condition(persist=True, max_age=7 * 24 * 60 * 60, tool_versions=bs4_version)
 def registered_vendor_ids():
   """Get a list of vendor IDs from Microsoft's website."""
   from bs4 import BeautifulSoup
@@ -744,21 +752,21 @@ def git_rootdir(family_dir):
   if not family_dir:
     return None
 
-  original_dir = os.getcwd()
   root_dir = None
   try:
     import subprocess
-    os.chdir(family_dir)
     git_cmd = [
         "git", "rev-parse", "--show-toplevel"
     ]
-    git_output = subprocess.check_output(git_cmd, stderr=subprocess.STDOUT)
+    # Not using os.chdir here, the working directory is shared by
+    # all threads of the process.
+    git_output = subprocess.check_output(git_cmd, stderr=subprocess.STDOUT,
+                                         cwd=family_dir)
     root_dir = git_output.decode("utf-8").strip()
 
   except (OSError, IOError):
     pass # Not a git repo, or git is not installed.
 
-  os.chdir(original_dir)
   return root_dir
 
 
@@ -981,7 +989,16 @@ def com_google_fonts_check_032(ttFont):
     yield PASS, "All description name records have reasonably small lengths."
 
 
-@condition
+def ttfautohint_version():
+  import fontTools
+  from ttfautohint import libttfautohint
+  return {
+    "fontTools": fontTools.version,
+    "ttfautohint": libttfautohint.version_string
+  }
+
+
+@condition(persist=True, prefetch=True, tool_versions=ttfautohint_version)
 def ttfautohint_stats(font):
   from ttfautohint import ttfautohint, libttfautohint
   from io import BytesIO
@@ -1356,7 +1373,7 @@ def com_google_fonts_check_074(ttFont):
                  " contain non-ASCII characteres.")
 
 
-@condition
+@condition(io_bound=True, volatile=True)
 def listed_on_gfonts_api(family_metadata):
   if not family_metadata:
     return False
@@ -2398,7 +2415,7 @@ def com_google_fonts_check_116(ttFont):
     yield PASS, "Font em size is good (unitsPerEm = 2000)."
 
 
-@condition
+@condition(io_bound=True, volatile=True)
 def remote_styles(family_metadata):
   """Get a dictionary of TTFont objects of all font files of
      a given family as currently hosted at Google Fonts.
@@ -2448,7 +2465,7 @@ def api_gfonts_ttFont(style, remote_styles):
     return remote_styles[style]
 
 
-@condition
+@condition(io_bound=True, volatile=True)
 def github_gfonts_ttFont(ttFont, license):
   """Get a TTFont object of a font downloaded
      from Google Fonts git repository.
@@ -3275,7 +3292,9 @@ def com_google_fonts_check_164(ttFont):
   conditions = ["familyname"],
   misc_metadata = {
     'request': 'https://github.com/googlefonts/fontbakery/issues/494'
-  })
+  },
+  io_bound = True,
+  volatile = True)
 def com_google_fonts_check_165(ttFont, familyname):
   """ Familyname must be unique according to namecheck.fontdata.com """
   FB_ISSUE_TRACKER = "https://github.com/googlefonts/fontbakery/issues"
@@ -1,10 +1,12 @@
 from typing import List
 
 from fontbakery.callable import condition
+from fontbakery.utils import fonttools_version
 # used to inform get_module_specification whether and how to create a specification
 from fontbakery.fonts_spec import spec_factory # NOQA pylint: disable=unused-import,cyclic-import
+from fontbakery.fonts_spec import ttfont_memory
 
-@condition
+@condition(prefetch=True, memory=ttfont_memory)
 def ttFont(font):
   from fontTools.ttLib import TTFont
   return TTFont(font)
@@ -23,7 +25,7 @@ def is_cff(ttFont):
 def is_cff2(ttFont):
   return 'CFF2' in ttFont
 
-@condition
+@condition(persist=True, tool_versions=fonttools_version)
 def ligatures(ttFont):
   all_ligatures = {}
   try:
@@ -62,7 +64,7 @@ def ligature_glyphs(ttFont):
     return -1  # Indicate fontTools-related crash...
 
 
-@condition
+@condition(persist=True, tool_versions=fonttools_version)
 def monospace_stats(ttFont):
   """Returns a dict with data related to the set of glyphs
      among which is a boolean indicating whether or not the
@@ -22,6 +22,14 @@ def pretty_print_list(values):
                              str(values[-1]))
 
 
+def fonttools_version():
+  """ To be used as `tool_versions` of conditions that are persisted
+  and computed using fontTools.
+  """
+  import fontTools
+  return {"fontTools": fontTools.version}
+
+
 def get_bounding_box(font):
     """ Returns max and min bbox of given truetype font """
     ymin = 0
@@ -19,11 +19,10 @@ rm $COLLECTION_FOLDER/*/*/*fontbakery.*
 for f in $APACHE_FOLDERS $OFL_FOLDERS $UFL_FOLDERS
 do
   echo "$f" >> $RESULTS_FOLDER/all_fonts.txt
-  echo "Processing '$f'..."
-  LICENSE_DIR=$(basename "$(dirname $f)")
-  REPORT=$RESULTS_FOLDER/$LICENSE_DIR/$(basename $f).json
-  mkdir -p $(dirname $REPORT)
-  fontbakery check-googlefonts --json $REPORT "$f/*.ttf"
 done
 
+# writes $RESULTS_FOLDER/<license>/<family>.json and summary.json
+fontbakery check-collection --output-dir $RESULTS_FOLDER \
+  $APACHE_FOLDERS $OFL_FOLDERS $UFL_FOLDERS
+
 cat $RESULTS_FOLDER/issues.txt
@@ -0,0 +1,126 @@
+import os
+import time
+
+from fontbakery.callable import condition
+from fontbakery.checkrunner import FAIL
+from fontbakery.cache import ConditionCache, DiskCache, ResultCache
+from example_checks import (
+              evaluations
+            , check_item_size
+            , check_item_content
+            , check_item_time
+            , make_runner
+            , summarize
+            )
+
+
+def test_condition_cache(tmpdir):
+  """Persisted conditions are reused while their input files don't change."""
+  items = []
+  for name in 'abc':
+    item = tmpdir.join(name)
+    item.write(name)
+    items.append(str(item))
+
+  def run():
+    cache = ConditionCache(DiskCache(str(tmpdir.join('cache'))))
+    del evaluations[:]
+    events = list(make_runner(items, (check_item_size, ),
+                              condition_cache=cache).run())
+    return summarize(events), list(evaluations)
+
+  first, evaluated = run()
+  assert evaluated == items
+  second, evaluated = run()
+  assert evaluated == []
+  assert first == second
+
+  tmpdir.join('b').write('changed content')
+  third, evaluated = run()
+  assert evaluated == [items[1]]
+  assert (FAIL, 'size 15', 'com.example/check/item_size', (('item', 1), )) \
+                                                                  in third
+
+
+def test_condition_cache_max_age(tmpdir, monkeypatch):
+  """Persisted values of conditions with a max_age expire."""
+  @condition(persist=True, max_age=60)
+  def vendor_list():
+    return ['a', 'b']
+
+  cache = ConditionCache(DiskCache(str(tmpdir)))
+  inputs = ((vendor_list, ), ())
+  max_age = cache.get_max_age(inputs)
+  assert max_age == 60
+  monkeypatch.setattr(time, 'time', lambda: 1019)
+  key = cache.get_key(vendor_list, inputs)
+  cache.set(vendor_list, key, ['a', 'b'])
+  # the age counts from when the value was written
+  monkeypatch.setattr(time, 'time', lambda: 1079)
+  assert cache.get_key(vendor_list, inputs) == key
+  assert cache.get(vendor_list, key, max_age) == (True, ['a', 'b'])
+  monkeypatch.setattr(time, 'time', lambda: 1080)
+  assert cache.get(vendor_list, key, max_age) == (False, None)
+  assert cache.get(vendor_list, key) == (True, ['a', 'b'])
+
+
+def test_disk_cache_evicts_least_recently_used(tmpdir):
+  cache = DiskCache(str(tmpdir), max_size=25)
+  cache.set('aa0', b'0' * 10)
+  cache.set('aa1', b'1' * 10)
+  os.utime(cache._path('aa0'), (0, 0))
+  os.utime(cache._path('aa1'), (1, 1))
+  assert cache.get('aa0') == b'0' * 10  # now recently used
+  cache.set('aa2', b'2' * 10)
+  assert cache.get('aa1') is None
+  assert cache.get('aa0') is not None and cache.get('aa2') is not None
+
+
+def test_result_cache(tmpdir):
+  """Results are replayed while the check and its input files don't change."""
+  items = []
+  for name in 'abc':
+    item = tmpdir.join('items', name)
+    item.write(name, ensure=True)
+    items.append(str(item))
+
+  def run(cache=None):
+    if cache is None:
+      cache = ResultCache(DiskCache(str(tmpdir.join('cache')))
+                        , ignored=[str(tmpdir.join('items', 'report.txt'))])
+    del evaluations[:]
+    events = list(make_runner(items, (check_item_content, check_item_time),
+                              result_cache=cache).run())
+    return summarize(events), sorted(evaluations)
+
+  first, evaluated = run()
+  assert evaluated == sorted(items + ['time'] * 3)
+  second, evaluated = run()
+  # volatile checks are always executed
+  assert evaluated == ['time'] * 3
+  assert first == second
+
+  tmpdir.join('items', 'b').write('')
+  third, evaluated = run()
+  assert evaluated == sorted([items[1]] + ['time'] * 3)
+  assert (FAIL, '0 characters', 'com.example/check/item_content'
+                                              , (('item', 1), )) in third
+
+  # files next to the items that match the sibling_files of the spec
+  # may be used by the checks as well
+  tmpdir.join('items', 'notes.txt').write('notes')
+  _, evaluated = run()
+  assert evaluated == sorted(items + ['time'] * 3)
+
+  # but not other files, nor the ignored files, e.g. reports of the run
+  tmpdir.join('items', 'backup.json').write('{}')
+  tmpdir.join('items', 'report.txt').write('report')
+  _, evaluated = run()
+  assert evaluated == ['time'] * 3
+
+  # a cache that lives longer sees the changes of the siblings too
+  cache = ResultCache(DiskCache(str(tmpdir.join('cache'))))
+  run(cache)
+  tmpdir.join('items', 'notes.txt').write('more notes')
+  _, evaluated = run(cache)
+  assert evaluated == sorted(items + ['time'] * 3)
@@ -0,0 +1,500 @@
+import asyncio
+import os
+import pickle
+import threading
+
+import pytest
+
+from fontbakery.callable import check, condition, FontBakeryExpectedValue
+from fontbakery.checkrunner import (
+              AsyncCheckRunner
+            , CheckRunner
+            , ExecutionOptions
+            , ExecutionPlan
+            , Section
+            , SetupError
+            , Spec
+            , PASS
+            , FAIL
+            , ERROR
+            , ENDCHECK
+            , ENDSECTION
+            , START
+            , END
+            , TIMING
+            )
+from fontbakery.constants import PriorityLevel
+from fontbakery.reporters.serialize import SerializeReporter
+from example_checks import (
+              pid
+            , check_item
+            , check_items
+            , remote_calls
+            , check_remote_item
+            , prefetch_threads
+            , parse_calls
+            , check_parsed_item
+            , evaluations
+            , async_calls
+            , check_async_item
+            , check_item_content
+            , check_tool_version
+            , check_slow_tool
+            , check_item_tool
+            , check_pid_count
+            , resident
+            , check_pids
+            , check_slow_item
+            , check_slow_size
+            , check_critical_items
+            , loaded_items
+            , check_item_data
+            , check_item_datas
+            , make_runner
+            , summarize
+            )
+
+
+def test_jobs_yield_same_events():
+  """Running in worker processes must not change the event protocol."""
+  serial = list(make_runner().run())
+  parallel = list(make_runner(options=ExecutionOptions(jobs=2)).run())
+  assert summarize(serial) == summarize(parallel)
+  assert parallel[0][0] is START and parallel[-1][0] is END
+  assert parallel[-1][1] == serial[-1][1]
+
+  # the reporters can consume the merged events
+  reporter = SerializeReporter(runner=make_runner(options=ExecutionOptions(jobs=2)))
+  reporter.run()
+  results = [check['result'] for section in reporter.getdoc()['sections']
+                             for check in section['checks']]
+  assert sorted(results) == ['FAIL', 'PASS', 'PASS', 'PASS']
+
+
+def test_jobs_run_items_in_workers():
+  runner = make_runner(options=ExecutionOptions(jobs=3))
+  pids = set()
+  for status, message, (section, check, iterargs) in runner.run():
+    if status is ENDCHECK and iterargs:
+      pids.add(runner._cache['conditions'].get(('pid', iterargs)))
+  # all per item conditions were evaluated in the workers
+  assert pids == {None}
+
+
+def test_threads_yield_same_events():
+  """io_bound checks and conditions run concurrently in a thread pool."""
+  checks = (check_item, check_remote_item, check_items)
+  items = tuple('abcdefgh')
+  remote_calls.reset()
+  serial = list(make_runner(items, checks).run())
+  assert remote_calls.peak == 1
+  assert remote_calls.threads == {threading.get_ident()}
+  remote_calls.reset()
+  threaded = list(make_runner(items, checks, options=ExecutionOptions(threads=8)).run())
+  assert summarize(serial) == summarize(threaded)
+  assert remote_calls.peak > 1
+  assert threading.get_ident() not in remote_calls.threads
+
+
+def test_prefetch():
+  """prefetch conditions of the next checks are evaluated in background
+  threads, once, while the current check runs."""
+  checks = (check_item, check_parsed_item, check_items)
+  items = tuple('abcdefgh')
+  parse_calls.reset()
+  serial = list(make_runner(items, checks).run())
+  assert set(prefetch_threads) == {threading.main_thread()}
+  assert parse_calls.peak == 1
+  del prefetch_threads[:]
+  parse_calls.reset()
+  prefetched = list(make_runner(items, checks
+                              , options=ExecutionOptions(prefetch=2)).run())
+  assert summarize(serial) == summarize(prefetched)
+  assert len(prefetch_threads) == len(items)
+  # only the first one may be requested before its thread started
+  assert prefetch_threads.count(threading.main_thread()) <= 1
+  # conditions were parsed while checks ran
+  assert parse_calls.peak > 1
+
+  del prefetch_threads[:]
+  threaded = list(make_runner(items, checks
+                    , options=ExecutionOptions(threads=2, prefetch=2)).run())
+  assert summarize(serial) == summarize(threaded)
+  assert len(prefetch_threads) == len(items)
+
+
+def test_stream():
+  """Checks of streamed items run as the items arrive, checks of all items
+  at the end."""
+  log = []
+  def items():
+    for item in ('a', 'bad', 'c'):
+      log.append(item)
+      yield item
+
+  checks = (check_items, check_item)
+  runner = make_runner(items(), checks, stream='item')
+  events = []
+  log_when_checked = {}
+  for event in runner.run():
+    status, message, (section, check, iterargs) = event
+    if status is ENDCHECK:
+      log_when_checked[check.id, iterargs] = tuple(log)
+    events.append(event)
+  assert events[0][0] is START and len(events[0][1]) == 0
+  assert log_when_checked['com.example/check/item', (('item', 0), )] == ('a', )
+  assert log_when_checked['com.example/check/items', ()] == ('a', 'bad', 'c')
+
+  serial = make_runner(checks=checks)
+  check_events = lambda events: sorted((event for event in summarize(events)
+                                                      if event[2]), key=str)
+  assert check_events(events) == check_events(serial.run())
+  assert len(runner.order) == len(serial.order)
+  assert runner.order[-1][1] is check_items
+
+  # the reporters learn the order while the run goes on
+  reporter = SerializeReporter(runner=make_runner(iter(['a', 'bad', 'c'])
+                                                , checks, stream='item'))
+  reporter.run()
+  results = [check['result'] for section in reporter.getdoc()['sections']
+                             for check in section['checks']]
+  assert sorted(results) == ['FAIL', 'PASS', 'PASS', 'PASS']
+
+
+def test_async_runner():
+  """AsyncCheckRunner yields the same events as CheckRunner and runs
+  async checks and conditions concurrently."""
+  async def collect(runner):
+    return [event async for event in runner.run()]
+
+  items = tuple('abcdefgh')
+  checks = (check_item, check_async_item, check_remote_item, check_items)
+  runner = make_runner(items, checks, runner=AsyncCheckRunner)
+  del evaluations[:]
+  async_calls.reset()
+  remote_calls.reset()
+  loop = asyncio.new_event_loop()
+  events = loop.run_until_complete(collect(runner))
+  loop.close()
+  # async checks ran concurrently on the loop, others in its executor
+  assert async_calls.peak > 1
+  assert async_calls.threads == {threading.get_ident()}
+  assert remote_calls.peak > 1
+  # all checks shared one evaluation of the condition
+  assert evaluations == [items]
+
+  expected = summarize(make_runner(items, (check_item, check_remote_item
+                                           , check_items)).run())
+  is_check = lambda event: event[2] not in (None
+                                          , 'com.example/check/async_item')
+  assert list(filter(is_check, summarize(events))) \
+                                      == list(filter(is_check, expected))
+  assert (PASS, 'a of 8', 'com.example/check/async_item', (('item', 0), )) \
+                                                    in summarize(events)
+
+  # CheckRunner can't run async checks
+  events = list(make_runner(items, (check_async_item, )).run())
+  assert events[-1][1]['ERROR'] == len(items)
+
+
+def test_watch(tmpdir):
+  """After a change only the checks that can depend on it run again."""
+  items = []
+  for name in 'abc':
+    item = tmpdir.join('items', name)
+    item.write(name, ensure=True)
+    items.append(str(item))
+  checks = (check_item_content, check_items, check_pid_count)
+  report = str(tmpdir.join('items', 'report.txt'))
+  watch = make_runner(items, checks).watch(interval=0.05, ignored=[report])
+
+  del evaluations[:]
+  changed, events = next(watch)
+  assert not changed and len(summarize(events)) == 17
+  assert evaluations == items
+
+  del evaluations[:]
+  tmpdir.join('items', 'b').write('')
+  changed, events = next(watch)
+  events = summarize(events)
+  assert changed == {items[1]}
+  assert evaluations == [items[1]]
+  assert events == summarize(make_runner(items, checks).run())
+  assert (FAIL, '0 characters', 'com.example/check/item_content'
+                                              , (('item', 1), )) in events
+
+  # files next to the items can only be found via all items, only the
+  # sibling_files of the spec that are not ignored are watched
+  del evaluations[:]
+  tmpdir.join('items', 'notes.json').write('{}')
+  tmpdir.join('items', 'report.txt').write('report')
+  tmpdir.join('items', 'notes.txt').write('notes')
+  changed, events = next(watch)
+  assert changed == {str(tmpdir.join('items', 'notes.txt'))}
+  assert len(summarize(events)) == 17
+  assert evaluations == []
+  watch.close()
+
+
+def test_shared_cache():
+  """Runners sharing a cache evaluate what doesn't depend on their values
+  only once."""
+  checks = (check_items, check_tool_version, check_item_tool)
+  shared_cache = {}
+  del evaluations[:]
+  first = summarize(make_runner(('a', 'b'), checks
+                              , shared_cache=shared_cache).run())
+  second = summarize(make_runner(('c', ), checks
+                               , shared_cache=shared_cache).run())
+  assert evaluations == ['tool_version', 'check_tool_version']
+  assert second == summarize(make_runner(('c', ), checks).run())
+  assert (PASS, '2 items', 'com.example/check/items', ()) in first
+  assert (PASS, '1 items', 'com.example/check/items', ()) in second
+
+
+def test_shared_cache_timing():
+  """Shared checks are timed when executed, replays are marked."""
+  shared_cache = {}
+  def timing():
+    runner = make_runner(('a', ), (check_slow_tool, )
+                       , shared_cache=shared_cache
+                       , options=ExecutionOptions(timing=True))
+    message, = [message for status, message, _ in runner.run()
+                                                    if status is TIMING]
+    return message
+
+  first = timing()
+  assert first['wall'] >= 0.2 and not first['replayed']
+  assert timing()['replayed']
+
+
+def test_release_conditions():
+  """Conditions are dropped when the last check using them is done."""
+  def make(**kwds):
+    runner = make_runner(checks=(check_item, check_items, check_pids)
+                                                  , options=ExecutionOptions(**kwds))
+    runner._values['runner'] = runner
+    return runner
+
+  runner = make(release_conditions=True)
+  sizes = [len(runner._cache['conditions']) for _ in runner.run()]
+  # three times pid and pids
+  assert max(sizes) == 4 and sizes[-1] == 0
+  assert summarize(make().run()) \
+                          == summarize(make(release_conditions=True).run())
+
+  # at most one item has conditions in memory
+  runner = make(max_resident=1)
+  del resident[:]
+  events = list(runner.run())
+  assert resident == [1, 1, 1]
+  assert (PASS, 'one process', 'com.example/check/pids', ()) \
+                                                    in summarize(events)
+
+
+def test_memory_budget():
+  """Values of conditions with memory are kept within the budget, least
+  recently used are evicted and loaded again when needed."""
+  checks = (check_item_data, check_item_datas)
+  del loaded_items[:]
+  unlimited = make_runner(checks=checks)
+  expected = summarize(unlimited.run())
+  assert loaded_items == ['a', 'bad', 'c']
+  assert unlimited.memory_pool_stats is None
+
+  del loaded_items[:]
+  runner = make_runner(checks=checks, options=ExecutionOptions(memory_budget=40))
+  assert summarize(runner.run()) == expected
+  # the data of all items doesn't fit
+  assert loaded_items == ['a', 'bad', 'c', 'a', 'bad', 'c']
+  assert runner.memory_pool_stats == {'budget': 40, 'bytes': 40
+                      , 'peak_bytes': 40, 'hits': 0, 'misses': 6
+                      , 'reloads': 3, 'evictions': 4}
+  assert sorted(key[1] for key in runner._cache['conditions']
+                            if key[0] == 'item_data') \
+                              == [(('item', 1), ), (('item', 2), )]
+
+  del loaded_items[:]
+  runner = make_runner(checks=checks, options=ExecutionOptions(memory_budget=50))
+  assert summarize(runner.run()) == expected
+  assert loaded_items == ['a', 'bad', 'c']
+  assert runner.memory_pool_stats['hits'] == 3
+
+  with pytest.raises(SetupError):
+    make_runner(runner=AsyncCheckRunner
+              , options=ExecutionOptions(memory_budget=40))
+
+
+def test_derived_iterables():
+  """Derived iterables are evaluated once, when used first."""
+  runner = make_runner()
+  pids = runner.get('pids', ())
+  assert repr(pids) == '<DerivedIterable: not evaluated>'
+  assert runner._cache['conditions'].get(('pid', (('item', 0), ))) is None
+  assert runner.get('pids', ()) is pids
+  assert len(pids) == 3 and pids[0] == os.getpid()
+  assert pids == (os.getpid(), ) * 3 and list(pids) == list(pids)
+  assert pickle.loads(pickle.dumps(pids)) == tuple(pids)
+
+  # without keeping the values of all items in memory
+  pids = make_runner(options=ExecutionOptions(max_resident=1)).get('pids', ())
+  assert list(pids) == [os.getpid()] * 3 and list(pids) == []
+
+
+def test_execution_plan():
+  runner = make_runner()
+  plan = runner.order
+  assert isinstance(plan, ExecutionPlan)
+  # built once per iterarg sizes and filters
+  spec = runner.specification
+  assert spec.get_execution_plan({'item': 3}) is plan
+  assert spec.get_execution_plan({'item': 2}) is not plan
+  # only the most recently used plans are kept
+  for size in range(4, 14):
+    spec.get_execution_plan({'item': size})
+  assert len(spec._execution_plans) == spec.max_execution_plans
+  assert spec.get_execution_plan({'item': 3}) is not plan
+  assert len(plan) == 4
+  assert plan.index(plan[2]) == 2 and plan[3] in plan
+  section, check, iterargs = plan[0]
+  assert (section, check, (('item', 99), )) not in plan
+
+  # pickled without checks, bound again to the spec
+  unpickled = pickle.loads(pickle.dumps(plan))
+  assert unpickled.keys == plan.keys
+  assert tuple(unpickled.bind(spec)) == tuple(plan)
+
+  # the order of a run can be any subset of the plan
+  events = list(runner.run(order=(plan[3], plan[1])))
+  assert events[-1][1] == {'PASS': 2}
+
+
+def test_argument_binder():
+  @check(id='com.example/check/binder')
+  def check_binder(item, pid, the_items, missing=None):
+    """Arguments are bound."""
+    return missing is None, f'{item} {len(the_items)}'
+
+  spec = Spec(
+      iterargs={'item': 'items'}
+    , conditions={'pid': pid}
+    , aliases={'the_items': 'items'}
+    , expected_values={'items': FontBakeryExpectedValue('items')
+                     , 'missing': FontBakeryExpectedValue('missing')}
+    , sections=[Section('Example', checks=[check_binder])]
+  )
+  runner = CheckRunner(spec, values={'items': ('a', 'b', 'c')})
+  events = summarize(runner.run())
+  assert (PASS, 'a 3', 'com.example/check/binder', (('item', 0), )) in events
+  binder = runner._get_binder(check_binder)
+  assert binder is runner._get_binder(check_binder)
+  assert [(name, optional) for name, _, optional in binder] \
+            == [('item', False), ('pid', False), ('the_items', False)
+              , ('missing', True)]
+
+
+def test_dependency_graph():
+  spec = make_runner(checks=(check_item, check_remote_item)).specification
+  assert spec.dependency_graph['com.example/check/remote_item'] \
+                                          == {'item', 'remote_item'}
+  assert spec.dependency_graph['pid'] == {'item'}
+  closure = spec.get_dependencies(check_item)
+  assert closure == {'item', 'pid'}
+  assert spec.get_dependencies(check_item) is closure
+
+  # cleared when the spec changes
+  @condition(force=True)
+  def pid(item, items):
+    return 0
+  spec.add_to_namespace('conditions', 'pid', pid, force=True)
+  assert spec.get_dependencies(check_item) == {'item', 'items', 'pid'}
+  assert spec.dependency_graph['pid'] == {'item', 'items'}
+
+
+def test_timing():
+  """TIMING events precede ENDCHECK, conditions are attributed to the
+  first check using them."""
+  checks = (check_item, check_remote_item)
+  runner = make_runner(checks=checks, options=ExecutionOptions(timing=True))
+  events = list(runner.run())
+  timings = [(check.id, iterargs, message) for status, message
+                      , (_, check, iterargs) in events if status is TIMING]
+  assert len(timings) == 6
+  for index, (status, message, identity) in enumerate(events):
+    if status is TIMING:
+      assert events[index + 1][0] is ENDCHECK
+  remote = [timing for check_id, _, timing in timings
+                          if check_id == 'com.example/check/remote_item']
+  assert all(timing['wall'] >= 0.2 for timing in remote)
+  assert all(timing['cpu'] < 0.1 for timing in remote)
+  assert [condition['name'] for timing in remote
+                for condition in timing['conditions']] == ['remote_item'] * 3
+
+  # the JSON document of SerializeReporter contains the timing
+  reporter = SerializeReporter(runner=make_runner(checks=checks
+                                          , options=ExecutionOptions(timing=True)))
+  reporter.run()
+  assert all(check['timing']['wall'] >= 0
+              for section in reporter.getdoc()['sections']
+              for check in section['checks'])
+
+
+def test_timeout():
+  """Checks exceeding their timeout are stopped, the run continues."""
+  events = summarize(make_runner(checks=(check_slow_item, check_item))
+                                                                    .run())
+  slow = [(status, message) for status, message, check_id, iterargs in events
+              if check_id == 'com.example/check/slow_item'
+                                        and iterargs == (('item', 1), )]
+  started, pid = slow[1][1].rsplit(' ', 1)
+  assert started == 'bad started in process'
+  assert int(pid) != os.getpid()
+  assert slow[2:] == [
+      (ERROR, 'The check did not finish within 0.5 seconds and was stopped.')
+    , (ENDCHECK, str(ERROR))]
+  # the process of the stuck check is gone
+  with pytest.raises(ProcessLookupError):
+    os.kill(int(pid), 0)
+  assert (PASS, 'c done', 'com.example/check/slow_item', (('item', 2), )) \
+                                                                  in events
+  assert (PASS, 'a is good', 'com.example/check/item', (('item', 0), )) \
+                                                                  in events
+  # persisted conditions are stopped by the timeout of the runner
+  events = summarize(make_runner(checks=(check_slow_size, )
+                                  , options=ExecutionOptions(timeout=0.5)).run())
+  statuses = [status for status, _, _, _ in events if status is ENDCHECK]
+  errors = [message for status, message, _, _ in events if status is ERROR]
+  assert len(statuses) == 3 and len(errors) == 1
+  assert 'TimeoutError' in errors[0]
+
+
+def test_fail_fast():
+  """Critical checks run first, the run ends at the first failure."""
+  checks = (check_item, check_items, check_critical_items)
+  runner = make_runner(checks=checks
+                     , options=ExecutionOptions(fail_fast=PriorityLevel.NORMAL))
+  assert runner.order[0][1] is check_critical_items
+  events = list(runner.run())
+  assert [status for status, _, _ in events[-2:]] == [ENDSECTION, END]
+  assert events[-1][1] == {'PASS': 3, 'FAIL': 1}
+  assert [(check.id, iterargs) for status, _, (_, check, iterargs) in events
+                                                  if status is ENDCHECK] == [
+      ('com.example/check/critical_items', ())
+    , ('com.example/check/items', ())
+    , ('com.example/check/item', (('item', 0), ))
+    , ('com.example/check/item', (('item', 1), ))]
+
+  # the failing check is not important enough to end the run
+  runner = make_runner(checks=checks
+                     , options=ExecutionOptions(fail_fast=PriorityLevel.CRITICAL))
+  assert list(runner.run())[-1][1] == {'PASS': 4, 'FAIL': 1}
+
+  # reporters can create documents of ended runs
+  reporter = SerializeReporter(runner=make_runner(checks=checks
+                , options=ExecutionOptions(jobs=2, fail_fast=PriorityLevel.NORMAL)))
+  reporter.run()
+  doc = reporter.getdoc()
+  assert doc['result'] == {'PASS': 3, 'FAIL': 1}
+  assert [check['result'] for section in doc['sections']
+                          for check in section['checks']] \
+                                          == ['PASS', 'PASS', 'PASS', 'FAIL']
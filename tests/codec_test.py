@@ -0,0 +1,48 @@
+import io
+
+from fontbakery.checkrunner import ExecutionOptions, Status, ENDCHECK, START
+from fontbakery.codec import Decoder, Encoder, read_events, write_events
+from fontbakery.message import Message
+from example_checks import (
+              check_item
+            , check_items
+            , check_async_item
+            , make_runner
+            )
+
+
+def test_codec():
+  """Events survive encoding, identities are resolved by the spec."""
+  checks = (check_item, check_items, check_async_item)
+  runner = make_runner(checks=checks, options=ExecutionOptions(timing=True))
+  hint = Status('HINT', 2)  # same weight as INFO
+  events = list(runner.run())
+  events.insert(3, (hint, Message('hint', 'a hint'), events[2][2]))
+
+  stream = io.BytesIO()
+  write_events(stream, events)
+  stream.seek(0)
+  decoded = list(read_events(stream, runner.specification))
+  assert len(decoded) == len(events)
+  for (status, message, identity), (d_status, d_message, d_identity) \
+                                                    in zip(events, decoded):
+    assert d_status is status
+    assert d_identity[0] is identity[0] and d_identity[1] is identity[1]
+    assert d_identity[2] == identity[2]
+    if status is START:
+      assert d_message == tuple(message)
+    else:
+      assert str(d_message) == str(message)
+      assert getattr(d_message, 'traceback', None) \
+                                  == getattr(message, 'traceback', None)
+  assert isinstance(decoded[3][1], Message)
+
+  # events of known identities cost a few bytes
+  encoder = Encoder()
+  endcheck = events[-3]
+  assert endcheck[0] is ENDCHECK
+  first = encoder.encode(endcheck)
+  again = encoder.encode(endcheck)
+  assert len(again) == 4 and len(first) > len(again)
+  decoder = Decoder(runner.specification)
+  assert decoder.decode(first) == decoder.decode(again) == endcheck
@@ -57,3 +57,27 @@ def test_command_check_ufo_sources():
 
   with pytest.raises(subprocess.CalledProcessError):
     subprocess.check_output(["fontbakery", "check-ufo-sources"])
+
+
+def test_command_check_collection():
+  """Test if `fontbakery check-collection` can run successfully`."""
+  subprocess.check_output(["fontbakery", "check-collection", "-h"])
+
+  with pytest.raises(subprocess.CalledProcessError):
+    subprocess.check_output(["fontbakery", "check-collection"])
+
+
+def test_command_serve():
+  """Test if `fontbakery serve` can run successfully`."""
+  subprocess.check_output(["fontbakery", "serve", "-h"])
+
+  with pytest.raises(subprocess.CalledProcessError):
+    subprocess.check_output(["fontbakery", "serve"])
+
+
+def test_command_worker():
+  """Test if `fontbakery worker` can run successfully`."""
+  subprocess.check_output(["fontbakery", "worker", "-h"])
+
+  with pytest.raises(subprocess.CalledProcessError):
+    subprocess.check_output(["fontbakery", "worker"])
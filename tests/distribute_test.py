@@ -0,0 +1,63 @@
+from multiprocessing.connection import Client
+import threading
+
+import pytest
+
+from fontbakery.checkrunner import ERROR, ENDCHECK
+from fontbakery.distribute import Coordinator, is_loopback, work
+from example_checks import make_runner, summarize
+
+
+def test_distributed():
+  """Workers connecting over TCP execute the checks, the batches of
+  disconnected workers are handed out again."""
+  authkey = b'secret'
+  coordinator = Coordinator(('localhost', 0), authkey=authkey)
+  runner = make_runner(coordinator=coordinator)
+  received = threading.Event()
+
+  def dying_worker():
+    with Client(coordinator.address, authkey=authkey) as connection:
+      connection.recv()  # setup
+      connection.recv()  # the first batch
+    received.set()
+
+  def worker():
+    received.wait()
+    counts.append(work(coordinator.address, runner.specification
+                                                    , authkey=authkey))
+
+  counts = []
+  threads = [threading.Thread(target=dying_worker)] \
+                  + [threading.Thread(target=worker) for _ in range(2)]
+  for thread in threads:
+    thread.start()
+  events = list(runner.run())
+  for thread in threads:
+    thread.join()
+  assert summarize(events) == summarize(make_runner().run())
+  assert sum(counts) == 4
+  # the listener is closed at the end of the run
+  with pytest.raises(ConnectionRefusedError):
+    Client(coordinator.address, authkey=authkey)
+
+  # pickles are only exchanged with strangers who know the key
+  assert is_loopback('localhost') and is_loopback('::1')
+  assert not is_loopback('0.0.0.0') and not is_loopback('192.0.2.1')
+  with pytest.raises(ValueError):
+    Coordinator(('0.0.0.0', 0))
+  with pytest.raises(ValueError):
+    work(('192.0.2.1', 5000), runner.specification, retry_for=0)
+
+
+def test_worker_timeout():
+  """Without workers the checks are reported as errors, after a while."""
+  coordinator = Coordinator(('localhost', 0), worker_timeout=0.1)
+  events = summarize(make_runner(coordinator=coordinator).run())
+  results = [message for status, message, _, _ in events
+                                                    if status is ENDCHECK]
+  assert results == [str(ERROR)] * 4
+  assert (ERROR, 'The check was not executed, no worker connected within'
+                 ' 0.1 seconds.', 'com.example/check/items', ()) in events
+  with pytest.raises(ConnectionRefusedError):
+    Client(coordinator.address)
@@ -0,0 +1,261 @@
+"""Example checks and conditions of the CheckRunner tests."""
+import asyncio
+import os
+import threading
+import time
+
+from fontbakery.callable import check, condition, FontBakeryExpectedValue
+from fontbakery.checkrunner import (
+              CheckRunner
+            , Section
+            , Spec
+            , PASS
+            , FAIL
+            , START
+            , END
+            )
+from fontbakery.constants import PriorityLevel
+
+
+@condition
+def pid(item):
+  return os.getpid()
+
+
+@check(id='com.example/check/item')
+def check_item(item, pid):
+  """Item is not "bad"."""
+  if item == 'bad':
+    yield FAIL, f'{item} is bad'
+  else:
+    yield PASS, f'{item} is good'
+
+
+@check(id='com.example/check/items')
+def check_items(items):
+  """Items are not empty."""
+  return bool(len(items)), f'{len(items)} items'
+
+
+class Concurrency:
+  """Records the threads of and the peak number of concurrent calls in
+  this context."""
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.reset()
+
+  def reset(self):
+    self.running = 0
+    self.peak = 0
+    self.threads = set()
+
+  def __enter__(self):
+    with self._lock:
+      self.running += 1
+      self.peak = max(self.peak, self.running)
+      self.threads.add(threading.get_ident())
+
+  def __exit__(self, *exc_info):
+    with self._lock:
+      self.running -= 1
+
+
+remote_calls = Concurrency()
+
+@condition(io_bound=True)
+def remote_item(item):
+  with remote_calls:
+    time.sleep(0.1)
+  return f'remote {item}'
+
+
+@check(id='com.example/check/remote_item', io_bound=True)
+def check_remote_item(item, remote_item):
+  """Remote item was fetched."""
+  with remote_calls:
+    time.sleep(0.1)
+  yield PASS, f'{item} from {remote_item}'
+
+
+prefetch_threads = []
+parse_calls = Concurrency()
+
+@condition(prefetch=True)
+def parsed_item(item):
+  prefetch_threads.append(threading.current_thread())
+  with parse_calls:
+    time.sleep(0.1)
+  return f'parsed {item}'
+
+
+@check(id='com.example/check/parsed_item')
+def check_parsed_item(item, parsed_item):
+  """Item was parsed."""
+  with parse_calls:
+    time.sleep(0.1)
+  yield PASS, f'{item} is {parsed_item}'
+
+
+evaluations = []
+async_calls = Concurrency()
+
+@condition
+async def async_items(items):
+  evaluations.append(items)
+  with async_calls:
+    await asyncio.sleep(0.1)
+  return [f'async {item}' for item in items]
+
+
+@check(id='com.example/check/async_item')
+async def check_async_item(item, async_items):
+  """Async item is ready."""
+  with async_calls:
+    await asyncio.sleep(0.1)
+  yield PASS, f'{item} of {len(async_items)}'
+
+
+@condition(persist=True)
+def item_size(item):
+  evaluations.append(item)
+  return os.path.getsize(item)
+
+
+@check(id='com.example/check/item_size')
+def check_item_size(item_size):
+  """Item is small."""
+  return item_size < 10, f'size {item_size}'
+
+
+@check(id='com.example/check/item_content')
+def check_item_content(item):
+  """Item is not empty."""
+  evaluations.append(item)
+  with open(item) as f:
+    content = f.read()
+  return bool(content), f'{len(content)} characters'
+
+
+@check(id='com.example/check/item_time', volatile=True)
+def check_item_time(item):
+  """Item was checked recently."""
+  evaluations.append('time')
+  return PASS, 'just now'
+
+
+@condition
+def tool_version():
+  evaluations.append('tool_version')
+  return '1.0'
+
+
+@check(id='com.example/check/tool_version')
+def check_tool_version(tool_version):
+  """Tool is recent."""
+  evaluations.append('check_tool_version')
+  return PASS, f'version {tool_version}'
+
+
+@check(id='com.example/check/slow_tool')
+def check_slow_tool():
+  """Tool works."""
+  time.sleep(0.2)
+  return PASS, 'tool works'
+
+
+@check(id='com.example/check/item_tool')
+def check_item_tool(item, tool_version):
+  """Item was made with the tool."""
+  return PASS, f'{item} made with {tool_version}'
+
+
+@check(id='com.example/check/pid_count')
+def check_pid_count(pids):
+  """Items were checked."""
+  return PASS, f'{len(pids)} pids'
+
+
+resident = []
+
+@check(id='com.example/check/pids')
+def check_pids(pids, runner):
+  """All items were checked in one process."""
+  seen = set()
+  for pid in pids:
+    resident.append(len(runner._cache['conditions']))
+    seen.add(pid)
+  return len(seen) == 1, 'one process'
+
+
+@check(id='com.example/check/slow_item', misc_metadata={'timeout': 0.5})
+def check_slow_item(item):
+  """Item is checked in time."""
+  yield PASS, f'{item} started in process {os.getpid()}'
+  if item == 'bad':
+    time.sleep(60)
+  yield PASS, f'{item} done'
+
+
+@condition(persist=True)
+def slow_size(item):
+  if item == 'bad':
+    time.sleep(60)
+  return len(item)
+
+
+@check(id='com.example/check/slow_size')
+def check_slow_size(slow_size):
+  """Slow size is known."""
+  return PASS, f'size {slow_size}'
+
+
+@check(id='com.example/check/critical_items'
+     , misc_metadata={'priority': PriorityLevel.CRITICAL})
+def check_critical_items(items):
+  """Items are given."""
+  return PASS, 'items are given'
+
+
+loaded_items = []
+
+@condition(memory=len)
+def item_data(item):
+  loaded_items.append(item)
+  return item * 10
+
+
+@check(id='com.example/check/item_data')
+def check_item_data(item_data):
+  """Item data was loaded."""
+  return PASS, f'{len(item_data)} bytes'
+
+
+@check(id='com.example/check/item_datas')
+def check_item_datas(item_datas):
+  """Data of all items was loaded."""
+  return PASS, f'{sum(map(len, item_datas))} bytes'
+
+
+def make_runner(items=('a', 'bad', 'c'), checks=(check_item, check_items)
+                , runner=CheckRunner, **kwds):
+  spec = Spec(
+      iterargs={'item': 'items'}
+    , conditions={'pid': pid, 'remote_item': remote_item
+                , 'async_items': async_items, 'item_size': item_size
+                , 'slow_size': slow_size, 'parsed_item': parsed_item
+                , 'tool_version': tool_version, 'item_data': item_data}
+    , derived_iterables={'pids': ('pid', True)
+                       , 'item_datas': ('item_data', True)}
+    , expected_values={'items': FontBakeryExpectedValue('items')
+                     , 'runner': FontBakeryExpectedValue('runner'
+                                                       , default=None)}
+    , sections=[Section('Example', checks=checks)]
+    , sibling_files=('*.txt', )
+  )
+  return runner(spec, values={'items': items}, **kwds)
+
+
+def summarize(events):
+  return [(status, str(message), check and check.id, iterargs)
+          for status, message, (section, check, iterargs) in events
+                                              if status not in (START, END)]
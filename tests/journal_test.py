@@ -0,0 +1,61 @@
+from collections import Counter
+import os
+
+import pytest
+
+from fontbakery.checkrunner import ExecutionOptions, SetupError, ENDCHECK
+from fontbakery.journal import Journal
+from example_checks import (
+              check_items
+            , evaluations
+            , check_item_content
+            , make_runner
+            , summarize
+            )
+
+
+def test_journal(tmpdir, monkeypatch):
+  """A resumed run replays the journaled results and executes the rest."""
+  items = []
+  for name in 'abc':
+    item = tmpdir.join('items', name)
+    item.write(name, ensure=True)
+    items.append(str(item))
+  checks = (check_item_content, check_items)
+  path = str(tmpdir.join('journal'))
+  expected = summarize(make_runner(items, checks).run())
+
+  # interrupted after two checks
+  del evaluations[:]
+  synced = []
+  monkeypatch.setattr(os, 'fsync', synced.append)
+  journal = Journal(path, sync_interval=0)
+  run = make_runner(items, checks, journal=journal).run()
+  ended = 0
+  while ended < 2:
+    status, _, _ = next(run)
+    ended += status is ENDCHECK
+  run.close()
+  # the header and each record are synced
+  assert len(synced) == 3
+  journal.close()
+  assert evaluations == items[:1]
+  # a record that was cut off by the crash
+  with open(path, 'ab') as f:
+    f.write(b'\x40\x01')
+
+  del evaluations[:]
+  journal = Journal(path, resume=True)
+  assert len(journal) == 2
+  events = list(make_runner(items, checks, journal=journal,
+                options=ExecutionOptions(release_conditions=True)).run())
+  journal.close()
+  assert evaluations == items[1:]
+  assert summarize(events) == expected
+  assert events[-1][1] == Counter(PASS=4)
+  assert len(Journal(path, resume=True)) == 4
+
+  # the records must be of the same checks
+  with pytest.raises(SetupError):
+    make_runner(items, (check_item_content, ),
+                journal=Journal(path, resume=True))
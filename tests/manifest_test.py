@@ -0,0 +1,85 @@
+import importlib
+import sys
+
+from fontbakery.checkrunner import CheckRunner, PASS
+from fontbakery.manifest import Manifest, select
+from example_checks import summarize
+
+
+SPEC_PACKAGE = {
+  '__init__.py': 'imported = []\n'
+, 'main.py': """
+from fontbakery.checkrunner import Section, Spec
+spec_imports = (('.', ('a', 'b', 'shared')), )
+specification = Spec(default_section=Section('Main'))
+specification.auto_register(globals())
+specification.test_expected_checks(['com.example/check/a'
+                                  , 'com.example/check/b'], exclusive=True)
+"""
+, 'a.py': """
+from fontbakery.callable import check
+from fontbakery.checkrunner import PASS, Spec
+import spec_package
+spec_package.imported.append('a')
+spec_factory = Spec
+@check(id='com.example/check/a')
+def check_a(shared_value):
+  '''Shared value is given.'''
+  return PASS, shared_value
+"""
+, 'b.py': """
+from fontbakery.callable import check
+from fontbakery.checkrunner import PASS, Spec
+import spec_package
+spec_package.imported.append('b')
+spec_factory = Spec
+@check(id='com.example/check/b')
+def check_b():
+  '''Nothing to check.'''
+  return PASS, 'ok'
+"""
+, 'shared.py': """
+from fontbakery.callable import condition
+from fontbakery.checkrunner import Spec
+import spec_package
+spec_package.imported.append('shared')
+spec_factory = Spec
+@condition
+def shared_value():
+  return 'shared'
+"""
+}
+
+def test_manifest(tmpdir, monkeypatch):
+  """With a selection, only the modules needed for the selected checks
+  are imported, once the manifest has their entries."""
+  package = tmpdir.mkdir('spec_package')
+  for name, source in SPEC_PACKAGE.items():
+    package.join(name).write(source)
+  monkeypatch.syspath_prepend(str(tmpdir))
+  path = str(tmpdir.join('manifest.json'))
+
+  def load(*checks):
+    for name in list(sys.modules):
+      if name.startswith('spec_package'):
+        del sys.modules[name]
+    with select(checks, manifest=Manifest(path)):
+      module = importlib.import_module('spec_package.main')
+    spec = module.specification
+    return sorted(sys.modules['spec_package'].imported), [check.id
+                      for section in spec.sections for check in section.checks]
+
+  # without a manifest all modules are imported
+  assert load('check/a') == (['a', 'b', 'shared'], ['com.example/check/a'])
+  assert load('check/a') == (['a', 'shared'], ['com.example/check/a'])
+  assert load('check/b') == (['b'], ['com.example/check/b'])
+  events = list(CheckRunner(sys.modules['spec_package.main'].specification
+                                                          , values={}).run())
+  assert (PASS, 'ok', 'com.example/check/b', ()) in summarize(events)
+
+  # after a module changed, all modules are imported once
+  package.join('shared.py').write(SPEC_PACKAGE['shared.py'] + '\n')
+  assert load('check/b') == (['a', 'b', 'shared'], ['com.example/check/b'])
+  assert load('check/b') == (['b'], ['com.example/check/b'])
+  assert load() == (['a', 'b', 'shared']
+                  , ['com.example/check/a', 'com.example/check/b'])
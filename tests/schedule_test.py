@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from fontbakery.checkrunner import (
+              ExecutionOptions
+            , SetupError
+            , PASS
+            , SKIP
+            , ENDCHECK
+            )
+from fontbakery.cache import DiskCache, ResultCache
+from fontbakery.schedule import DurationProfile, longest_first
+from example_checks import (
+              check_item
+            , check_remote_item
+            , check_item_content
+            , check_critical_items
+            , make_runner
+            , summarize
+            )
+
+
+def test_duration_profile(tmpdir):
+  """Durations are recorded and used to order the checks."""
+  path = str(tmpdir.join('durations.json'))
+  checks = (check_remote_item, check_item)
+  list(make_runner(checks=checks, options=ExecutionOptions(timing=True)
+                          , duration_profile=DurationProfile(path)).run())
+  profile = DurationProfile(path)
+  assert profile.get('com.example/check/remote_item') >= 0.2
+  assert profile.get('com.example/check/item') < 0.1
+
+  runner = make_runner(checks=checks, duration_profile=profile
+                , options=ExecutionOptions(timing=True, cheapest_first=True))
+  # the order of the items doesn't change
+  assert [(check.id, iterargs) for _, check, iterargs in runner.order[:2]] \
+                      == [('com.example/check/item', (('item', 0), ))
+                        , ('com.example/check/remote_item', (('item', 0), ))]
+  # indexes 1 and 3 are remote items
+  shards = [('item', 0, [0]), ('item', 1, [1, 2]), ('item', 2, [3])]
+  assert [shard[1] for shard in longest_first(shards, runner.order, profile)] \
+                                                                == [1, 2, 0]
+
+  # replayed results are not durations of the check
+  items = []
+  for name in 'abc':
+    item = tmpdir.join('items', name)
+    item.write(name, ensure=True)
+    items.append(str(item))
+  cache = ResultCache(DiskCache(str(tmpdir.join('cache'))))
+  recorded = []
+  profile = DurationProfile(path)
+  profile.record = lambda check_id, duration: recorded.append(check_id)
+  for _ in range(2):
+    list(make_runner(items, (check_item_content, ), options=ExecutionOptions(timing=True)
+                , duration_profile=profile, result_cache=cache).run())
+  assert recorded == ['com.example/check/item_content'] * 3
+
+  # the estimates decay exponentially
+  profile = DurationProfile(path, decay=0.5)
+  profile.record('com.example/check/new', 1)
+  profile.update()
+  profile.record('com.example/check/new', 2)
+  profile.record('com.example/check/new', 4)
+  profile.update()
+  assert profile.get('com.example/check/new') == 2
+
+
+def test_time_budget(tmpdir):
+  """The most important checks that fit in the budget are selected,
+  with stop_at_budget the checks after the budget is spent are skipped."""
+  path = str(tmpdir.join('durations.json'))
+  with open(path, 'w') as f:
+    json.dump({'com.example/check/remote_item': 0.3
+             , 'com.example/check/item': 0.01
+             , 'com.example/check/critical_items': 0.01}, f)
+  checks = (check_item, check_remote_item, check_critical_items)
+  runner = make_runner(checks=checks
+                    , options=ExecutionOptions(timing=True, time_budget=0.5)
+                    , duration_profile=DurationProfile(path))
+  assert [(check.id, iterargs) for _, check, iterargs in runner.order] == [
+      ('com.example/check/critical_items', ())
+    , ('com.example/check/item', (('item', 0), ))
+    , ('com.example/check/remote_item', (('item', 0), ))
+    , ('com.example/check/item', (('item', 1), ))
+    , ('com.example/check/item', (('item', 2), ))]
+
+  # without estimates all checks are selected, but the run stops
+  checks = (check_remote_item, check_critical_items)
+  runner = make_runner(checks=checks
+                    , options=ExecutionOptions(timing=True, time_budget=0.15
+                                         , stop_at_budget=True)
+                    , duration_profile=DurationProfile(str(tmpdir.join('new'))))
+  events = summarize(runner.run())
+  assert [(message, check_id) for status, message, check_id, _ in events
+                                                  if status is ENDCHECK] == [
+      (str(PASS), 'com.example/check/critical_items')
+    , (str(PASS), 'com.example/check/remote_item')
+    , (str(SKIP), 'com.example/check/remote_item')
+    , (str(SKIP), 'com.example/check/remote_item')]
+  assert (SKIP, 'Time budget exhausted.', 'com.example/check/remote_item'
+                                              , (('item', 2), )) in events
+
+  with pytest.raises(SetupError):
+    make_runner(options=ExecutionOptions(time_budget=1))
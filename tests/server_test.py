@@ -0,0 +1,43 @@
+import os
+import threading
+
+import pytest
+
+from fontbakery.server import JobError, Server, request_check
+from example_checks import (
+              check_items
+            , evaluations
+            , check_tool_version
+            , check_item_tool
+            , make_runner
+            )
+
+
+def test_server(tmpdir):
+  """Jobs are run by a server that keeps the shared values between them."""
+  checks = (check_items, check_tool_version, check_item_tool)
+  spec = make_runner(checks=checks).specification
+  server = Server({'example': spec})
+  address = str(tmpdir.join('server.sock'))
+  http_server = server.listen(address)
+  threading.Thread(target=http_server.serve_forever, daemon=True).start()
+  # only the user running the server can connect
+  assert os.stat(address).st_mode & 0o777 == 0o600
+  try:
+    del evaluations[:]
+    first = list(request_check(address, {'items': ['a', 'b']}))
+    second = list(request_check(address, {'items': ['c']}
+                              , explicit_checks=['item_tool']))
+    with pytest.raises(JobError):
+      list(request_check(address, {'items': []}, specification='other'))
+  finally:
+    http_server.shutdown()
+    http_server.server_close()
+  assert evaluations == ['tool_version', 'check_tool_version']
+  assert first[0]['status'] == 'START' and len(first[0]['message']) == 4
+  assert first[-1] == {'status': 'END', 'section': None, 'check': None
+                     , 'iterargs': None, 'message': {'PASS': 4}}
+  assert {'status': 'PASS', 'section': '<Section: Example>'
+        , 'check': 'com.example/check/item_tool', 'iterargs': [['item', 0]]
+        , 'message': 'c made with 1.0'} in second
+  assert second[-1]['message'] == {'PASS': 1}